@@ -3,14 +3,22 @@ from fastapi import FastAPI, BackgroundTasks
 from fastapi import UploadFile, File, Form, HTTPException, Depends, Header, Request
 from fastapi.security import APIKeyHeader
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-import shutil
+from fastapi.responses import FileResponse, Response, StreamingResponse
 import os
-import uuid
 from pathlib import Path
-from fastapi.concurrency import run_in_threadpool
 from scripts.pdf_utils import remove_pdf_password, pdf_to_docx, pdf_to_word_paddle, extract_pdf_pages, compress_pdf
 from scripts.image_utils import heic_to_jpeg
+from scripts.executors import (
+    IMAGE_WORKERS, run_image_task, run_pdf_task,
+    call_in_docx_pool, warm_docx_process_pool, shutdown_docx_process_pool,
+)
+from scripts.cancellation import OperationCancelled, cancel_on_disconnect
+from scripts.jobs import ai_jobs
+from scripts.result_cache import ResultCache
+from scripts.utils import save_upload_file, upload_temp_path, cleanup_temp_file, extract_zip_upload
+from scripts.security_utils import secure_filename
+from scripts.workflow import REQUIRED, WorkflowContext, execute_step, get_step, validate_params, workflow_events
+from scripts.zip_stream import MANIFEST_SUFFIX, iter_zip, write_zip_manifest, read_zip_manifest, delete_zip_bundle
 
 app = FastAPI(title="File Forge API")
 
@@ -42,6 +50,14 @@ async def startup_event():
     except Exception as e:
         print(f"Warning: AI Model initialization failed: {e}")
 
+    # Spawn pdf2docx worker processes now if the process-pool backend is enabled
+    warm_docx_process_pool()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_docx_process_pool()
+
 
 # Ensure directories exist
 BASE_DIR = Path(__file__).parent
@@ -51,6 +67,33 @@ OUTPUT_DIR = BASE_DIR / "outputs"
 UPLOAD_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Content-addressed cache of conversion results (set FILE_FORGE_CACHE_MAX_MB=0 to disable)
+CACHE_DIR = Path(os.environ.get("FILE_FORGE_CACHE_DIR", BASE_DIR / "cache"))
+CACHE_TTL = int(os.environ.get("FILE_FORGE_CACHE_TTL", str(24 * 60 * 60)))
+result_cache = ResultCache(
+    CACHE_DIR / "results",
+    max_bytes=int(os.environ.get("FILE_FORGE_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    ttl_seconds=CACHE_TTL,
+)
+# Per-page DOCX output of AI layout recovery, keyed by the rendered page raster
+page_cache = ResultCache(
+    CACHE_DIR / "pages",
+    max_bytes=int(os.environ.get("FILE_FORGE_PAGE_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    ttl_seconds=CACHE_TTL,
+)
+
+
+def pdf_cache_key(upload_hash: str, operation: str, params: dict, password: Optional[str]) -> Optional[str]:
+    """
+    Result-cache key for a PDF operation.
+
+    Password-protected inputs get None: their outputs are decrypted, so they
+    are never kept in the cache beyond the download.
+    """
+    if password:
+        return None
+    return result_cache.make_key(upload_hash, operation, params)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
@@ -109,23 +152,20 @@ async def api_remove_password(
     _auth: str = Depends(require_auth)
 ):
     # Sanitize filename and add UUID prefix to prevent path traversal + collisions
-    safe_filename = Path(file.filename.replace("\\", "/")).name
-    unique_filename = f"{uuid.uuid4()}_{safe_filename}"
-    temp_path = UPLOAD_DIR / unique_filename
+    temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
+    upload_hash = await save_upload_file(file, temp_path)
     try:
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        output_path = remove_pdf_password(str(temp_path), password, str(OUTPUT_DIR))
+        cache_key = pdf_cache_key(upload_hash, "remove_password", {}, password)
+        output_path, _ = await run_pdf_task(
+            result_cache.get_or_compute,
+            cache_key, OUTPUT_DIR, temp_path.stem,
+            lambda: remove_pdf_password(str(temp_path), password, str(OUTPUT_DIR)),
+        )
         return {"status": "success", "message": "Password removed", "filename": Path(output_path).name}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        if temp_path.exists():
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                pass  # Windows file locking - will be cleaned up later
+        cleanup_temp_file(temp_path)
 
 @app.post("/api/pdf/convert-to-word")
 async def api_convert_to_word(
@@ -134,24 +174,38 @@ async def api_convert_to_word(
     password: str = Form(None),
     _auth: str = Depends(require_auth)
 ):
-    # Sanitize filename and add UUID prefix
-    safe_filename = Path(file.filename.replace("\\", "/")).name
-    unique_filename = f"{uuid.uuid4()}_{safe_filename}"
-    temp_path = UPLOAD_DIR / unique_filename
+    # Sanitize filename and add UUID prefix to prevent path traversal + collisions
+    temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
     print(f"[DEBUG] Converting: {file.filename}, use_ai={use_ai}, password={'***' if password else 'None'}")
+    job_owns_upload = False
+    upload_hash = await save_upload_file(file, temp_path)
     try:
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
         print(f"[DEBUG] File saved to: {temp_path}")
         
+        operation = "pdf_to_word_paddle" if use_ai else "pdf_to_docx"
+        cache_key = pdf_cache_key(upload_hash, operation, {}, password)
+
         if use_ai:
-            # @jules: This can be very slow for large PDFs. 
-            # We should probably implement a progress bar or background task with polling.
-            output_path = pdf_to_word_paddle(str(temp_path), str(OUTPUT_DIR), password)
-            message = "Converted to Word with AI Layout Recovery"
+            cached = result_cache.lookup(cache_key, OUTPUT_DIR, temp_path.stem)
+            if cached is not None:
+                return {"status": "success", "message": "Converted to Word with AI Layout Recovery",
+                        "filename": Path(cached[0]).name}
+
+            # AI layout recovery can take minutes for large scans, so it runs as a
+            # background job and the client polls /api/jobs/{job_id} for progress.
+            job_id = ai_jobs.submit(
+                _convert_with_ai, cache_key, temp_path, password,
+                cleanup=lambda: cleanup_temp_file(temp_path), cancellable=True,
+            )
+            job_owns_upload = True
+            print(f"[DEBUG] Queued AI conversion job: {job_id}")
+            return {"status": "queued", "message": "AI Layout Recovery queued", "job_id": job_id}
         else:
-            output_path = pdf_to_docx(str(temp_path), str(OUTPUT_DIR), password)
+            output_path, _ = await run_pdf_task(
+                result_cache.get_or_compute,
+                cache_key, OUTPUT_DIR, temp_path.stem,
+                lambda: call_in_docx_pool(pdf_to_docx, str(temp_path), str(OUTPUT_DIR), password),
+            )
             message = "Converted to Word (Standard)"
 
         print(f"[DEBUG] Conversion successful: {output_path}")
@@ -163,21 +217,83 @@ async def api_convert_to_word(
         raise HTTPException(status_code=400, detail=str(e))
 
     finally:
-        if temp_path.exists():
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                pass  # Windows file locking - will be cleaned up later
+        if not job_owns_upload:
+            cleanup_temp_file(temp_path)
+
+
+def _convert_with_ai(cache_key: str, temp_path: Path, password: Optional[str],
+                     progress_callback=None, cancel_token=None) -> str:
+    """Background job body: AI conversion whose result is stored in the result cache."""
+    output_path, _ = result_cache.get_or_compute(
+        cache_key, OUTPUT_DIR, temp_path.stem,
+        lambda: pdf_to_word_paddle(str(temp_path), str(OUTPUT_DIR), password,
+                                   progress_callback=progress_callback,
+                                   page_cache=None if password else page_cache,
+                                   cancel_token=cancel_token),
+    )
+    return output_path
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, _auth: str = Depends(require_auth)) -> dict:
+    """
+    Reports the status of a background conversion job.
+
+    Args:
+        job_id: The id returned when the job was submitted.
+        _auth: Validated authentication key.
+
+    Returns:
+        dict: status ('queued', 'running', 'completed', 'failed', 'cancelled'),
+        per-page progress, and the result filename once completed.
+
+    Raises:
+        HTTPException: 404 if the job is unknown or has expired.
+    """
+    job = ai_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "filename": job["filename"],
+        "error": job["error"],
+    }
+
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str, _auth: str = Depends(require_auth)) -> dict:
+    """
+    Cancels a background conversion job whose client has gone away.
+
+    A running AI conversion stops before its next page.
+
+    Args:
+        job_id: The id returned when the job was submitted.
+        _auth: Validated authentication key.
+
+    Returns:
+        dict: The job id and status 'cancelling'.
+
+    Raises:
+        HTTPException: 404 if the job is unknown or already finished.
+    """
+    if not ai_jobs.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not found or already finished")
+    return {"job_id": job_id, "status": "cancelling"}
 
 @app.post("/api/pdf/extract-pages")
 async def api_extract_pages(file: UploadFile = File(...), pages: str = Form(...), password: str = Form(None)):
-    temp_path = UPLOAD_DIR / file.filename
+    temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
     print(f"[DEBUG] Extracting pages: {file.filename}, pages='{pages}', password={'***' if password else 'None'}")
+    upload_hash = await save_upload_file(file, temp_path)
     try:
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        output_path = await run_in_threadpool(extract_pdf_pages, str(temp_path), str(OUTPUT_DIR), pages, password)
+        cache_key = pdf_cache_key(upload_hash, "extract_pages", {"pages": pages.replace(" ", "").lower()}, password)
+        output_path, _ = await run_pdf_task(
+            result_cache.get_or_compute, cache_key, OUTPUT_DIR, temp_path.stem,
+            lambda: extract_pdf_pages(str(temp_path), str(OUTPUT_DIR), pages, password),
+        )
         return {"status": "success", "message": "Pages extracted", "filename": Path(output_path).name}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -187,67 +303,78 @@ async def api_extract_pages(file: UploadFile = File(...), pages: str = Form(...)
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        if temp_path.exists():
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                pass
+        cleanup_temp_file(temp_path)
 
 
 @app.post("/api/pdf/compress")
 async def api_compress_pdf(
+    request: Request,
     file: UploadFile = File(...),
     level: str = Form('medium'),
     password: str = Form(None),
+    target_size_kb: int = Form(None),
     _auth: str = Depends(require_auth)
 ):
-    """Compress PDF by optimizing structure and resampling large images."""
-    safe_filename = Path(file.filename.replace("\\", "/")).name
-    unique_filename = f"{uuid.uuid4()}_{safe_filename}"
-    temp_path = UPLOAD_DIR / unique_filename
-    print(f"[DEBUG] Compressing: {file.filename}, level={level}, password={'***' if password else 'None'}")
-    try:
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+    """Compress PDF by optimizing structure and resampling large images.
 
-        result = await run_in_threadpool(
-            compress_pdf, str(temp_path), str(OUTPUT_DIR), level, password or None
-        )
-        return {
+    If target_size_kb is given, level is ignored and the file is compressed to
+    fit under that size where possible. If the client disconnects, compression
+    stops before the next image.
+    """
+    temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
+    print(f"[DEBUG] Compressing: {file.filename}, level={level}, target_size_kb={target_size_kb}, password={'***' if password else 'None'}")
+    upload_hash = await save_upload_file(file, temp_path)
+    try:
+        cache_key = pdf_cache_key(upload_hash, "compress_pdf", {
+            "level": None if target_size_kb else level,
+            "target_size_kb": target_size_kb,
+        }, password)
+        async with cancel_on_disconnect(request) as cancel_token:
+            output_path, result = await run_pdf_task(
+                result_cache.get_or_compute, cache_key, OUTPUT_DIR, temp_path.stem,
+                lambda: compress_pdf(str(temp_path), str(OUTPUT_DIR), level, password or None,
+                                     target_size_kb=target_size_kb, cancel_token=cancel_token),
+            )
+        response = {
             "status": "success",
             "message": "PDF compressed successfully",
-            "filename": Path(result['output_path']).name,
+            "filename": Path(output_path).name,
             "original_size": result['original_size'],
             "compressed_size": result['compressed_size'],
             "reduction_pct": result['reduction_pct'],
+            "images": result.get('images', []),
         }
+        if 'target_met' in result:
+            response["target_met"] = result['target_met']
+        return response
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except OperationCancelled as e:
+        print(f"[DEBUG] Compression cancelled: {file.filename}")
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         import traceback
         print(f"[ERROR] PDF compression failed: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        if temp_path.exists():
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                pass
+        cleanup_temp_file(temp_path)
 
 
 @app.post("/api/image/heic-to-jpeg")
-async def api_heic_to_jpeg(file: UploadFile = File(...), quality: int = Form(95)):
-    """Convert HEIC/HEIF image to JPEG format."""
-    # Sanitize filename to prevent path traversal
-    safe_filename = Path(file.filename.replace("\\", "/")).name
-    temp_path = UPLOAD_DIR / safe_filename
-    print(f"[DEBUG] Converting HEIC: {file.filename}, quality={quality}")
+async def api_heic_to_jpeg(file: UploadFile = File(...), quality: int = Form(95), fast: bool = Form(False)):
+    """Convert HEIC/HEIF image to JPEG format (fast skips JPEG optimization)."""
+    # Sanitize filename and add UUID prefix to prevent path traversal + collisions
+    temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
+    print(f"[DEBUG] Converting HEIC: {file.filename}, quality={quality}, fast={fast}")
+    upload_hash = await save_upload_file(file, temp_path)
     try:
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        output_path = heic_to_jpeg(str(temp_path), str(OUTPUT_DIR), quality)
+        cache_key = result_cache.make_key(upload_hash, "heic_to_jpeg", {"quality": quality, "fast": fast})
+        output_path, _ = await run_image_task(
+            result_cache.get_or_compute,
+            cache_key, OUTPUT_DIR, temp_path.stem,
+            lambda: heic_to_jpeg(str(temp_path), str(OUTPUT_DIR), quality, fast=fast),
+        )
         return {"status": "success", "message": "Converted to JPEG", "filename": Path(output_path).name}
     except Exception as e:
         import traceback
@@ -255,11 +382,7 @@ async def api_heic_to_jpeg(file: UploadFile = File(...), quality: int = Form(95)
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        if temp_path.exists():
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                pass  # Windows file locking - will be cleaned up later
+        cleanup_temp_file(temp_path)
 
 
 @app.post("/api/image/resize")
@@ -272,23 +395,27 @@ async def api_resize_image(
     target_size_kb: int = Form(None)
 ):
     """Resize image based on parameters."""
-    # Sanitize filename to prevent path traversal
-    safe_filename = Path(file.filename.replace("\\", "/")).name
-    temp_path = UPLOAD_DIR / safe_filename
+    # Sanitize filename and add UUID prefix to prevent path traversal + collisions
+    temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
     print(f"[DEBUG] Resizing image: {file.filename}, mode={mode}")
+    upload_hash = await save_upload_file(file, temp_path)
     try:
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
         from scripts.image_utils import resize_image
-        output_path = resize_image(
-            str(temp_path), 
-            str(OUTPUT_DIR), 
-            mode,
-            width=width,
-            height=height,
-            percentage=percentage,
-            target_size_kb=target_size_kb
+        params = {"mode": mode, "width": width, "height": height,
+                  "percentage": percentage, "target_size_kb": target_size_kb}
+        cache_key = result_cache.make_key(upload_hash, "resize_image", params)
+        output_path, _ = await run_image_task(
+            result_cache.get_or_compute,
+            cache_key, OUTPUT_DIR, temp_path.stem,
+            lambda: resize_image(
+                str(temp_path), 
+                str(OUTPUT_DIR), 
+                mode,
+                width=width,
+                height=height,
+                percentage=percentage,
+                target_size_kb=target_size_kb
+            ),
         )
         return {"status": "success", "message": "Image Resized", "filename": Path(output_path).name}
     except Exception as e:
@@ -297,11 +424,7 @@ async def api_resize_image(
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        if temp_path.exists():
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                pass
+        cleanup_temp_file(temp_path)
 
 
 @app.post("/api/image/crop")
@@ -313,19 +436,21 @@ async def api_crop_image(
     height: int = Form(...)
 ):
     """Crop image based on coordinates."""
-    # Sanitize filename to prevent path traversal
-    safe_filename = Path(file.filename.replace("\\", "/")).name
-    temp_path = UPLOAD_DIR / safe_filename
+    # Sanitize filename and add UUID prefix to prevent path traversal + collisions
+    temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
     print(f"[DEBUG] Cropping image: {file.filename}, x={x}, y={y}, w={width}, h={height}")
+    upload_hash = await save_upload_file(file, temp_path)
     try:
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
         from scripts.image_utils import crop_image
-        output_path = crop_image(
-            str(temp_path), 
-            str(OUTPUT_DIR), 
-            x=x, y=y, width=width, height=height
+        cache_key = result_cache.make_key(upload_hash, "crop_image", {"x": x, "y": y, "width": width, "height": height})
+        output_path, _ = await run_image_task(
+            result_cache.get_or_compute,
+            cache_key, OUTPUT_DIR, temp_path.stem,
+            lambda: crop_image(
+                str(temp_path), 
+                str(OUTPUT_DIR), 
+                x=x, y=y, width=width, height=height
+            ),
         )
         return {"status": "success", "message": "Image Cropped", "filename": Path(output_path).name}
     except Exception as e:
@@ -334,22 +459,170 @@ async def api_crop_image(
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        if temp_path.exists():
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                pass
+        cleanup_temp_file(temp_path)
+
+
+# Largest number of images one batch request may carry (zip contents included)
+BATCH_MAX_FILES = int(os.environ.get("FILE_FORGE_BATCH_MAX_FILES", "500"))
+
+
+# Batch operations and the workflow steps that implement them
+BATCH_OPERATIONS = {"heic_to_jpeg": "heic_to_jpeg", "resize": "resize_image", "crop": "crop_image"}
+# Config keys the single-file endpoint requires even though the workflow step has a default
+BATCH_REQUIRED_PARAMS = {"crop": ("width", "height")}
+
+
+@app.post("/api/image/batch")
+async def api_image_batch(
+    files: List[UploadFile] = File(...),
+    operation: str = Form(...),
+    config: str = Form("{}")
+):
+    """Apply one image operation to many images (or zips of images), streaming per-file progress as SSE."""
+    import asyncio
+    import json
+    import uuid
+
+    try:
+        if operation not in BATCH_OPERATIONS:
+            raise ValueError(f"Unknown batch operation: {operation}")
+        step = get_step(BATCH_OPERATIONS[operation])
+        required = BATCH_REQUIRED_PARAMS.get(operation, ())
+        schema = step._replace(params={key: (kind, REQUIRED if key in required else default)
+                                       for key, (kind, default) in step.params.items()})
+        config_dict = json.loads(config or "{}")
+        if not isinstance(config_dict, dict):
+            raise ValueError("config must be a JSON object")
+        params = validate_params(schema, config_dict)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid config JSON")
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    print(f"[DEBUG] Batch {operation}: {len(files)} upload(s), config={config}")
+
+    # (display name, temp path, upload hash) per image, zip members expanded in place
+    inputs = []
+    try:
+        for file in files:
+            temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
+            upload_hash = await save_upload_file(file, temp_path)
+            if Path(file.filename or "").suffix.lower() == ".zip":
+                try:
+                    inputs.extend(await run_image_task(
+                        extract_zip_upload, temp_path, UPLOAD_DIR, BATCH_MAX_FILES - len(inputs)
+                    ))
+                finally:
+                    cleanup_temp_file(temp_path)
+            else:
+                inputs.append((secure_filename(file.filename), temp_path, upload_hash))
+            if len(inputs) > BATCH_MAX_FILES:
+                raise HTTPException(status_code=400, detail=f"Too many images (maximum {BATCH_MAX_FILES}).")
+        if not inputs:
+            raise HTTPException(status_code=400, detail="No images to process")
+    except BaseException:
+        for _, path, _ in inputs:
+            cleanup_temp_file(path)
+        raise
+
+    # Every output is tracked from its worker, so one finishing after the stream ended is still removed
+    batch_ctx = WorkflowContext(OUTPUT_DIR)
+
+    def run_one(temp_path: Path, upload_hash: str) -> str:
+        cache_key = result_cache.make_key(upload_hash, step.name, params)
+        output_path, _ = result_cache.get_or_compute(
+            cache_key, OUTPUT_DIR, temp_path.stem,
+            lambda: execute_step(step, str(temp_path), OUTPUT_DIR, params),
+        )
+        batch_ctx.track(Path(output_path))
+        return output_path
+
+    async def process_one(slots: asyncio.Semaphore, temp_path: Path, upload_hash: str) -> str:
+        # Hold at most IMAGE_WORKERS files in the shared pool so single-file requests still get a turn
+        async with slots:
+            return await run_image_task(run_one, temp_path, upload_hash)
+
+    async def generate_progress():
+        """Generator for SSE progress events."""
+        total = len(inputs)
+        outputs = []  # (archive name, output path)
+        arcnames = set()
+        failed = 0
+        outputs_owned_by_zip = False
+        slots = asyncio.Semaphore(IMAGE_WORKERS)
+        tasks = {
+            asyncio.ensure_future(process_one(slots, temp_path, upload_hash)): (index, name, temp_path)
+            for index, (name, temp_path, upload_hash) in enumerate(inputs)
+        }
+        try:
+            yield f"data: {json.dumps({'event': 'batch_start', 'total': total, 'operation': operation})}\n\n"
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, name, temp_path = tasks[task]
+                    try:
+                        output_path = task.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"[ERROR] Batch item {name} failed: {e}")
+                        yield f"data: {json.dumps({'event': 'file_error', 'index': index, 'name': name, 'detail': str(e), 'completed': len(outputs) + failed, 'total': total})}\n\n"
+                        continue
+
+                    # Archive under the client's name, keeping the suffix the operation appended
+                    output_name = Path(output_path).name
+                    arcname = Path(name).stem + output_name[len(temp_path.stem):]
+                    base, n = arcname, 1
+                    while arcname in arcnames:
+                        arcname = f"{Path(base).stem}_{n}{Path(base).suffix}"
+                        n += 1
+                    arcnames.add(arcname)
+                    outputs.append((arcname, Path(output_path)))
+                    yield f"data: {json.dumps({'event': 'file_complete', 'index': index, 'name': name, 'output': arcname, 'completed': len(outputs) + failed, 'total': total})}\n\n"
+
+            if not outputs:
+                yield f"data: {json.dumps({'event': 'error', 'detail': 'No images could be processed'})}\n\n"
+                return
+
+            # The zip is streamed from the outputs when downloaded; only its manifest is written now
+            zip_name = write_zip_manifest(OUTPUT_DIR, f"batch_{uuid.uuid4().hex[:8]}.zip", outputs)
+            outputs_owned_by_zip = True
+            print(f"[DEBUG] Batch complete: {zip_name} ({len(outputs)} ok, {failed} failed)")
+            yield f"data: {json.dumps({'event': 'complete', 'message': f'Processed {len(outputs)} of {total} images', 'filename': zip_name, 'failed': failed})}\n\n"
+
+        except Exception as e:
+            import traceback
+            print(f"[ERROR] Batch failed: {e}")
+            traceback.print_exc()
+            yield f"data: {json.dumps({'event': 'error', 'detail': str(e)})}\n\n"
+
+        finally:
+            for task in tasks:
+                task.cancel()
+            for _, temp_path, _ in inputs:
+                cleanup_temp_file(temp_path)
+            # Individual outputs only exist to be zipped; items still running are removed when they finish
+            batch_ctx.close(keep=[output_path for _, output_path in outputs] if outputs_owned_by_zip else [])
+
+    return StreamingResponse(
+        generate_progress(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 @app.post("/api/workflow/execute")
-async def execute_workflow(file: UploadFile = File(...), steps: str = Form(...)):
+async def execute_workflow(request: Request, file: UploadFile = File(...), steps: str = Form(...)):
     """Execute a multi-step workflow on a file with SSE progress streaming."""
     import json
-    from fastapi.responses import StreamingResponse
     
-    # Sanitize filename to prevent path traversal
-    safe_filename = Path(file.filename.replace("\\", "/")).name
-    temp_path = UPLOAD_DIR / safe_filename
+    # Sanitize filename and add UUID prefix to prevent path traversal + collisions
+    temp_path = upload_temp_path(UPLOAD_DIR, file.filename)
     
     print(f"[DEBUG] Workflow started: {file.filename}, steps={steps}")
     
@@ -362,94 +635,20 @@ async def execute_workflow(file: UploadFile = File(...), steps: str = Form(...))
         raise HTTPException(status_code=400, detail="Invalid steps JSON")
     
     # Save initial file
-    with temp_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await save_upload_file(file, temp_path)
     
     async def generate_progress():
         """Generator for SSE progress events."""
-        current_file = temp_path
-        
         try:
-            # Process each step
-            for i, step in enumerate(step_list):
-                step_type = step.get('type')
-                config = step.get('config', {})
-                step_label = step.get('label', step_type)
-                
-                # Send "processing" event for this step
-                yield f"data: {json.dumps({'event': 'step_start', 'step': i, 'total': len(step_list), 'label': step_label})}\n\n"
-                
-                print(f"[DEBUG] Step {i+1}: {step_type}")
-
-                # Artificial delay to ensure UI updates are visible
-                import asyncio
-                await asyncio.sleep(1.0)
-                
-                if step_type == 'remove_password':
-                    password = config.get('password', '')
-                    if not password:
-                        yield f"data: {json.dumps({'event': 'error', 'detail': 'Password required for unlock step'})}\n\n"
-                        return
-                    output_path = await run_in_threadpool(remove_pdf_password, str(current_file), password, str(OUTPUT_DIR))
-                    current_file = Path(output_path)
-                    
-                elif step_type == 'pdf_to_word':
-                    use_ai = config.get('use_ai', False)
-                    password = config.get('password')
-                    if use_ai:
-                        output_path = await run_in_threadpool(pdf_to_word_paddle, str(current_file), str(OUTPUT_DIR), password)
-                    else:
-                        output_path = await run_in_threadpool(pdf_to_docx, str(current_file), str(OUTPUT_DIR), password)
-                    current_file = Path(output_path)
-                    
-                elif step_type == 'heic_to_jpeg':
-                    quality = config.get('quality', 95)
-                    output_path = await run_in_threadpool(heic_to_jpeg, str(current_file), str(OUTPUT_DIR), quality)
-                    current_file = Path(output_path)
-                    
-                elif step_type == 'resize_image':
-                    from scripts.image_utils import resize_image
-                    mode = config.get('mode', 'percentage')
-                    percentage = config.get('percentage', 50)
-                    output_path = await run_in_threadpool(
-                        resize_image,
-                        str(current_file), 
-                        str(OUTPUT_DIR), 
-                        mode,
-                        percentage=percentage
-                    )
-                    current_file = Path(output_path)
-                    
-                elif step_type == 'crop_image':
-                    from scripts.image_utils import crop_image
-                    x = config.get('x', 0)
-                    y = config.get('y', 0)
-                    width = config.get('width', 100)
-                    height = config.get('height', 100)
-                    output_path = await run_in_threadpool(
-                        crop_image,
-                        str(current_file), 
-                        str(OUTPUT_DIR), 
-                        x=x, y=y, width=width, height=height
-                    )
-                    current_file = Path(output_path)
-
-                elif step_type == 'compress_pdf':
-                    level = config.get('level', 'medium')
-                    password = config.get('password') or None
-                    result = await run_in_threadpool(compress_pdf, str(current_file), str(OUTPUT_DIR), level, password)
-                    current_file = Path(result['output_path'])
-
-                else:
-                    yield f"data: {json.dumps({'event': 'error', 'detail': f'Unknown step type: {step_type}'})}\n\n"
-                    return
-                
-                # Send "completed" event for this step
-                yield f"data: {json.dumps({'event': 'step_complete', 'step': i, 'total': len(step_list), 'label': step_label})}\n\n"
-            
-            # Send final success event
-            print(f"[DEBUG] Workflow complete: {current_file}")
-            yield f"data: {json.dumps({'event': 'complete', 'message': f'Workflow completed ({len(step_list)} steps)', 'filename': current_file.name})}\n\n"
+            ctx = WorkflowContext(OUTPUT_DIR, page_cache=page_cache)
+            # A disconnect stops the running step at its next check and the engine before the next step;
+            # closing the event stream on exit makes the engine delete what it wrote right away
+            async with cancel_on_disconnect(request, ctx.cancel_token), \
+                    workflow_events(step_list, temp_path, ctx) as events:
+                async for event in events:
+                    if event["event"] == "complete":
+                        print(f"[DEBUG] Workflow complete: {event['filename']}")
+                    yield f"data: {json.dumps(event)}\n\n"
             
         except Exception as e:
             import traceback
@@ -459,11 +658,7 @@ async def execute_workflow(file: UploadFile = File(...), steps: str = Form(...))
         
         finally:
             # Clean up temp file
-            if temp_path.exists():
-                try:
-                    os.remove(temp_path)
-                except PermissionError:
-                    pass
+            cleanup_temp_file(temp_path)
     
     return StreamingResponse(
         generate_progress(),
@@ -492,9 +687,12 @@ def delete_file_after_download(path: Path) -> None:
         print(f"[ERROR] Failed to delete file {path}: {e}")
 
 @app.get("/api/download/{filename}")
-async def download_file(filename: str, background_tasks: BackgroundTasks, _auth: str = Depends(require_auth_or_query)) -> FileResponse:
+async def download_file(filename: str, background_tasks: BackgroundTasks, _auth: str = Depends(require_auth_or_query)) -> Response:
     """
     Serves a file for download from the outputs directory and schedules its deletion.
+
+    Multi-file results (e.g. image batches) are zips that only exist as a
+    manifest; they are built on the fly and streamed with chunked transfer.
     
     Args:
         filename: The name of the file to download.
@@ -502,7 +700,7 @@ async def download_file(filename: str, background_tasks: BackgroundTasks, _auth:
         _auth: Validated authentication key (via header or query param).
         
     Returns:
-        FileResponse: The requested file.
+        FileResponse for a single file, StreamingResponse for a streamed zip.
         
     Raises:
         HTTPException: 404 if the file is not found.
@@ -510,10 +708,22 @@ async def download_file(filename: str, background_tasks: BackgroundTasks, _auth:
     # Sanitize filename to prevent path traversal
     safe_filename = Path(filename.replace("\\", "/")).name
     file_path = OUTPUT_DIR / safe_filename
+    if safe_filename.endswith(MANIFEST_SUFFIX):
+        # Manifests are bookkeeping for streamed zips; serving one would delete it and orphan the members
+        raise HTTPException(status_code=404, detail="File not found")
     if file_path.exists():
         # Schedule the file to be deleted after the response is sent
         background_tasks.add_task(delete_file_after_download, file_path)
         return FileResponse(file_path, filename=filename)
+
+    entries = read_zip_manifest(OUTPUT_DIR, safe_filename)
+    if entries is not None and all(path.exists() for _, path in entries):
+        background_tasks.add_task(delete_zip_bundle, OUTPUT_DIR, safe_filename)
+        return StreamingResponse(
+            iter_zip(entries),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{safe_filename}"'},
+        )
     raise HTTPException(status_code=404, detail="File not found")
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""
+Cooperative cancellation for File Forge.
+
+Blocking work in the thread pools cannot be interrupted from outside, so long
+operations accept a CancellationToken and check it at natural boundaries
+(between pages, images or workflow steps). The request layer cancels the
+token when the client goes away, and the work stops at the next check.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+if TYPE_CHECKING:
+    # Only for annotations; PDF workers import this module without the web stack
+    from fastapi import Request
+
+
+# How often a request is checked for a client disconnect
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class OperationCancelled(Exception):
+    """Raised inside cancelled work at its next check."""
+
+
+class CancellationToken:
+    """Thread-safe flag set by the request layer and polled by worker threads."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """Raises OperationCancelled if the token was cancelled."""
+        if self._event.is_set():
+            raise OperationCancelled("Operation cancelled: the client disconnected.")
+
+
+def check_cancelled(token: Optional[CancellationToken]) -> None:
+    """token.check() for optional token arguments."""
+    if token is not None:
+        token.check()
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(request: "Request", token: Optional[CancellationToken] = None,
+                               interval: float = DISCONNECT_POLL_SECONDS) -> AsyncIterator[CancellationToken]:
+    """
+    Yields a token that is cancelled as soon as the client behind request disconnects.
+
+    The connection is polled in the background while the block runs; pass the
+    token to the worker doing the request's blocking work.
+    """
+    token = token or CancellationToken()
+
+    async def watch() -> None:
+        while not token.cancelled:
+            if await request.is_disconnected():
+                print(f"[EXEC] Client disconnected from {request.url.path}; cancelling")
+                token.cancel()
+                return
+            await asyncio.sleep(interval)
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        yield token
+    finally:
+        watcher.cancel()
@@ -0,0 +1,181 @@
+"""
+Execution layer for CPU-bound work in File Forge.
+
+Blocking image, PDF and AI operations never run on the event loop. Each class
+of work gets its own sized thread pool so a burst of heavy conversions cannot
+starve light requests (or each other).
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+
+def _workers_from_env(name: str, default: int) -> int:
+    return max(1, int(os.environ.get(name, str(default))))
+
+
+_CPUS = os.cpu_count() or 1
+
+# Pillow operations: short and mostly GIL-free during decode/resize/encode
+IMAGE_WORKERS = _workers_from_env("FILE_FORGE_IMAGE_WORKERS", min(4, _CPUS))
+# pikepdf/fitz/pdf2docx operations: heavier, bounded to protect memory
+PDF_WORKERS = _workers_from_env("FILE_FORGE_PDF_WORKERS", min(2, _CPUS))
+# PaddleOCR layout recovery: memory hungry, so deliberately small
+AI_WORKERS = _workers_from_env("FILE_FORGE_AI_WORKERS", 1)
+
+image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="fileforge-image")
+pdf_executor = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="fileforge-pdf")
+ai_executor = ThreadPoolExecutor(max_workers=AI_WORKERS, thread_name_prefix="fileforge-ai")
+
+
+async def run_in_executor(executor: Executor, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs func(*args, **kwargs) on executor and awaits the result without blocking the loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_image_task(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs a Pillow-based image operation on the image pool."""
+    return await run_in_executor(image_executor, func, *args, **kwargs)
+
+
+async def run_pdf_task(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs a pikepdf/fitz/pdf2docx operation on the PDF pool."""
+    return await run_in_executor(pdf_executor, func, *args, **kwargs)
+
+
+async def run_ai_task(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs PaddleOCR layout recovery on the AI pool."""
+    return await run_in_executor(ai_executor, func, *args, **kwargs)
+
+
+# Optional process pool for pdf2docx, which is mostly pure Python and holds the GIL.
+# 0 (default) keeps conversion on the PDF threads.
+DOCX_PROCESSES = int(os.environ.get("FILE_FORGE_DOCX_PROCESSES", "0"))
+# Worker processes are recycled after this many conversions to contain leaks
+DOCX_MAX_TASKS_PER_CHILD = int(os.environ.get("FILE_FORGE_DOCX_MAX_TASKS_PER_CHILD", "50"))
+
+# Worker processes shared by all chunked (page-parallel) pdf2docx conversions; 1 disables chunking
+DOCX_PARALLEL_PROCESSES = _workers_from_env("FILE_FORGE_DOCX_PARALLEL_PROCESSES", min(4, _CPUS))
+
+_docx_pool = None
+_docx_chunk_pool = None
+_docx_pool_lock = threading.Lock()
+# True inside pdf2docx worker processes, which must not start pools of their own
+_in_docx_worker = False
+
+
+def _init_docx_worker() -> None:
+    """Process-pool initializer: pays the pdf2docx/fitz import cost once per worker."""
+    global _in_docx_worker
+    _in_docx_worker = True
+    import scripts.pdf_utils  # noqa: F401
+
+
+def _noop() -> None:
+    pass
+
+
+def get_docx_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the pdf2docx process pool, creating it on first use (None when disabled)."""
+    global _docx_pool
+    if DOCX_PROCESSES <= 0:
+        return None
+    with _docx_pool_lock:
+        if _docx_pool is None:
+            kwargs = {}
+            if sys.version_info >= (3, 11):
+                kwargs["max_tasks_per_child"] = DOCX_MAX_TASKS_PER_CHILD
+            # spawn: workers must not inherit the parent's threads, and max_tasks_per_child requires it
+            _docx_pool = ProcessPoolExecutor(
+                max_workers=DOCX_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_docx_worker,
+                **kwargs,
+            )
+    return _docx_pool
+
+
+def warm_docx_process_pool() -> None:
+    """Starts every pdf2docx worker up front so the first conversions don't pay spawn cost."""
+    pool = get_docx_process_pool()
+    if pool is not None:
+        wait([pool.submit(_noop) for _ in range(DOCX_PROCESSES)])
+        print(f"[EXEC] {DOCX_PROCESSES} pdf2docx worker processes ready")
+
+
+def get_docx_chunk_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Returns the process pool for chunked pdf2docx conversion, creating it on first use.
+
+    One pool of DOCX_PARALLEL_PROCESSES workers is shared by every request,
+    so concurrent large conversions queue for workers instead of each
+    spawning their own. None when chunking is disabled or when called inside
+    a pdf2docx worker process (the conversion then runs in a single pass).
+    """
+    global _docx_chunk_pool
+    if DOCX_PARALLEL_PROCESSES <= 1 or _in_docx_worker:
+        return None
+    with _docx_pool_lock:
+        if _docx_chunk_pool is None:
+            _docx_chunk_pool = ProcessPoolExecutor(
+                max_workers=DOCX_PARALLEL_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_docx_worker,
+            )
+    return _docx_chunk_pool
+
+
+def discard_docx_chunk_pool(pool: ProcessPoolExecutor) -> None:
+    """Drops a broken chunk pool so the next conversion starts a fresh one."""
+    global _docx_chunk_pool
+    with _docx_pool_lock:
+        if _docx_chunk_pool is pool:
+            _docx_chunk_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_docx_process_pool() -> None:
+    """Shuts down both pdf2docx process pools."""
+    global _docx_pool, _docx_chunk_pool
+    with _docx_pool_lock:
+        for pool in (_docx_pool, _docx_chunk_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        _docx_pool = _docx_chunk_pool = None
+
+
+def _discard_docx_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Drops a broken pool so the next call starts a fresh one."""
+    global _docx_pool
+    with _docx_pool_lock:
+        if _docx_pool is pool:
+            _docx_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def call_in_docx_pool(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs func in the pdf2docx process pool when enabled, otherwise in the calling thread.
+
+    func and its arguments must be picklable when the pool is enabled. If a
+    worker dies (OOM kill, crash in native code), the pool is replaced and
+    func is retried once; a second crash raises RuntimeError.
+    """
+    pool = get_docx_process_pool()
+    if pool is None:
+        return func(*args, **kwargs)
+    for attempt in range(2):
+        try:
+            return pool.submit(func, *args, **kwargs).result()
+        except BrokenProcessPool:
+            _discard_docx_process_pool(pool)
+            print(f"[EXEC] pdf2docx worker process died; restarting the pool (attempt {attempt + 1})")
+            pool = get_docx_process_pool()
+    raise RuntimeError("PDF to Word conversion crashed its worker process.")
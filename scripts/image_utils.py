@@ -1,35 +1,197 @@
 """
 Image conversion utilities for File Forge.
 """
+import io
+import math
+import os
 from pathlib import Path
-from PIL import Image, ImageOps
+from typing import Dict, List, Tuple
+from PIL import Image
 import pillow_heif
+from scripts.executors import IMAGE_WORKERS
 
-# Register HEIF opener with Pillow
-pillow_heif.register_heif_opener()
+# libheif threads per HEIC decode. The image pool already decodes IMAGE_WORKERS
+# files at once, so by default each decode gets its share of the CPUs.
+HEIC_DECODE_THREADS = max(1, int(os.environ.get(
+    "FILE_FORGE_HEIC_DECODE_THREADS", str((os.cpu_count() or 1) // IMAGE_WORKERS))))
 
+# Register HEIF opener with Pillow. Only the primary image is read: embedded thumbnails,
+# depth maps and auxiliary images (alpha/HDR gain maps) are never needed for a JPEG.
+pillow_heif.register_heif_opener(
+    decode_threads=HEIC_DECODE_THREADS,
+    thumbnails=False,
+    depth_images=False,
+    aux_images=False,
+)
 
-def _prepare_image(img: Image.Image) -> Image.Image:
+# EXIF tag holding the camera orientation
+EXIF_ORIENTATION_TAG = 0x0112
+# Transpose that turns the stored pixels into the displayed image, per EXIF orientation
+_ORIENTATION_TRANSPOSE = {
+    1: None,
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+# Downscales by at least this factor first reduce() by an integer factor, then resample
+RESIZE_REDUCING_GAP = 3.0
+# Radius of the LANCZOS kernel in output pixels; a crop kept for resampling needs this much context
+LANCZOS_SUPPORT = 3
+
+# target_size mode: JPEG quality search range
+TARGET_MIN_QUALITY = 30
+TARGET_MAX_QUALITY = 95
+# target_size mode: highest quality tried once the image has to be downscaled to fit
+TARGET_SCALED_QUALITY = 75
+# target_size mode: size ~ scale ** exponent when two probes cannot pin the exponent down
+TARGET_DEFAULT_EXPONENT = 2.0
+# target_size mode: pixel budget of the copies used for probe encodes
+TARGET_PROBE_PIXELS = 1_000_000
+# target_size mode: the probe sample is a grid x grid mosaic of tiles
+TARGET_PROBE_GRID = 4
+# target_size mode: full-size encodes allowed after the initial one
+TARGET_MAX_ATTEMPTS = 6
+# target_size mode: results at least this fraction of the target are accepted without refining
+TARGET_FILL_RATIO = 0.85
+
+
+def _orientation(img: Image.Image) -> int:
+    """Returns the EXIF orientation of img (1 when absent or invalid)."""
+    orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    return orientation if orientation in _ORIENTATION_TRANSPOSE else 1
+
+
+def _oriented_size(img: Image.Image) -> Tuple[int, int]:
+    """
+    Returns the (width, height) img will have after EXIF orientation, without decoding it.
+
+    Args:
+        img: Freshly opened PIL Image.
+
+    Returns:
+        The displayed width and height.
+    """
+    # Orientations 5-8 rotate by 90 degrees, swapping the axes
+    if _orientation(img) >= 5:
+        return img.height, img.width
+    return img.size
+
+
+def _box_to_source(box: Tuple[int, int, int, int], source_size: Tuple[int, int],
+                   orientation: int) -> Tuple[int, int, int, int]:
+    """
+    Maps a (left, upper, right, lower) box on the displayed image back onto the stored pixels.
+
+    Args:
+        box: Box in displayed (EXIF-oriented) coordinates.
+        source_size: (width, height) of the stored image.
+        orientation: EXIF orientation of the image.
+
+    Returns:
+        The same region in stored-image coordinates.
+    """
+    w, h = source_size
+    left, upper, right, lower = box
+    # Edges of the stored region, per orientation; the box's ordering is preserved
+    return {
+        1: (left, upper, right, lower),
+        2: (w - right, upper, w - left, lower),
+        3: (w - right, h - lower, w - left, h - upper),
+        4: (left, h - lower, right, h - upper),
+        5: (upper, left, lower, right),
+        6: (upper, h - right, lower, h - left),
+        7: (w - lower, h - right, w - upper, h - left),
+        8: (w - lower, left, w - upper, right),
+    }[orientation]
+
+
+def _prepare_image(img: Image.Image, box: Tuple[int, int, int, int] = None,
+                   size: Tuple[int, int] = None) -> Image.Image:
     """
     Prepare image for processing: normalize orientation and convert to RGB.
+
+    Cropping and resizing are done in stored orientation before the EXIF
+    transpose, so the transpose and mode conversion only touch the pixels that
+    end up in the output. Images without an orientation tag are not copied.
     
     Args:
         img: PIL Image object.
+        box: Optional crop box (left, upper, right, lower) in displayed coordinates.
+            With size, the box may be fractional and is scaled to size in one resample.
+        size: Optional output (width, height) in displayed coordinates.
     
     Returns:
         Normalized and RGB-converted image.
     """
-    # Normalize orientation (handle EXIF tags)
-    img = ImageOps.exif_transpose(img)
-    
+    orientation = _orientation(img)
+    if size is not None and orientation >= 5:
+        size = (size[1], size[0])
+
+    region = None
+    if box is not None:
+        source_box = _box_to_source(box, img.size, orientation)
+        if size is not None:
+            # Rounding in the caller's box arithmetic must not push it off the image
+            source_box = (max(0, source_box[0]), max(0, source_box[1]),
+                          min(img.width, source_box[2]), min(img.height, source_box[3]))
+        if size is None:
+            img = img.crop(source_box)
+        else:
+            # Box and size together: resample exactly the (possibly fractional) box, keeping
+            # enough pixels around it for the filter so edges match a full resize + crop
+            reduction = max((source_box[2] - source_box[0]) / size[0],
+                            (source_box[3] - source_box[1]) / size[1], 1.0)
+            margin = math.ceil(LANCZOS_SUPPORT * reduction) + 1
+            outer = (max(0, math.floor(source_box[0]) - margin), max(0, math.floor(source_box[1]) - margin),
+                     min(img.width, math.ceil(source_box[2]) + margin),
+                     min(img.height, math.ceil(source_box[3]) + margin))
+            img = img.crop(outer)
+            region = (source_box[0] - outer[0], source_box[1] - outer[1],
+                      source_box[2] - outer[0], source_box[3] - outer[1])
+
     # Convert RGBA or palette mode to RGB for JPEG compatibility
     if img.mode in ("RGBA", "P"):
         img = img.convert("RGB")
-    
+
+    if size is not None:
+        img = img.resize(size, Image.Resampling.LANCZOS, box=region, reducing_gap=RESIZE_REDUCING_GAP)
+
+    # Normalize orientation (handle EXIF tags)
+    method = _ORIENTATION_TRANSPOSE[orientation]
+    if method is not None:
+        img = img.transpose(method)
+        # The pixels are upright now; drop the metadata carrying the tag so that
+        # in-memory hand-offs (and images derived from them) are not rotated again
+        for key in ("exif", "xmp", "XML:com.adobe.xmp"):
+            img.info.pop(key, None)
+
     return img
 
 
-def heic_to_jpeg(input_path: str, output_dir: str, quality: int = 95) -> str:
+def _draft_for_size(img: Image.Image, size: Tuple[int, int]) -> None:
+    """
+    Lets JPEG sources decode directly at reduced scale when the output is small enough.
+
+    libjpeg can scale by 1/2, 1/4 or 1/8 while decoding; draft() picks the
+    largest reduction that still yields at least the requested size. A no-op
+    for other formats or images that are already loaded.
+
+    Args:
+        img: Freshly opened PIL Image.
+        size: Output (width, height) after EXIF orientation.
+    """
+    if img.format != "JPEG":
+        return
+    if _oriented_size(img) != img.size:
+        size = (size[1], size[0])
+    img.draft(img.mode, size)
+
+
+def heic_to_jpeg(input_path: str, output_dir: str, quality: int = 95, fast: bool = False) -> str:
     """
     Converts HEIC/HEIF image to JPEG format.
     
@@ -37,6 +199,8 @@ def heic_to_jpeg(input_path: str, output_dir: str, quality: int = 95) -> str:
         input_path: Path to the input HEIC/HEIF file.
         output_dir: Directory to save the converted JPEG file.
         quality: JPEG quality (1-100, default 95).
+        fast: Skip Huffman table optimization, which roughly triples encode
+            time for a few percent smaller output.
     
     Returns:
         Path to the converted JPEG file.
@@ -46,11 +210,124 @@ def heic_to_jpeg(input_path: str, output_dir: str, quality: int = 95) -> str:
     
     with Image.open(input_file) as img:
         img = _prepare_image(img)
-        img.save(output_file, "JPEG", quality=quality, optimize=True)
+        img.save(output_file, "JPEG", quality=quality, optimize=not fast)
     
     return str(output_file)
 
 
+def resized(img: Image.Image, mode: str, width: int = None, height: int = None,
+            percentage: int = None) -> Image.Image:
+    """
+    Resizes an image in memory by dimensions or percentage.
+
+    Sizes refer to the displayed (EXIF-oriented) image. A freshly opened image
+    is drafted first, so it decodes at a cost proportional to the output.
+
+    Args:
+        img: PIL Image, freshly opened or already processed.
+        mode: 'dimensions' or 'percentage'.
+        width: Target width (optional, for 'dimensions').
+        height: Target height (optional, for 'dimensions').
+        percentage: Scale percentage (optional, for 'percentage').
+
+    Returns:
+        The resized, upright RGB image.
+    """
+    new_width, new_height = _resize_dimensions(_oriented_size(img), mode, width, height, percentage)
+
+    # Decode and resample at a cost proportional to the output, not the source
+    _draft_for_size(img, (new_width, new_height))
+    return _prepare_image(img, size=(new_width, new_height))
+
+
+def _resize_dimensions(original_size: Tuple[int, int], mode: str, width: int = None, height: int = None,
+                       percentage: int = None) -> Tuple[int, int]:
+    """Returns the (width, height) an image of original_size is resized to (see resized)."""
+    original_width, original_height = original_size
+
+    if mode == 'dimensions':
+        if not width and not height:
+            raise ValueError("Width or height must be provided for dimensions mode.")
+
+        # Calculate missing dimension if only one is provided to maintain aspect ratio
+        if width and not height:
+            ratio = width / original_width
+            new_width = width
+            new_height = int(original_height * ratio)
+        elif height and not width:
+            ratio = height / original_height
+            new_height = height
+            new_width = int(original_width * ratio)
+        else:
+            new_width = width
+            new_height = height
+
+    elif mode == 'percentage':
+        if not percentage:
+            raise ValueError("Percentage must be provided for percentage mode.")
+
+        scale = percentage / 100.0
+        new_width = int(original_width * scale)
+        new_height = int(original_height * scale)
+
+    else:
+        raise ValueError(f"Unknown resize mode: {mode}")
+
+    return new_width, new_height
+
+
+def transformed(img: Image.Image, operations: List[Tuple[str, dict]]) -> Image.Image:
+    """
+    Applies a chain of crops and resizes in a single pass.
+
+    Each operation is ('resize', resized() kwargs) or ('crop', cropped() kwargs)
+    and is expressed, as if applied in order, on the output of the previous
+    one. The chain is folded into one source box and one output size, so the
+    image is cropped first and only the kept region is decoded (drafted) and
+    resampled, once. The output has the same size as applying the operations
+    one by one.
+
+    Args:
+        img: PIL Image, freshly opened or already processed.
+        operations: The crop/resize chain.
+
+    Returns:
+        The transformed, upright RGB image.
+    """
+    source_width, source_height = _oriented_size(img)
+    # Region of the source (displayed coordinates) that ends up in the output, and the output size
+    left, upper, right, lower = 0.0, 0.0, float(source_width), float(source_height)
+    out_width, out_height = source_width, source_height
+
+    for kind, params in operations:
+        if kind == 'resize':
+            out_width, out_height = _resize_dimensions((out_width, out_height), **params)
+        elif kind == 'crop':
+            x0 = max(0, params['x'])
+            y0 = max(0, params['y'])
+            x1 = min(out_width, params['x'] + params['width'])
+            y1 = min(out_height, params['y'] + params['height'])
+            scale_x = (right - left) / out_width
+            scale_y = (lower - upper) / out_height
+            left, upper, right, lower = (left + x0 * scale_x, upper + y0 * scale_y,
+                                         left + x1 * scale_x, upper + y1 * scale_y)
+            out_width, out_height = x1 - x0, y1 - y0
+        else:
+            raise ValueError(f"Unknown image operation: {kind}")
+        if out_width <= 0 or out_height <= 0:
+            raise ValueError("Crop box is outside the image.")
+
+    # Decode only as much resolution as the output needs from the kept region
+    _draft_for_size(img, (math.ceil(source_width * out_width / (right - left)),
+                          math.ceil(source_height * out_height / (lower - upper))))
+    drafted_width, drafted_height = _oriented_size(img)
+    if (drafted_width, drafted_height) != (source_width, source_height):
+        scale_x, scale_y = drafted_width / source_width, drafted_height / source_height
+        left, upper, right, lower = left * scale_x, upper * scale_y, right * scale_x, lower * scale_y
+
+    return _prepare_image(img, box=(left, upper, right, lower), size=(out_width, out_height))
+
+
 def resize_image(input_path: str, output_dir: str, mode: str, 
                  width: int = None, height: int = None, 
                  percentage: int = None, target_size_kb: int = None,
@@ -75,102 +352,174 @@ def resize_image(input_path: str, output_dir: str, mode: str,
     output_file = Path(output_dir) / f"{input_file.stem}_resized.jpg"
     
     with Image.open(input_file) as img:
-        img = _prepare_image(img)
-        original_width, original_height = img.size
-
-        if mode == 'dimensions':
-            if not width and not height:
-                raise ValueError("Width or height must be provided for dimensions mode.")
-            
-            # Calculate missing dimension if only one is provided to maintain aspect ratio
-            if width and not height:
-                ratio = width / original_width
-                new_width = width
-                new_height = int(original_height * ratio)
-            elif height and not width:
-                ratio = height / original_height
-                new_height = height
-                new_width = int(original_width * ratio)
-            else:
-                new_width = width
-                new_height = height
-            
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            img.save(output_file, "JPEG", quality=quality, optimize=True)
-
-        elif mode == 'percentage':
-            if not percentage:
-                raise ValueError("Percentage must be provided for percentage mode.")
-            
-            scale = percentage / 100.0
-            new_width = int(original_width * scale)
-            new_height = int(original_height * scale)
-            
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            img.save(output_file, "JPEG", quality=quality, optimize=True)
-
-        elif mode == 'target_size':
-            if not target_size_kb:
-                raise ValueError("Target size must be provided for target_size mode.")
-            
-            target_bytes = target_size_kb * 1024
-            
-            # Optimized approach using binary search for quality
-            # This reduces file writes from 10+ to 3-5
-            import io
-            
-            # First, try with optimize flag and high quality
-            img.save(output_file, "JPEG", quality=95, optimize=True)
-            current_size = output_file.stat().st_size
-            
-            if current_size <= target_bytes:
-                # Already under target with high quality
-                return str(output_file)
-            
-            # Binary search for optimal quality (between 30 and 95)
-            min_quality = 30
-            max_quality = 95
-            best_quality = min_quality
-            
-            while min_quality <= max_quality:
-                mid_quality = (min_quality + max_quality) // 2
-                
-                # Test quality in memory first (faster than disk I/O)
-                buffer = io.BytesIO()
-                img.save(buffer, "JPEG", quality=mid_quality, optimize=True)
-                test_size = buffer.tell()
-                
-                if test_size <= target_bytes:
-                    # This quality works, try higher
-                    best_quality = mid_quality
-                    min_quality = mid_quality + 1
-                else:
-                    # Too large, try lower quality
-                    max_quality = mid_quality - 1
-            
-            # Save with best quality found
-            img.save(output_file, "JPEG", quality=best_quality, optimize=True)
-            
-            # If still too large, progressively resize dimensions
-            if output_file.stat().st_size > target_bytes:
-                scale_factor = 0.9
-                while output_file.stat().st_size > target_bytes:
-                    current_width, current_height = img.size
-                    new_width = int(current_width * scale_factor)
-                    new_height = int(current_height * scale_factor)
-                    
-                    if new_width < 10 or new_height < 10:
-                        break  # Stop if image gets too small
-                    
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    img.save(output_file, "JPEG", quality=best_quality, optimize=True)
+        if mode == 'target_size':
+            # All encodes happen in memory; the file is written exactly once
+            return fit_target_size(img, str(output_file), target_size_kb)
 
-        else:
-            raise ValueError(f"Unknown resize mode: {mode}")
+        img = resized(img, mode, width=width, height=height, percentage=percentage)
+        img.save(output_file, "JPEG", quality=quality, optimize=True)
 
     return str(output_file)
 
 
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _tile_sample(img: Image.Image) -> Image.Image:
+    """
+    Builds a mosaic of tiles spread over img, about TARGET_PROBE_PIXELS in size.
+
+    Unlike a downsampled copy, tiles keep full-size detail per pixel, so their
+    bytes-per-pixel tracks the full-size JPEG at every quality.
+    """
+    if img.width * img.height <= 2 * TARGET_PROBE_PIXELS:
+        return img
+
+    grid = TARGET_PROBE_GRID
+    tile = int(math.sqrt(TARGET_PROBE_PIXELS) / grid) // 16 * 16
+    tile = min(tile, img.width // grid, img.height // grid)
+    mosaic = Image.new(img.mode, (tile * grid, tile * grid))
+    for row in range(grid):
+        for col in range(grid):
+            left = (img.width - tile) * col // (grid - 1)
+            top = (img.height - tile) * row // (grid - 1)
+            mosaic.paste(img.crop((left, top, left + tile, top + tile)), (col * tile, row * tile))
+    return mosaic
+
+
+def _fit_target_size(img: Image.Image, target_bytes: int) -> bytes:
+    """
+    Encodes img as a JPEG of at most target_bytes, scaling it down if needed.
+
+    Quality is chosen from probe encodes of a tile sample, calibrated against
+    one full-size encode. If no quality fits at full size, the image is scaled
+    down as little as possible: the scale is solved at TARGET_MIN_QUALITY from
+    a power-law fit of size against scale, seeded by a downsampled copy and
+    refined by each attempt, and each candidate scale then gets the highest
+    quality up to TARGET_SCALED_QUALITY that still fits. The largest fitting
+    area wins. Only a few full-size resizes/encodes are needed, and an attempt
+    is accepted once it lands between TARGET_FILL_RATIO and 100% of the
+    target. Best effort: returns the last attempt if nothing fits.
+
+    Args:
+        img: Prepared (RGB/L) image.
+        target_bytes: Maximum encoded size.
+
+    Returns:
+        The JPEG bytes.
+    """
+    data = _encode_jpeg(img, TARGET_MAX_QUALITY)
+    if len(data) <= target_bytes:
+        return data
+
+    pixels = img.width * img.height
+    sample = _tile_sample(img)
+    sample_pixels = sample.width * sample.height
+    sample_bpp: Dict[int, float] = {}
+
+    def bytes_per_pixel(quality: int) -> float:
+        if quality not in sample_bpp:
+            sample_bpp[quality] = max(1, len(_encode_jpeg(sample, quality))) / sample_pixels
+        return sample_bpp[quality]
+
+    # Full-size bytes / sample-predicted bytes, refined by every full-size encode
+    gain = len(data) / (bytes_per_pixel(TARGET_MAX_QUALITY) * pixels)
+    best = None
+    attempts = 0
+
+    def accept(candidate: bytes) -> bool:
+        """Records candidate if it fits; True once it is close enough to stop."""
+        nonlocal best
+        if len(candidate) > target_bytes:
+            return False
+        if best is None or len(candidate) > len(best):
+            best = candidate
+        return len(candidate) >= target_bytes * TARGET_FILL_RATIO
+
+    # 1. Highest quality predicted to fit at full size
+    tried = set()
+    while attempts < TARGET_MAX_ATTEMPTS:
+        low, high, quality = TARGET_MIN_QUALITY, TARGET_MAX_QUALITY - 1, None
+        while low <= high:
+            mid = (low + high) // 2
+            if bytes_per_pixel(mid) * pixels * gain <= target_bytes:
+                quality, low = mid, mid + 1
+            else:
+                high = mid - 1
+        if quality is None or quality in tried:
+            break
+        tried.add(quality)
+        attempts += 1
+
+        data = _encode_jpeg(img, quality)
+        if accept(data):
+            return data
+        gain = len(data) / (bytes_per_pixel(quality) * pixels)
+
+    if best is not None:
+        return best
+
+    # 2. Scale down: size ~ scale ** exponent at the lowest quality, between measured points
+    floor = TARGET_MIN_QUALITY
+    factor = max(2, int(math.sqrt(pixels / TARGET_PROBE_PIXELS)))
+    reduced = img.reduce(factor)
+    points = [
+        (1.0, bytes_per_pixel(floor) * pixels * gain),
+        (1 / factor, len(_encode_jpeg(reduced, floor))),
+    ]
+
+    def fit_exponent() -> float:
+        (s1, b1), (s2, b2) = points[-2:]
+        if s1 == s2 or b1 <= 0 or b2 <= 0 or b1 == b2:
+            return TARGET_DEFAULT_EXPONENT
+        return min(3.0, max(0.5, math.log(b1 / b2) / math.log(s1 / s2)))
+
+    def raise_quality(scaled: Image.Image, floor_data: bytes) -> bytes:
+        """Highest quality up to TARGET_SCALED_QUALITY predicted to fit, checked by encoding."""
+        ratio = len(floor_data) / bytes_per_pixel(floor)
+        low, high, quality = floor + 1, TARGET_SCALED_QUALITY, None
+        while low <= high:
+            mid = (low + high) // 2
+            if bytes_per_pixel(mid) * ratio <= target_bytes:
+                quality, low = mid, mid + 1
+            else:
+                high = mid - 1
+        if quality is None:
+            return floor_data
+        candidate = _encode_jpeg(scaled, quality)
+        return candidate if len(candidate) <= target_bytes else floor_data
+
+    best_area = 0
+    last_size = None
+    while attempts < TARGET_MAX_ATTEMPTS:
+        exponent = fit_exponent()
+        usable = [p for p in points if p[1] > 0] or [(1.0, float(target_bytes))]
+        base_scale, base_bytes = min(usable, key=lambda p: abs(math.log(p[1] / target_bytes)))
+        scale = min(1.0, base_scale * (target_bytes / base_bytes) ** (1 / exponent))
+
+        new_size = (int(img.width * scale), int(img.height * scale))
+        if min(new_size) < 10 or new_size == last_size:
+            break  # Too small, or the fit has converged
+        last_size = new_size
+        attempts += 1
+
+        scaled = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+        data = _encode_jpeg(scaled, floor)
+        points.append((scale, len(data)))
+        if len(data) > target_bytes:
+            continue
+        area = new_size[0] * new_size[1]
+        if area > best_area:
+            best_area, best = area, raise_quality(scaled, data)
+        if len(data) >= target_bytes * TARGET_FILL_RATIO:
+            break  # Close enough to the largest area that fits
+
+    return best if best is not None else data
+
+
 def crop_image(input_path: str, output_dir: str, 
                x: int, y: int, width: int, height: int, 
                quality: int = 95) -> str:
@@ -193,17 +542,67 @@ def crop_image(input_path: str, output_dir: str,
     output_file = Path(output_dir) / f"{input_file.stem}_cropped.jpg"
     
     with Image.open(input_file) as img:
-        img = _prepare_image(img)
-            
-        # Ensure crop box is within bounds
-        img_width, img_height = img.size
-        x = max(0, x)
-        y = max(0, y)
-        right = min(img_width, x + width)
-        lower = min(img_height, y + height)
-        
-        cropped_img = img.crop((x, y, right, lower))
+        cropped_img = cropped(img, x, y, width, height)
         cropped_img.save(output_file, "JPEG", quality=quality, optimize=True)
     
     return str(output_file)
 
+
+def cropped(img: Image.Image, x: int, y: int, width: int, height: int) -> Image.Image:
+    """
+    Crops an image in memory; the box is clamped to the displayed (EXIF-oriented) image.
+
+    Args:
+        img: PIL Image, freshly opened or already processed.
+        x: X coordinate of the top-left corner.
+        y: Y coordinate of the top-left corner.
+        width: Width of the crop box.
+        height: Height of the crop box.
+
+    Returns:
+        The cropped, upright RGB image.
+
+    Raises:
+        ValueError: If the box does not overlap the image.
+    """
+    # Ensure crop box is within bounds (of the displayed, EXIF-oriented image)
+    img_width, img_height = _oriented_size(img)
+    x = max(0, x)
+    y = max(0, y)
+    right = min(img_width, x + width)
+    lower = min(img_height, y + height)
+    if right <= x or lower <= y:
+        raise ValueError("Crop box is outside the image.")
+
+    return _prepare_image(img, box=(x, y, right, lower))
+
+
+def save_jpeg(img: Image.Image, output_path: str, quality: int = 95, optimize: bool = True) -> str:
+    """
+    Writes an in-memory image (as returned by resized/cropped, or freshly opened) as JPEG.
+
+    Args:
+        img: PIL Image.
+        output_path: Path of the JPEG to write.
+        quality: JPEG quality.
+        optimize: Optimize Huffman tables (slower encode, slightly smaller file).
+
+    Returns:
+        Path to the written JPEG.
+    """
+    _prepare_image(img).save(output_path, "JPEG", quality=quality, optimize=optimize)
+    return str(output_path)
+
+
+def fit_target_size(img: Image.Image, output_path: str, target_size_kb: int) -> str:
+    """
+    Writes an in-memory image as the best JPEG under target_size_kb (see resize_image).
+
+    Returns:
+        Path to the written JPEG.
+    """
+    if not target_size_kb:
+        raise ValueError("Target size must be provided for target_size mode.")
+    Path(output_path).write_bytes(_fit_target_size(_prepare_image(img), target_size_kb * 1024))
+    return str(output_path)
+
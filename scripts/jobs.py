@@ -0,0 +1,139 @@
+"""
+Background job subsystem for File Forge.
+
+Long-running conversions (e.g. AI layout recovery) are submitted here so the
+HTTP request can return immediately with a job id that the client polls.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Optional
+from scripts.cancellation import CancellationToken, OperationCancelled
+from scripts.executors import ai_executor
+
+
+# Finished jobs are kept around this long so clients can still poll the result
+JOB_RETENTION_SECONDS = 60 * 60
+
+
+class JobManager:
+    """
+    Runs submitted callables on a bounded worker pool and tracks their status.
+
+    Each job is a plain dict with keys: job_id, status ('queued', 'running',
+    'completed', 'failed', 'cancelled'), progress ({'current', 'total'}), filename, error,
+    created_at and finished_at.
+    """
+
+    def __init__(self, max_workers: int = 1, retention_seconds: int = JOB_RETENTION_SECONDS,
+                 executor: Executor = None):
+        # A shared executor (e.g. the AI pool) can be supplied instead of a private one
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fileforge-job")
+        self._jobs = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.retention_seconds = retention_seconds
+
+    def submit(self, func: Callable[..., str], *args, cleanup: Callable[[], None] = None,
+               cancellable: bool = False, **kwargs) -> str:
+        """
+        Queue func(*args, progress_callback=..., **kwargs) and return its job id.
+
+        func must return the output path; its basename is exposed as the job
+        filename. cleanup, if given, always runs once the job has finished.
+        A cancellable func also gets cancel_token=..., which cancel() sets.
+        """
+        self._prune()
+        job_id = uuid.uuid4().hex
+        token = CancellationToken()
+        if cancellable:
+            kwargs["cancel_token"] = token
+        with self._lock:
+            self._tokens[job_id] = token
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "progress": {"current": 0, "total": 0},
+                "filename": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+
+        def progress_callback(current: int, total: int) -> None:
+            self._update(job_id, progress={"current": current, "total": total})
+
+        def run() -> None:
+            try:
+                # A job cancelled while queued never starts
+                token.check()
+                self._update(job_id, status="running")
+                output_path = func(*args, progress_callback=progress_callback, **kwargs)
+                self._update(job_id, status="completed", filename=os.path.basename(output_path),
+                             finished_at=time.time())
+            except OperationCancelled:
+                print(f"[JOBS] Job {job_id} cancelled")
+                self._update(job_id, status="cancelled", finished_at=time.time())
+            except Exception as e:
+                print(f"[JOBS] Job {job_id} failed: {e}")
+                self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            finally:
+                with self._lock:
+                    self._tokens.pop(job_id, None)
+                if cleanup is not None:
+                    cleanup()
+
+        self._executor.submit(run)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Returns a snapshot of the job, or None if it is unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, "progress": dict(job["progress"])}
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Asks a queued or running job to stop; returns False if it is unknown or already finished.
+
+        A running job stops at its func's next cancellation check, so it may
+        still complete.
+        """
+        with self._lock:
+            token = self._tokens.get(job_id)
+            if token is None:
+                return False
+            token.cancel()
+            job = self._jobs.get(job_id)
+            if job is not None and job["status"] == "queued":
+                # Reported right away; the worker skips it when its turn comes
+                job.update(status="cancelled", finished_at=time.time())
+        return True
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than the retention window."""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
+
+
+# AI conversion jobs share the AI pool with workflow AI steps (FILE_FORGE_AI_WORKERS)
+ai_jobs = JobManager(executor=ai_executor)
@@ -1,9 +1,14 @@
+import hashlib
+import multiprocessing
+import queue
 import threading
 import pikepdf
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from pdf2docx import Converter
 import os
-from typing import List
+from typing import Callable, List, Optional
 
 # Disable MKL-DNN/OneDNN to fix compatibility issues on Windows
 # Must be set BEFORE importing paddle/paddleocr
@@ -20,6 +25,11 @@ import numpy as np
 from docxcompose.composer import Composer
 from docx import Document as Document_docx
 import shutil
+from scripts.cancellation import CancellationToken, check_cancelled
+from scripts.executors import (
+    DOCX_PARALLEL_PROCESSES, IMAGE_WORKERS, discard_docx_chunk_pool, get_docx_chunk_pool, image_executor,
+)
+from scripts.result_cache import ResultCache
 
 
 # Global cache for PaddleOCR engine to avoid expensive re-initialization
@@ -130,158 +140,440 @@ def _parse_page_selection(pages: str, total_pages: int) -> List[int]:
 
     return indices
 
-def _get_decrypted_pdf_path(input_path: str, password: str = None, temp_dir: Path = None) -> tuple:
+def _open_pdf_fitz(input_path: str, password: str = None) -> fitz.Document:
     """
-    Returns (path_to_use, needs_cleanup).
-    If encrypted and password provided, decrypts to temp file.
-    If encrypted and no password, raises ValueError.
-    If not encrypted, returns original path.
+    Opens a PDF with fitz, authenticating in memory if it is encrypted.
+    If encrypted and no password (or a wrong one) is given, raises ValueError.
+    """
+    doc = fitz.open(input_path)
+    if doc.needs_pass:
+        if not password:
+            doc.close()
+            raise ValueError(f"PDF is password-protected. Please provide a password.")
+        if not doc.authenticate(password):
+            doc.close()
+            raise ValueError(f"Incorrect password for the PDF.")
+    return doc
+
+def check_pdf_password(input_path: str, password: str = None) -> None:
+    """Raises ValueError unless the PDF opens with password (any password opens an unencrypted PDF)."""
+    _open_pdf_fitz(input_path, password).close()
+
+def _open_pdf_pikepdf(input_path: str, password: str = None) -> pikepdf.Pdf:
+    """
+    Opens a PDF with pikepdf, decrypting in memory if it is encrypted.
+    If encrypted and no password (or a wrong one) is given, raises ValueError.
     """
-    input_file = Path(input_path)
-    
-    # Try to open PDF - check if encrypted in a single operation
     try:
-        with pikepdf.open(input_file) as pdf:
-            # PDF is not encrypted or has no password
-            return str(input_file), False
+        return pikepdf.open(input_path, password=password or "")
     except pikepdf.PasswordError:
-        # PDF is encrypted - need password
         if not password:
             raise ValueError(f"PDF is password-protected. Please provide a password.")
-        
-        # Decrypt to temp file
-        if temp_dir is None:
-            temp_dir = input_file.parent
-        
-        temp_file = temp_dir / f"{input_file.stem}_temp_decrypted.pdf"
-        
-        with pikepdf.open(input_file, password=password) as pdf:
-            pdf.save(temp_file)
-        
-        return str(temp_file), True
+        raise ValueError(f"Incorrect password for the PDF.")
 
 def extract_pdf_pages(input_path: str, output_dir: str, pages: str, password: str = None) -> str:
     """Extract selected pages from PDF and save to output_dir."""
     input_file = Path(input_path)
     output_file = Path(output_dir) / f"{input_file.stem}_extracted.pdf"
 
-    decrypted_path, needs_cleanup = _get_decrypted_pdf_path(input_path, password)
-
-    try:
-        with pikepdf.open(decrypted_path) as pdf:
-            selected_indices = _parse_page_selection(pages, len(pdf.pages))
+    with _open_pdf_pikepdf(input_path, password) as pdf:
+        selected_indices = _parse_page_selection(pages, len(pdf.pages))
 
-            new_pdf = pikepdf.Pdf.new()
-            for idx in selected_indices:
-                new_pdf.pages.append(pdf.pages[idx])
+        new_pdf = pikepdf.Pdf.new()
+        for idx in selected_indices:
+            new_pdf.pages.append(pdf.pages[idx])
 
-            new_pdf.save(output_file)
-    finally:
-        if needs_cleanup:
-            Path(decrypted_path).unlink(missing_ok=True)
+        new_pdf.save(output_file)
 
     return str(output_file)
 
-def compress_pdf(input_path: str, output_dir: str, level: str = 'medium', password: str = None) -> dict:
-    """Compress PDF by optimizing structure and resampling large images.
-    
-    Returns dict with output_path, original_size, compressed_size, reduction_pct.
+# Images handed to the image pool at once; bounds memory to a few decoded images
+COMPRESS_MAX_IN_FLIGHT = 2 * IMAGE_WORKERS
+# Bilevel scan encodings that a JPEG re-encode can only make larger
+BILEVEL_FILTERS = ('JBIG2Decode', 'CCITTFaxDecode')
+# Images with at most this many distinct colours are flat graphics and are re-encoded losslessly
+FLAT_IMAGE_MAX_COLORS = 256
+# (max_dim, jpeg_quality) steps searched by target-size compression, best quality first
+TARGET_SIZE_LADDER = (
+    (2400, 85), (2000, 80), (1600, 75), (1200, 72), (1000, 60),
+    (800, 45), (640, 35), (480, 25), (320, 20),
+)
+# Full compress-and-save passes allowed when the saved file still misses the target
+TARGET_SIZE_ATTEMPTS = 2
+
+def _iter_image_xrefs(doc):
+    """Yields (page_number, img_info) for each image in doc once, with the first page using it.
+
+    img_info is the get_images(full=True) tuple: (xref, smask, width, height,
+    bpc, colorspace, alt_colorspace, name, filter, referencer).
+    """
+    seen = set()
+    for page in doc:
+        for img_info in page.get_images(full=True):
+            xref = img_info[0]
+            if xref not in seen:
+                seen.add(xref)
+                yield page.number, img_info
+
+def _open_jpeg_draft(doc, xref: int, width: int, height: int, max_dim: int):
+    """
+    Opens a DCT-encoded image straight from its stream, set up to decode at reduced size.
+
+    Pillow's draft() lets libjpeg scale by 1/2, 1/4 or 1/8 while decoding, so a
+    large photo never exists at full resolution. The decode itself is lazy and
+    happens on whichever thread first touches the pixels. Returns None for JPEG
+    flavours (CMYK, YCCK) that are safer to decode through fitz.
     """
     import io
     from PIL import Image as PILImage
 
-    input_file = Path(input_path)
-    output_file = Path(output_dir) / f"{input_file.stem}_compressed.pdf"
+    extracted = doc.extract_image(xref)
+    if extracted.get("ext") not in ("jpeg", "jpg"):
+        return None
+
+    pil_img = PILImage.open(io.BytesIO(extracted["image"]))
+    if pil_img.mode not in ("RGB", "L") or pil_img.size != (width, height):
+        return None
+
+    factor = min(1.0, max_dim / max(width, height))
+    pil_img.draft(pil_img.mode, (max(1, int(width * factor)), max(1, int(height * factor))))
+    return pil_img
+
+def _decode_pdf_image(doc, img_info: tuple, max_dim: int, reencode_all: bool = False):
+    """Returns image img_info as a PIL image, or None if it is a bilevel scan or,
+    unless reencode_all is set, already fits max_dim.
+
+    Must run on the thread that owns doc.
+    """
+    from PIL import Image as PILImage
 
-    decrypted_path, needs_cleanup = _get_decrypted_pdf_path(input_path, password)
+    xref, width, height, bpc, image_filter = img_info[0], img_info[2], img_info[3], img_info[4], img_info[8]
+    if not reencode_all and width <= max_dim and height <= max_dim:
+        return None
+    if image_filter in BILEVEL_FILTERS or bpc == 1:
+        return None
+
+    if image_filter == "DCTDecode":
+        pil_img = _open_jpeg_draft(doc, xref, width, height, max_dim)
+        if pil_img is not None:
+            return pil_img
+
+    pix = fitz.Pixmap(doc, xref)
+    if pix.n > 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+
+    mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[pix.n]
+    return PILImage.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+def _stream_length(doc, xref: int) -> int:
+    """Returns the stored (still encoded) size of stream xref in bytes."""
+    kind, value = doc.xref_get_key(xref, "Length")
+    if kind == "int":
+        return int(value)
+    return len(doc.xref_stream_raw(xref))
+
+def _recompress_image(pil_img, max_dim: int, jpeg_quality: int) -> tuple:
+    """
+    Downscales pil_img to fit max_dim and re-encodes it (runs on the image pool).
+
+    Flat graphics (few distinct colours, e.g. charts and logos) are encoded as
+    PNG, which the PDF stores flate-compressed and lossless; everything else
+    becomes a JPEG. Grayscale stays single-channel. Returns (data, format).
+    """
+    import io
+    from PIL import Image as PILImage
+
+    # Decoded JPEGs are photos by construction; counting their colours is wasted work
+    flat = pil_img.format != 'JPEG' and pil_img.getcolors(FLAT_IMAGE_MAX_COLORS) is not None
+
+    factor = max_dim / max(pil_img.width, pil_img.height)
+    if factor < 1:
+        new_w = max(1, int(pil_img.width * factor))
+        new_h = max(1, int(pil_img.height * factor))
+        pil_img = pil_img.resize((new_w, new_h), PILImage.LANCZOS)
+
+    if pil_img.mode not in ('RGB', 'L'):
+        pil_img = pil_img.convert('RGB')
+
+    buf = io.BytesIO()
+    if flat:
+        pil_img.save(buf, format='PNG')
+        return buf.getvalue(), 'png'
+    pil_img.save(buf, format='JPEG', quality=jpeg_quality, optimize=True)
+    return buf.getvalue(), 'jpeg'
+
+def _encode_images(doc, max_dim: int, jpeg_quality: int, reencode_all: bool = False,
+                   cancel_token: CancellationToken = None):
+    """
+    Re-encodes doc's images in memory, yielding each result as it completes.
+
+    Extraction stays on the calling (fitz) thread, while decoding, resizing and
+    encoding run concurrently on the image pool, where Pillow releases the GIL.
+    Embedded JPEGs are decoded at reduced scale. At most COMPRESS_MAX_IN_FLIGHT
+    decoded images are held at once.
+
+    Yields (page_number, xref, format, original_size, data) per image. format
+    is None for images that were not re-encoded; data is None unless the
+    re-encode is smaller than the original stream. Closing the generator early
+    cancels any queued work, as does cancel_token, checked before each image.
+    """
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            page_number, xref, original_size = pending.pop(future)
+            try:
+                data, image_format = future.result()
+            except Exception as e:
+                print(f"[COMPRESS] Skipping image xref {xref}: {e}")
+                yield page_number, xref, None, original_size, None
+                continue
+            yield page_number, xref, image_format, original_size, data if len(data) < original_size else None
 
     try:
-        original_size = input_file.stat().st_size
-        doc = fitz.open(decrypted_path)
-
-        if level in ('medium', 'high'):
-            max_dim = {'medium': 1200, 'high': 800}[level]
-            jpeg_quality = {'medium': 72, 'high': 45}[level]
-
-            xrefs_processed = set()
-            for page in doc:
-                for img_info in page.get_images(full=True):
-                    xref = img_info[0]
-                    if xref in xrefs_processed:
-                        continue
-                    xrefs_processed.add(xref)
-                    try:
-                        pix = fitz.Pixmap(doc, xref)
-
-                        if pix.width <= max_dim and pix.height <= max_dim:
-                            pix = None
-                            continue
-
-                        if pix.n > 3:
-                            pix = fitz.Pixmap(fitz.csRGB, pix)
-
-                        mode = "RGB" if pix.n == 3 else "RGBA"
-                        pil_img = PILImage.frombytes(mode, (pix.width, pix.height), pix.samples)
-
-                        factor = max_dim / max(pix.width, pix.height)
-                        new_w = max(1, int(pix.width * factor))
-                        new_h = max(1, int(pix.height * factor))
-                        pil_img = pil_img.resize((new_w, new_h), PILImage.LANCZOS)
-
-                        if pil_img.mode != 'RGB':
-                            pil_img = pil_img.convert('RGB')
-
-                        buf = io.BytesIO()
-                        pil_img.save(buf, format='JPEG', quality=jpeg_quality, optimize=True)
-                        jpeg_bytes = buf.getvalue()
-
-                        doc.replace_image(xref, stream=jpeg_bytes)
-                        pix = None
-
-                    except Exception as e:
-                        print(f"[COMPRESS] Skipping image xref {xref}: {e}")
-                        continue
-
-        doc.save(
-            str(output_file),
-            garbage=4,
-            deflate=True,
-            deflate_images=True,
-            deflate_fonts=True,
-            clean=True,
-        )
-        doc.close()
+        for page_number, img_info in _iter_image_xrefs(doc):
+            check_cancelled(cancel_token)
+            xref = img_info[0]
+            original_size = _stream_length(doc, xref)
+            try:
+                pil_img = _decode_pdf_image(doc, img_info, max_dim, reencode_all)
+            except Exception as e:
+                print(f"[COMPRESS] Skipping image xref {xref}: {e}")
+                pil_img = None
+            if pil_img is None:
+                yield page_number, xref, None, original_size, None
+                continue
+
+            if len(pending) >= COMPRESS_MAX_IN_FLIGHT:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+            future = image_executor.submit(_recompress_image, pil_img, max_dim, jpeg_quality)
+            pending[future] = (page_number, xref, original_size)
+
+        yield from collect(as_completed(list(pending)))
+    finally:
+        for future in pending:
+            future.cancel()
 
-        compressed_size = output_file.stat().st_size
-        reduction = max(0.0, (1 - compressed_size / original_size) * 100)
+def _apply_encoded(doc, encoded) -> List[dict]:
+    """
+    Writes re-encoded images from _encode_images back into doc.
 
-        return {
-            'output_path': str(output_file),
+    Returns one report per re-encoded image: page (1-based), xref, format,
+    original_size, new_size and replaced.
+    """
+    reports = []
+    for page_number, xref, image_format, original_size, data in encoded:
+        if image_format is None:
+            continue
+        replaced = data is not None
+        try:
+            if replaced:
+                # Replacing the xref in place updates every page that shows the image
+                doc[page_number].replace_image(xref, stream=data)
+        except Exception as e:
+            print(f"[COMPRESS] Skipping image xref {xref}: {e}")
+            replaced = False
+        reports.append({
+            'page': page_number + 1,
+            'xref': xref,
+            'format': image_format,
             'original_size': original_size,
-            'compressed_size': compressed_size,
-            'reduction_pct': round(reduction, 1),
-        }
+            'new_size': len(data) if replaced else original_size,
+            'replaced': replaced,
+        })
+    return sorted(reports, key=lambda r: (r['page'], r['xref']))
 
-    finally:
-        if needs_cleanup:
-            Path(decrypted_path).unlink(missing_ok=True)
+def _resample_images(doc, max_dim: int, jpeg_quality: int, cancel_token: CancellationToken = None) -> List[dict]:
+    """Replaces images larger than max_dim with smaller re-encodes as they complete."""
+    return _apply_encoded(doc, _encode_images(doc, max_dim, jpeg_quality, cancel_token=cancel_token))
 
+def _resample_to_budget(doc, image_budget: int, cancel_token: CancellationToken = None) -> tuple:
+    """
+    Re-encodes doc's images at the best TARGET_SIZE_LADDER step that fits image_budget bytes.
 
-def pdf_to_docx(input_path: str, output_dir: str, password: str = None) -> str:
-    """Converts PDF to DOCX using pdf2docx (Fast, Rule-based)."""
+    Steps are binary-searched with in-memory encodes only; a probe stops as soon
+    as its running total passes the budget, and the winning probe's encodes are
+    applied directly, so the document itself is never rewritten during the
+    search. Falls back to the smallest step if none fits.
+
+    Returns (reports, fits) with reports as in _apply_encoded.
+    """
+    original_total = sum(_stream_length(doc, info[0]) for _, info in _iter_image_xrefs(doc))
+    if original_total <= image_budget:
+        return [], True
+
+    def probe(step: int) -> Optional[list]:
+        max_dim, jpeg_quality = TARGET_SIZE_LADDER[step]
+        results, total = [], 0
+        encoded = _encode_images(doc, max_dim, jpeg_quality, reencode_all=True, cancel_token=cancel_token)
+        try:
+            for result in encoded:
+                data, original_size = result[4], result[3]
+                total += len(data) if data is not None else original_size
+                if total > image_budget:
+                    return None
+                results.append(result)
+        finally:
+            encoded.close()
+        return results
+
+    low, high, best = 0, len(TARGET_SIZE_LADDER) - 1, None
+    while low <= high:
+        step = (low + high) // 2
+        results = probe(step)
+        print(f"[COMPRESS] Target probe {TARGET_SIZE_LADDER[step]}: {'fits' if results is not None else 'too large'}")
+        if results is None:
+            low = step + 1
+        else:
+            best, high = results, step - 1
+
+    if best is None:
+        max_dim, jpeg_quality = TARGET_SIZE_LADDER[-1]
+        encoded = _encode_images(doc, max_dim, jpeg_quality, reencode_all=True, cancel_token=cancel_token)
+        return _apply_encoded(doc, encoded), False
+    return _apply_encoded(doc, best), True
+
+def compress_pdf(input_path: str, output_dir: str, level: str = 'medium', password: str = None,
+                 target_size_kb: int = None, cancel_token: CancellationToken = None) -> dict:
+    """Compress PDF by optimizing structure and resampling large images.
+
+    With target_size_kb, level is ignored and images are re-encoded at the best
+    quality/dimension step that keeps the file under the target (best effort).
+    cancel_token, if given, is checked between images; cancelling raises
+    OperationCancelled before anything is written.
+    
+    Returns dict with output_path, original_size, compressed_size, reduction_pct
+    and images (per-image savings, see _apply_encoded); in target-size mode also
+    target_met.
+    """
+    if target_size_kb is not None and target_size_kb <= 0:
+        raise ValueError("Target size must be a positive number of KB.")
+
+    input_file = Path(input_path)
+    output_file = Path(output_dir) / f"{input_file.stem}_compressed.pdf"
+
+    original_size = input_file.stat().st_size
+    target_bytes = target_size_kb * 1024 if target_size_kb else None
+    image_budget = None
+
+    for _ in range(TARGET_SIZE_ATTEMPTS if target_bytes else 1):
+        doc = _open_pdf_fitz(input_path, password)
+
+        images, fits = [], True
+        try:
+            if target_bytes:
+                if image_budget is None:
+                    # Estimate: everything except the image streams keeps its current size
+                    image_bytes = sum(_stream_length(doc, info[0]) for _, info in _iter_image_xrefs(doc))
+                    image_budget = target_bytes - (original_size - image_bytes)
+                images, fits = _resample_to_budget(doc, image_budget, cancel_token)
+            elif level in ('medium', 'high'):
+                max_dim = {'medium': 1200, 'high': 800}[level]
+                jpeg_quality = {'medium': 72, 'high': 45}[level]
+                images = _resample_images(doc, max_dim, jpeg_quality, cancel_token)
+
+            doc.save(
+                str(output_file),
+                garbage=4,
+                deflate=True,
+                deflate_images=True,
+                deflate_fonts=True,
+                clean=True,
+            )
+        finally:
+            doc.close()
+
+        compressed_size = output_file.stat().st_size
+        if target_bytes is None or compressed_size <= target_bytes or not fits:
+            break
+        # The estimate was short; take the overshoot out of the image budget and retry
+        image_budget -= compressed_size - target_bytes
+
+    reduction = max(0.0, (1 - compressed_size / original_size) * 100)
+
+    result = {
+        'output_path': str(output_file),
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'reduction_pct': round(reduction, 1),
+        'images': images,
+    }
+    if target_bytes:
+        result['target_met'] = compressed_size <= target_bytes
+    return result
+
+
+# Documents with at least this many pages are converted in parallel page chunks
+DOCX_PARALLEL_MIN_PAGES = int(os.environ.get('FILE_FORGE_DOCX_PARALLEL_MIN_PAGES', '60'))
+# Smallest chunk worth a separate pdf2docx pass
+DOCX_MIN_CHUNK_PAGES = 10
+
+def _convert_docx_chunk(pdf_path: str, output_file: str, start: int, end: int,
+                        password: str = None) -> str:
+    """Converts pages [start, end) of pdf_path to output_file (process-pool entry point)."""
+    cv = Converter(pdf_path, password=password)
+    try:
+        cv.convert(output_file, start=start, end=end)
+    finally:
+        cv.close()
+    return output_file
+
+def _page_chunks(page_count: int, processes: int) -> List[tuple]:
+    """Splits page_count pages into (start, end) ranges, about two per process for balance."""
+    chunk = max(DOCX_MIN_CHUNK_PAGES, -(-page_count // (processes * 2)))
+    return [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+
+def _pdf_to_docx_parallel(pdf_path: str, output_file: Path, page_count: int, processes: int,
+                          pool: ProcessPoolExecutor, password: str = None) -> None:
+    """Converts page chunks concurrently on the shared chunk pool and merges them in order."""
+    chunks = _page_chunks(page_count, processes)
+    chunk_dir = output_file.parent / f"temp_{output_file.stem}_chunks"
+    chunk_dir.mkdir(exist_ok=True)
+    print(f"[DOCX] Converting {page_count} pages in {len(chunks)} chunks on the shared worker pool")
+
+    futures = []
+    try:
+        for i, (start, end) in enumerate(chunks):
+            futures.append(pool.submit(_convert_docx_chunk, pdf_path, str(chunk_dir / f"chunk_{i}.docx"),
+                                       start, end, password))
+        chunk_files = [future.result() for future in futures]
+
+        # The merge's page breaks stand in for the section breaks lost at chunk boundaries
+        merge_docx_files(chunk_files, str(output_file))
+    except BrokenProcessPool as e:
+        discard_docx_chunk_pool(pool)
+        raise RuntimeError("PDF to Word conversion crashed its worker process.") from e
+    finally:
+        for future in futures:
+            future.cancel()
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+def pdf_to_docx(input_path: str, output_dir: str, password: str = None, processes: int = None) -> str:
+    """Converts PDF to DOCX using pdf2docx (Fast, Rule-based).
+
+    Documents with at least DOCX_PARALLEL_MIN_PAGES pages are split into about
+    two page chunks per process (`processes` defaults to
+    FILE_FORGE_DOCX_PARALLEL_PROCESSES) and converted on the shared chunk pool
+    from scripts.executors; smaller ones use a single pass, as does any call
+    made inside a pdf2docx worker process.
+    """
     input_file = Path(input_path)
     output_file = Path(output_dir) / f"{input_file.stem}.docx"
+    if processes is None:
+        processes = DOCX_PARALLEL_PROCESSES
     
-    # Handle encrypted PDFs
-    decrypted_path, needs_cleanup = _get_decrypted_pdf_path(input_path, password)
-    
-    try:
-        cv = Converter(decrypted_path)
+    # Handle encrypted PDFs: pdf2docx authenticates in memory, so only check the password here
+    with _open_pdf_fitz(input_path, password) as doc:
+        page_count = len(doc)
+
+    pool = get_docx_chunk_pool() if processes > 1 and page_count >= DOCX_PARALLEL_MIN_PAGES else None
+    if pool is not None:
+        _pdf_to_docx_parallel(input_path, output_file, page_count, processes, pool, password)
+    else:
+        cv = Converter(input_path, password=password)
         cv.convert(str(output_file))
         cv.close()
-    finally:
-        if needs_cleanup:
-            Path(decrypted_path).unlink(missing_ok=True)
     
     return str(output_file)
 
@@ -299,14 +591,229 @@ def merge_docx_files(input_files: list, output_file: str) -> None:
 
     composer.save(output_file)
 
-def pdf_to_word_paddle(input_path: str, output_dir: str, password: str = None) -> str:
-    """Converts PDF to DOCX using PaddleOCR Layout Recovery (Slow, AI-based)."""
-    # Deferred imports for utility functions that depend on paddleocr
+def _load_recovery_helpers():
+    """Deferred imports for utility functions that depend on paddleocr."""
     try:
         from paddleocr import save_structure_res
         from paddleocr.ppstructure.recovery.recovery_to_doc import sorted_layout_boxes, convert_info_docx
     except ImportError:
         raise ImportError("PaddleOCR sub-modules could not be loaded. Please check your installation.")
+    return save_structure_res, sorted_layout_boxes, convert_info_docx
+
+def _render_page_bgr(page) -> np.ndarray:
+    """Renders a fitz page to a BGR array suitable for PaddleOCR."""
+    # 200 DPI is a good balance between speed and quality for OCR
+    pix = page.get_pixmap(dpi=200)
+    img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
+
+    # Convert to BGR if needed (PyMuPDF gives RGB)
+    if pix.n == 3: # RGB
+        return cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+    elif pix.n == 4: # RGBA
+        return cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(img_array, cv2.COLOR_GRAY2BGR)
+
+def _recover_page_docx(table_engine, img: np.ndarray, temp_dir: Path, page_index: int) -> Optional[Path]:
+    """Runs layout recovery on one rendered page and returns its DOCX path (None if missing)."""
+    # Run inference
+    result = table_engine(img)
+    return _write_page_docx(img, result, temp_dir, page_index)
+
+def _write_page_docx(img: np.ndarray, result: list, temp_dir: Path, page_index: int) -> Optional[Path]:
+    """Saves a page's structure result and converts it to DOCX (None if missing)."""
+    save_structure_res, sorted_layout_boxes, convert_info_docx = _load_recovery_helpers()
+
+    # Save structure result (images, excels)
+    page_name = f"page_{page_index}"
+    save_structure_res(result, str(temp_dir), page_name)
+
+    # Convert to DOCX using recovery module
+    h, w, _ = img.shape
+    res = sorted_layout_boxes(result, w)
+    convert_info_docx(img, res, str(temp_dir), page_name)
+
+    # The docx is saved as {page_name}_ocr.docx in temp_dir
+    expected_docx = temp_dir / f"{page_name}_ocr.docx"
+    if expected_docx.exists():
+        return expected_docx
+    print(f"Warning: Could not find recovered docx for page {page_index}")
+    return None
+
+
+def _page_cache_key(img: np.ndarray) -> str:
+    """Cache key for a rendered page: identical rasters share recovered DOCX output."""
+    raster_hash = hashlib.sha256(np.ascontiguousarray(img).data).hexdigest()
+    return ResultCache.make_key(raster_hash, "paddle_page", {"dpi": 200, "shape": list(img.shape)})
+
+def _lookup_cached_page(page_cache: Optional[ResultCache], cache_key: Optional[str],
+                        temp_dir: Path, page_index: int) -> Optional[Path]:
+    """Copies a cached per-page DOCX into temp_dir, returning its path on a hit."""
+    if page_cache is None or cache_key is None:
+        return None
+    hit = page_cache.lookup(cache_key, temp_dir, f"page_{page_index}")
+    return Path(hit[0]) if hit else None
+
+
+# Pages buffered between pipeline stages; bounds memory to a few rendered pixmaps
+PIPELINE_DEPTH = 2
+
+def _recover_pages_pipelined(doc, table_engine, temp_dir: Path,
+                             progress_callback: Callable[[int, int], None] = None,
+                             page_cache: ResultCache = None,
+                             cancel_token: CancellationToken = None) -> List[Path]:
+    """
+    Recovers every page of doc with rendering, inference and DOCX writing overlapped.
+
+    A render thread rasterizes upcoming pages while the calling thread runs
+    inference, and a writer thread handles save_structure_res/convert_info_docx.
+    Pages found in page_cache skip inference and writing entirely.
+    The first error from any stage stops the pipeline and is re-raised;
+    cancel_token is checked before each page's inference.
+    """
+    total_pages = len(doc)
+    rendered = queue.Queue(maxsize=PIPELINE_DEPTH)
+    inferred = queue.Queue(maxsize=PIPELINE_DEPTH)
+    stop = threading.Event()
+    errors = []
+    docx_files = {}
+
+    def render() -> None:
+        try:
+            for i, page in enumerate(doc):
+                if stop.is_set():
+                    return
+                img = _render_page_bgr(page)
+                cache_key = _page_cache_key(img) if page_cache is not None else None
+                rendered.put((i, img, cache_key))
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            rendered.put(None)
+
+    def write() -> None:
+        # Keeps draining after a failure so the inference stage never blocks
+        while True:
+            item = inferred.get()
+            if item is None:
+                return
+            if stop.is_set():
+                continue
+            i, img, result, cache_key = item
+            try:
+                if img is None:
+                    # Served from the page cache by the inference stage
+                    docx_files[i] = result
+                else:
+                    docx_files[i] = _write_page_docx(img, result, temp_dir, i)
+                    if cache_key is not None and docx_files[i]:
+                        page_cache.store(cache_key, str(docx_files[i]), f"page_{i}")
+                if progress_callback:
+                    progress_callback(len(docx_files), total_pages)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+    render_thread = threading.Thread(target=render, name="paddle-render", daemon=True)
+    writer_thread = threading.Thread(target=write, name="paddle-writer", daemon=True)
+    render_thread.start()
+    writer_thread.start()
+
+    try:
+        while not stop.is_set():
+            item = rendered.get()
+            if item is None:
+                break
+            check_cancelled(cancel_token)
+            i, img, cache_key = item
+            cached_docx = _lookup_cached_page(page_cache, cache_key, temp_dir, i)
+            if cached_docx is not None:
+                inferred.put((i, None, cached_docx, None))
+            else:
+                inferred.put((i, img, table_engine(img), cache_key))
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        # Unblock the render thread if inference stopped early
+        while render_thread.is_alive():
+            try:
+                rendered.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        inferred.put(None)
+        writer_thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return [docx_files[i] for i in sorted(docx_files) if docx_files[i]]
+
+
+# Worker processes for page-parallel AI conversion; 1 keeps the serial in-process path
+PADDLE_PROCESSES = int(os.environ.get('FILE_FORGE_PADDLE_PROCESSES', '1'))
+
+# Process pools are cached per size so each worker loads its ONNX models only once
+_PADDLE_POOLS = {}
+_POOL_LOCK = threading.Lock()
+
+def _init_paddle_worker() -> None:
+    """Process-pool initializer: warms this worker's own PaddleOCR engine."""
+    get_paddle_engine()
+
+def get_paddle_process_pool(processes: int) -> ProcessPoolExecutor:
+    """Returns a cached process pool whose workers each hold their own PaddleOCR engine."""
+    with _POOL_LOCK:
+        pool = _PADDLE_POOLS.get(processes)
+        if pool is None:
+            print(f"[AI] Starting {processes} PaddleOCR worker processes...")
+            # spawn avoids forking a parent that already runs threads and ONNX sessions
+            pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_paddle_worker,
+            )
+            _PADDLE_POOLS[processes] = pool
+    return pool
+
+def _discard_paddle_process_pool(processes: int, pool: ProcessPoolExecutor) -> None:
+    """Drops a broken pool (crashed worker, failed initializer) so the next call starts a fresh one."""
+    with _POOL_LOCK:
+        if _PADDLE_POOLS.get(processes) is pool:
+            del _PADDLE_POOLS[processes]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _recover_page_in_worker(pdf_path: str, page_index: int, temp_dir: str,
+                            page_cache: ResultCache = None, password: str = None) -> Optional[str]:
+    """Process-pool entry point: renders and recovers a single page of pdf_path."""
+    with _open_pdf_fitz(pdf_path, password) as doc:
+        img = _render_page_bgr(doc[page_index])
+
+    cache_key = _page_cache_key(img) if page_cache is not None else None
+    docx_path = _lookup_cached_page(page_cache, cache_key, Path(temp_dir), page_index)
+    if docx_path is None:
+        docx_path = _recover_page_docx(get_paddle_engine(), img, Path(temp_dir), page_index)
+        if cache_key is not None and docx_path:
+            page_cache.store(cache_key, str(docx_path), f"page_{page_index}")
+    return str(docx_path) if docx_path else None
+
+def pdf_to_word_paddle(input_path: str, output_dir: str, password: str = None,
+                       progress_callback: Callable[[int, int], None] = None,
+                       processes: int = None, page_cache: ResultCache = None,
+                       cancel_token: CancellationToken = None) -> str:
+    """Converts PDF to DOCX using PaddleOCR Layout Recovery (Slow, AI-based).
+
+    progress_callback, if given, is called as (pages_done, total_pages) after each page.
+    processes > 1 fans pages out to that many worker processes, each with its own
+    engine (defaults to FILE_FORGE_PADDLE_PROCESSES).
+    page_cache, if given, stores recovered per-page DOCX files keyed by the hash of
+    the rendered page, so repeated pages (cover sheets, boilerplate) skip inference.
+    cancel_token, if given, is checked between pages; cancelling raises
+    OperationCancelled and nothing is merged.
+    """
+    _load_recovery_helpers()
+    if processes is None:
+        processes = PADDLE_PROCESSES
 
     print(f"[AI] Starting AI conversion for: {input_path}")
     input_file = Path(input_path)
@@ -316,59 +823,27 @@ def pdf_to_word_paddle(input_path: str, output_dir: str, password: str = None) -
     temp_dir = Path(output_dir) / f"temp_{input_file.stem}"
     temp_dir.mkdir(exist_ok=True)
     
-    # Handle encrypted PDFs
-    print(f"[AI] Checking encryption...")
-    decrypted_path, needs_cleanup = _get_decrypted_pdf_path(input_path, password, temp_dir)
-    print(f"[AI] Using path: {decrypted_path}, needs_cleanup: {needs_cleanup}")
-
     try:
-        # Use cached PaddleOCR engine instead of re-initializing
-        table_engine = get_paddle_engine()
-
-        doc = fitz.open(decrypted_path)
-        print(f"[AI] Opened PDF with {len(doc)} pages")
-        docx_files = []
-
-        for i, page in enumerate(doc):
-            # Render page to image
-            # 200 DPI is a good balance between speed and quality for OCR
-            pix = page.get_pixmap(dpi=200)
-            img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
-
-            # Convert to BGR if needed (PyMuPDF gives RGB)
-            if pix.n == 3: # RGB
-                img = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            elif pix.n == 4: # RGBA
-                img = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGR)
-            else:
-                img = cv2.cvtColor(img_array, cv2.COLOR_GRAY2BGR)
-
-            # Run inference
-            result = table_engine(img)
-
-            # Save structure result (images, excels)
-            page_name = f"page_{i}"
-            save_structure_res(result, str(temp_dir), page_name)
-
-            # Convert to DOCX using recovery module
-            h, w, _ = img.shape
-            res = sorted_layout_boxes(result, w)
-            convert_info_docx(img, res, str(temp_dir), page_name)
-
-            # The docx is saved as {page_name}_ocr.docx in temp_dir
-            expected_docx = temp_dir / f"{page_name}_ocr.docx"
-
-            if expected_docx.exists():
-                docx_files.append(expected_docx)
+        # Encrypted PDFs are authenticated in memory; nothing decrypted is written to disk
+        with _open_pdf_fitz(input_path, password) as doc:
+            total_pages = len(doc)
+            print(f"[AI] Opened PDF with {total_pages} pages")
+            if progress_callback:
+                progress_callback(0, total_pages)
+
+            if processes > 1 and total_pages > 1:
+                docx_files = _recover_pages_parallel(input_path, total_pages, temp_dir, processes,
+                                                     progress_callback, page_cache, password, cancel_token)
             else:
-                print(f"Warning: Could not find recovered docx for page {i}")
+                # Use cached PaddleOCR engine instead of re-initializing
+                docx_files = _recover_pages_pipelined(doc, get_paddle_engine(), temp_dir,
+                                                      progress_callback, page_cache, cancel_token)
 
         if not docx_files:
              raise Exception("No pages were successfully converted using AI engine.")
 
         # Merge recovered per-page DOCX files with page breaks between them
         merge_docx_files([str(f) for f in docx_files], str(output_file))
-        doc.close()
 
     finally:
         # Cleanup
@@ -379,3 +854,29 @@ def pdf_to_word_paddle(input_path: str, output_dir: str, password: str = None) -
                 print(f"Warning: Could not fully clean up {temp_dir}")
 
     return str(output_file)
+
+def _recover_pages_parallel(pdf_path: str, total_pages: int, temp_dir: Path, processes: int,
+                            progress_callback: Callable[[int, int], None] = None,
+                            page_cache: ResultCache = None, password: str = None,
+                            cancel_token: CancellationToken = None) -> List[Path]:
+    """Fans pages out to the worker pool and returns the recovered DOCX files in page order."""
+    pool = get_paddle_process_pool(processes)
+    futures = {}
+    results = {}
+    try:
+        for i in range(total_pages):
+            futures[pool.submit(_recover_page_in_worker, pdf_path, i, str(temp_dir), page_cache, password)] = i
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(done, total_pages)
+            check_cancelled(cancel_token)
+    except BrokenProcessPool as e:
+        _discard_paddle_process_pool(processes, pool)
+        raise RuntimeError("AI conversion worker process died; the worker pool will be restarted.") from e
+    finally:
+        # On failure or cancellation, pages not yet started never reach a worker
+        for future in futures:
+            future.cancel()
+
+    return [Path(results[i]) for i in range(total_pages) if results[i]]
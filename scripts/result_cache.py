@@ -0,0 +1,190 @@
+"""
+Content-addressed, disk-backed cache of conversion results for File Forge.
+
+Entries are keyed by the SHA-256 of the uploaded file plus the operation name
+and its normalized parameters, so re-uploading the same file with the same
+settings returns the stored output without re-running the conversion.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache with a TTL, stored as one directory per entry.
+
+    Each entry directory holds the cached output file and a meta.json. The
+    meta.json mtime doubles as the last-access time, so LRU order survives
+    restarts and is shared between worker processes using the same directory.
+    """
+
+    META_NAME = "meta.json"
+
+    def __init__(self, cache_dir: Path, max_bytes: int, ttl_seconds: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # Picklable so the cache can be handed to worker processes
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(content_hash: str, operation: str, params: dict = None) -> str:
+        """Builds a cache key from the upload hash, operation name and parameters."""
+        normalized = {k: v for k, v in (params or {}).items() if v is not None}
+        payload = json.dumps(
+            {"sha256": content_hash, "operation": operation, "params": normalized},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: Optional[str], output_dir: Path, stem: str) -> Optional[Tuple[str, dict]]:
+        """
+        Materializes a cached output into output_dir and returns (output_path, meta).
+
+        The file is named as the conversion itself would have named it for an
+        input with the given stem. Returns None on a miss or expired entry, or
+        when key is None.
+        """
+        if not self.enabled or key is None:
+            return None
+
+        entry_dir = self.cache_dir / key
+        meta_path = entry_dir / self.META_NAME
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - meta["created_at"] > self.ttl_seconds:
+            self._remove_entry(entry_dir)
+            return None
+
+        output_path = Path(output_dir) / f"{stem}{meta['output_suffix']}"
+        try:
+            # Copied rather than linked so later writes to output_dir can't alter the entry
+            shutil.copyfile(entry_dir / meta["output_name"], output_path)
+            os.utime(meta_path)  # Mark as most recently used
+        except OSError:
+            return None
+
+        return str(output_path), meta["extra"]
+
+    def store(self, key: str, output_path: str, stem: str, extra: dict = None) -> None:
+        """Copies output_path into the cache under key, then evicts to stay within bounds."""
+        if not self.enabled:
+            return
+
+        output_file = Path(output_path)
+        # Record the part of the name that follows the input stem so hits can be renamed
+        name = output_file.name
+        output_suffix = name[len(stem):] if name.startswith(stem) else f"_{name}"
+
+        entry_dir = self.cache_dir / key
+        if self._is_live(entry_dir):
+            # Keys are content-addressed, so the first writer's entry is as good as this one
+            return
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        staging_dir = self.cache_dir / f".tmp_{uuid.uuid4().hex}"
+        try:
+            staging_dir.mkdir()
+            shutil.copyfile(output_file, staging_dir / "output")
+            (staging_dir / self.META_NAME).write_text(json.dumps({
+                "output_name": "output",
+                "output_suffix": output_suffix,
+                "extra": extra or {},
+                "created_at": time.time(),
+            }))
+            if not self._is_live(entry_dir):
+                self._remove_entry(entry_dir)  # Expired or half-removed leftovers only
+            os.replace(staging_dir, entry_dir)
+        except OSError as e:
+            self._remove_entry(staging_dir)
+            if not self._is_live(entry_dir):
+                print(f"[CACHE] Failed to store {key}: {e}")
+            return  # Otherwise a concurrent store of the same key won the race
+
+        self._evict()
+
+    def get_or_compute(self, key: Optional[str], output_dir: Path, stem: str,
+                       compute: Callable[[], Union[str, dict]]) -> Tuple[str, dict]:
+        """
+        Returns (output_path, extra) from the cache, or runs compute and caches its result.
+
+        compute returns either an output path or a dict with an 'output_path'
+        key; the remaining dict items are cached alongside the file. A None key
+        (results that must not be kept, e.g. decrypted PDFs) always computes
+        and stores nothing.
+        """
+        hit = self.lookup(key, output_dir, stem)
+        if hit is not None:
+            print(f"[CACHE] Hit: {hit[0]}")
+            return hit
+
+        result = compute()
+        if isinstance(result, dict):
+            output_path = result["output_path"]
+            extra = {k: v for k, v in result.items() if k != "output_path"}
+        else:
+            output_path, extra = result, {}
+
+        if key is not None:
+            self.store(key, output_path, stem, extra)
+        return output_path, extra
+
+    def _evict(self) -> None:
+        """Drops expired entries, then least recently used ones until under max_bytes."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            for entry_dir in self.cache_dir.iterdir():
+                meta_path = entry_dir / self.META_NAME
+                try:
+                    last_access = meta_path.stat().st_mtime
+                    created_at = json.loads(meta_path.read_text())["created_at"]
+                    size = sum(f.stat().st_size for f in entry_dir.iterdir())
+                except (OSError, ValueError, KeyError):
+                    continue  # Staging directory or entry being replaced
+                if now - created_at > self.ttl_seconds:
+                    self._remove_entry(entry_dir)
+                    continue
+                entries.append((last_access, size, entry_dir))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry_dir in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                self._remove_entry(entry_dir)
+                total -= size
+
+    def _is_live(self, entry_dir: Path) -> bool:
+        """True if entry_dir holds a complete, unexpired entry."""
+        try:
+            meta = json.loads((entry_dir / self.META_NAME).read_text())
+        except (OSError, ValueError):
+            return False
+        return time.time() - meta["created_at"] <= self.ttl_seconds
+
+    @staticmethod
+    def _remove_entry(entry_dir: Path) -> None:
+        shutil.rmtree(entry_dir, ignore_errors=True)
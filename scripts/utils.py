@@ -2,12 +2,24 @@
 Common utility functions for File Forge.
 Reduces code duplication across the application.
 """
+import hashlib
 import os
-import shutil
 import traceback
+import uuid
+import zipfile
 from pathlib import Path
-from typing import Callable, Any
+from typing import Callable, Any, List, Tuple
+import aiofiles
 from fastapi import UploadFile, HTTPException
+from scripts.security_utils import secure_filename
+
+
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = int(os.environ.get("FILE_FORGE_UPLOAD_CHUNK_KB", "1024")) * 1024
+# Uploads larger than this are rejected with 413 (0 disables the limit)
+MAX_UPLOAD_BYTES = int(os.environ.get("FILE_FORGE_MAX_UPLOAD_MB", "500")) * 1024 * 1024
+# Zip members with these extensions are treated as images; anything else is skipped
+ZIP_IMAGE_EXTENSIONS = {".heic", ".heif", ".jpg", ".jpeg", ".png", ".webp"}
 
 
 async def process_uploaded_file(
@@ -31,13 +43,12 @@ async def process_uploaded_file(
     Raises:
         HTTPException: If processing fails
     """
-    temp_path = upload_dir / file.filename
+    temp_path = upload_temp_path(upload_dir, file.filename)
     print(f"[DEBUG] {debug_name}: {file.filename}")
     
     try:
         # Save uploaded file
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await save_upload_file(file, temp_path)
         
         # Process the file
         output_path = processor(str(temp_path))
@@ -49,6 +60,8 @@ async def process_uploaded_file(
             "filename": Path(output_path).name
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] {debug_name} failed: {e}")
         traceback.print_exc()
@@ -58,6 +71,144 @@ async def process_uploaded_file(
         cleanup_temp_file(temp_path)
 
 
+def upload_temp_path(upload_dir: Path, filename: str) -> Path:
+    """
+    Build a sanitized, collision-free path in upload_dir for an uploaded file.
+    
+    Args:
+        upload_dir: Directory to save temporary uploads
+        filename: Client-supplied filename (untrusted)
+    
+    Returns:
+        Path of the form upload_dir/<uuid>_<sanitized name>
+    """
+    return upload_dir / f"{uuid.uuid4()}_{secure_filename(filename)}"
+
+
+async def save_upload_file(
+    file: UploadFile,
+    dest: Path,
+    chunk_size: int = None,
+    max_bytes: int = None
+) -> str:
+    """
+    Stream an upload to disk without blocking the event loop, hashing it on the way.
+    
+    Args:
+        file: The uploaded file from FastAPI
+        dest: Path to write the upload to
+        chunk_size: Bytes read per chunk (default UPLOAD_CHUNK_SIZE)
+        max_bytes: Maximum accepted size (default MAX_UPLOAD_BYTES, 0 for no limit)
+    
+    Returns:
+        Hex SHA-256 digest of the uploaded content
+    
+    Raises:
+        HTTPException: 413 if the upload exceeds max_bytes
+    """
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+
+    # Reject early when the client declared the size up front
+    if max_bytes and file.size is not None and file.size > max_bytes:
+        raise _upload_too_large(max_bytes)
+
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        async with aiofiles.open(dest, "wb") as buffer:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes and written > max_bytes:
+                    raise _upload_too_large(max_bytes)
+                digest.update(chunk)
+                await buffer.write(chunk)
+    except BaseException:
+        # Never leave a partial upload behind
+        cleanup_temp_file(dest)
+        raise
+    return digest.hexdigest()
+
+
+def extract_zip_upload(
+    zip_path: Path,
+    dest_dir: Path,
+    max_files: int,
+    max_bytes: int = None
+) -> List[Tuple[str, Path, str]]:
+    """
+    Unpack the images in an uploaded zip into dest_dir, hashing each one.
+    
+    Directories, macOS resource forks and non-image members are skipped.
+    Members get the same sanitized, collision-free names as direct uploads.
+    
+    Args:
+        zip_path: The uploaded zip archive
+        dest_dir: Directory to extract into
+        max_files: Maximum number of images accepted from the archive
+        max_bytes: Maximum total uncompressed size (default MAX_UPLOAD_BYTES, 0 for no limit)
+    
+    Returns:
+        List of (original name, extracted path, hex SHA-256) in archive order
+    
+    Raises:
+        HTTPException: 400 for an invalid archive or too many images,
+            413 if the uncompressed images exceed max_bytes
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    extracted = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and not Path(info.filename).name.startswith(".")
+                and Path(info.filename).suffix.lower() in ZIP_IMAGE_EXTENSIONS
+            ]
+            if len(members) > max_files:
+                raise HTTPException(status_code=400, detail=f"Too many images in archive (maximum {max_files}).")
+            # Checked against the declared sizes up front, and again while reading (zip bombs lie)
+            if max_bytes and sum(info.file_size for info in members) > max_bytes:
+                raise _upload_too_large(max_bytes)
+
+            total = 0
+            for info in members:
+                dest = upload_temp_path(dest_dir, info.filename)
+                extracted.append((secure_filename(info.filename), dest, None))
+                digest = hashlib.sha256()
+                with archive.open(info) as src, open(dest, "wb") as out:
+                    while True:
+                        chunk = src.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        total += len(chunk)
+                        if max_bytes and total > max_bytes:
+                            raise _upload_too_large(max_bytes)
+                        digest.update(chunk)
+                        out.write(chunk)
+                extracted[-1] = (extracted[-1][0], dest, digest.hexdigest())
+    except zipfile.BadZipFile:
+        for _, path, _ in extracted:
+            cleanup_temp_file(path)
+        raise HTTPException(status_code=400, detail="Invalid zip archive.")
+    except BaseException:
+        for _, path, _ in extracted:
+            cleanup_temp_file(path)
+        raise
+    return extracted
+
+
+def _upload_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum upload size is {max_bytes // (1024 * 1024)} MB."
+    )
+
+
 def cleanup_temp_file(file_path: Path) -> None:
     """
     Safely remove a temporary file, handling Windows file locking issues.
@@ -0,0 +1,528 @@
+"""
+Workflow engine for File Forge.
+
+A workflow is a list of steps applied to one file in order, each consuming the
+previous step's output. Steps are looked up in STEP_REGISTRY, which maps a
+step name to the function that runs it, the pool it runs on and the schema of
+its config, so any endpoint can validate and run the same operations.
+
+Between compatible steps the output is handed over in memory instead of as a
+file: image steps pass an ImageValue (a PIL image plus its JPEG settings) and
+unlocking passes a PdfValue (the source plus the password that opens it).
+Only the final output, or one feeding a step that needs a file, is written.
+
+Every file the engine writes is tracked as an artifact of the run. An
+intermediate is deleted as soon as the next step has consumed it, and when
+the run ends everything but the delivered output is removed, including when
+the client abandons the stream.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from PIL import Image
+
+from scripts.cancellation import CancellationToken
+from scripts.executors import call_in_docx_pool, run_ai_task, run_image_task, run_pdf_task
+from scripts.image_utils import cropped, fit_target_size, resized, save_jpeg, transformed
+from scripts.pdf_utils import (
+    check_pdf_password, compress_pdf, pdf_to_docx, pdf_to_word_paddle, remove_pdf_password,
+)
+from scripts.result_cache import ResultCache
+
+
+# Marks a config parameter without a default
+REQUIRED = object()
+
+# Which executor a step runs on
+_POOL_RUNNERS = {"image": run_image_task, "pdf": run_pdf_task, "ai": run_ai_task}
+
+
+class ImageValue(NamedTuple):
+    """An image handed between steps in memory, with the JPEG settings it will be written with."""
+    image: Image.Image
+    name: str
+    quality: int = 95
+    optimize: bool = True
+
+
+class PdfValue(NamedTuple):
+    """An unlocked PDF handed between steps: the source file and the password that opens it."""
+    path: Path
+    password: Optional[str]
+
+
+# Anything a step can take or return: a file, or an in-memory value
+StepValue = Union[Path, ImageValue, PdfValue]
+
+
+class WorkflowContext:
+    """
+    State shared by the steps of one workflow run.
+
+    progress_callback(current, total) is set by the engine while a step runs;
+    steps that can report progress (e.g. AI conversion, per page) call it
+    from their worker thread. Images opened through open_image stay open for
+    lazy decoding until close().
+
+    Files written for the run are registered with track() and deleted by
+    release() or close(). bytes_written and bytes_freed account for them.
+
+    cancel_token is cancelled when the run is abandoned; the engine checks it
+    between steps and long steps pass it on to check between pages/images.
+    """
+
+    def __init__(self, output_dir: Path, page_cache: ResultCache = None):
+        self.output_dir = Path(output_dir)
+        self.page_cache = page_cache
+        self.progress_callback: Optional[Callable[[int, int], None]] = None
+        self.cancel_token = CancellationToken()
+        self.bytes_written = 0
+        self.bytes_freed = 0
+        self._open_images: List[Image.Image] = []
+        self._artifacts: List[Path] = []
+        self._closed = False
+        # Artifacts are tracked from worker threads and released from the event loop
+        self._lock = threading.Lock()
+
+    def open_image(self, path: Path) -> Image.Image:
+        """Opens an image without decoding it, so the consuming step can draft() it."""
+        img = Image.open(path)
+        self._open_images.append(img)
+        return img
+
+    def track(self, path: Path) -> Path:
+        """
+        Records path as a file written by this run.
+
+        A file that arrives after close() (a step still running when the
+        client went away) is deleted straight away.
+        """
+        path = Path(path)
+        with self._lock:
+            if path in self._artifacts:
+                return path
+            self.bytes_written += _file_size(path)
+            if not self._closed:
+                self._artifacts.append(path)
+                return path
+        self._delete(path)
+        return path
+
+    def release(self, path: Optional[Path]) -> None:
+        """Deletes path if it is an artifact of this run; other files are left alone."""
+        with self._lock:
+            if path is None or path not in self._artifacts:
+                return
+            self._artifacts.remove(path)
+        if not self._delete(path):
+            # Still held open (e.g. by a lazily decoded image); retried by close()
+            with self._lock:
+                self._artifacts.append(path)
+
+    def close(self, keep: Iterable[Path] = ()) -> None:
+        """Closes open images and deletes every artifact except those in keep, the delivered outputs."""
+        for img in self._open_images:
+            img.close()
+        self._open_images.clear()
+        keep = {Path(path) for path in keep}
+        with self._lock:
+            self._closed = True
+            artifacts = [path for path in self._artifacts if path not in keep]
+            self._artifacts.clear()
+        for path in artifacts:
+            self._delete(path)
+        if artifacts:
+            print(f"[WORKFLOW] Removed {len(artifacts)} intermediate files, "
+                  f"{self.bytes_freed / 1024:.1f} KB freed of {self.bytes_written / 1024:.1f} KB written")
+
+    def _delete(self, path: Path) -> bool:
+        size = _file_size(path)
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"[ERROR] Failed to delete file {path}: {e}")
+            return False
+        with self._lock:
+            self.bytes_freed += size
+        return True
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+class WorkflowStep(NamedTuple):
+    """
+    A registered step.
+
+    run(source, ctx, **params) returns the output path or an in-memory value.
+    source is a file path, or an in-memory value of one of the accepts types
+    (other values are written to a file first). params maps each config key
+    to (type, default), with REQUIRED for mandatory keys. pool is 'image',
+    'pdf' or 'ai', or a function of the validated params returning one.
+    """
+    name: str
+    run: Callable[..., Union[str, StepValue]]
+    params: Dict[str, Tuple[type, Any]]
+    pool: Union[str, Callable[[dict], str]]
+    accepts: Tuple[type, ...] = ()
+
+
+STEP_REGISTRY: Dict[str, WorkflowStep] = {}
+
+
+def register_step(name: str, params: Dict[str, Tuple[type, Any]], pool: Union[str, Callable[[dict], str]],
+                  accepts: Tuple[type, ...] = ()):
+    """Decorator registering run as the workflow step called name."""
+    def decorator(run: Callable[..., Union[str, StepValue]]) -> Callable[..., Union[str, StepValue]]:
+        STEP_REGISTRY[name] = WorkflowStep(name, run, params, pool, accepts)
+        return run
+    return decorator
+
+
+def get_step(name: str) -> WorkflowStep:
+    """Returns the registered step called name; raises ValueError for unknown steps."""
+    step = STEP_REGISTRY.get(name)
+    if step is None:
+        raise ValueError(f"Unknown step type: {name}")
+    return step
+
+
+def validate_params(step: WorkflowStep, config: Optional[dict]) -> dict:
+    """
+    Checks config against the step's schema and returns the full parameter dict.
+
+    Missing optional keys get their defaults, values are coerced to the declared
+    type, and unknown keys are ignored. Raises ValueError for a missing required
+    key or a value of the wrong type.
+    """
+    config = config or {}
+    params = {}
+    for key, (kind, default) in step.params.items():
+        value = config.get(key)
+        if value is None or value == "":
+            if default is REQUIRED:
+                raise ValueError(f"Step '{step.name}' requires '{key}'")
+            params[key] = default
+            continue
+        if kind is bool and isinstance(value, str):
+            value = value.strip().lower() in ("1", "true", "yes", "on")
+        try:
+            params[key] = kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Step '{step.name}': '{key}' must be {kind.__name__}, got {value!r}")
+    return params
+
+
+def materialize(value: Union[str, StepValue], ctx: WorkflowContext) -> Path:
+    """Writes an in-memory value to ctx.output_dir and returns the file; paths pass through."""
+    if isinstance(value, ImageValue):
+        return Path(save_jpeg(value.image, str(ctx.output_dir / value.name), value.quality, value.optimize))
+    if isinstance(value, PdfValue):
+        return Path(remove_pdf_password(str(value.path), value.password, str(ctx.output_dir)))
+    return Path(value)
+
+
+def _pool_for(value: StepValue) -> str:
+    return "pdf" if isinstance(value, PdfValue) else "image"
+
+
+def _value_file(value: StepValue) -> Optional[Path]:
+    """The file a value lives in, if any; an in-memory image has none."""
+    if isinstance(value, PdfValue):
+        return Path(value.path)
+    return Path(value) if isinstance(value, (str, Path)) else None
+
+
+def _tracked(func: Callable[..., Union[str, StepValue]], source: StepValue, ctx: WorkflowContext,
+             **kwargs) -> StepValue:
+    """Calls func(source, ctx, **kwargs) in the worker and tracks a new file it returns."""
+    output = func(source, ctx, **kwargs)
+    if isinstance(output, str):
+        output = Path(output)
+    # Tracked in the worker, so an output finished after the run was abandoned is still removed
+    if isinstance(output, Path) and output != _value_file(source):
+        ctx.track(output)
+    return output
+
+
+async def run_step(step: WorkflowStep, source: StepValue, ctx: WorkflowContext, params: dict) -> StepValue:
+    """Runs one validated step on its pool, writing source to a file first if the step needs one."""
+    written = None
+    if not isinstance(source, Path) and not isinstance(source, step.accepts):
+        source = written = await _POOL_RUNNERS[_pool_for(source)](_tracked, materialize, source, ctx)
+    pool = step.pool(params) if callable(step.pool) else step.pool
+    try:
+        output = await _POOL_RUNNERS[pool](_tracked, step.run, source, ctx, **params)
+    except BaseException:
+        ctx.release(written)
+        raise
+    # The file written for this step alone has been consumed, unless the step passed it through
+    if _value_file(output) != written:
+        ctx.release(written)
+    return output
+
+
+def execute_step(step: WorkflowStep, input_path: str, output_dir: Path, params: dict) -> str:
+    """Runs one validated step synchronously on a file and returns the written output path."""
+    ctx = WorkflowContext(output_dir)
+    try:
+        return str(materialize(step.run(Path(input_path), ctx, **params), ctx))
+    finally:
+        ctx.close()
+
+
+def plan_workflow(step_list: List[dict]) -> List[Tuple[WorkflowStep, dict, str]]:
+    """
+    Resolves and validates every step up front, so a bad step fails the
+    workflow before any work is done.
+
+    Returns (step, params, label) per step; raises ValueError.
+    """
+    plan = []
+    for item in step_list:
+        step = get_step(item.get("type"))
+        plan.append((step, validate_params(step, item.get("config")), item.get("label") or step.name))
+    return plan
+
+
+class Stage(NamedTuple):
+    """A unit of execution: one step, or several fused ones, and the indices of the steps it covers."""
+    step: WorkflowStep
+    params: dict
+    indices: List[int]
+
+
+def _geometry_operation(step: WorkflowStep, params: dict) -> Optional[Tuple[str, dict, str]]:
+    """Returns (operation, kwargs, output suffix) for a step that only crops or resizes pixels."""
+    if step.name == "crop_image":
+        return "crop", params, "_cropped"
+    if step.name == "resize_image" and params["mode"] != "target_size":
+        kwargs = {k: params[k] for k in ("mode", "width", "height", "percentage")}
+        return "resize", kwargs, "_resized"
+    return None
+
+
+def fuse_steps(plan: List[Tuple[WorkflowStep, dict, str]]) -> List[Stage]:
+    """
+    Groups the validated plan into stages, fusing runs of adjacent crop/resize steps.
+
+    A fused run is applied by image_utils.transformed in one decode -> crop ->
+    resize pass: crops are moved ahead of the resizes before them (with their
+    boxes mapped back onto the source), so only kept pixels are resampled.
+    Output size and file name are the same as running the steps one by one.
+    target_size resizes depend on the encoder and are never fused.
+    """
+    stages: List[Stage] = []
+    run: List[Tuple[int, WorkflowStep, dict, Tuple[str, dict, str]]] = []
+
+    def flush() -> None:
+        if len(run) >= 2:
+            params = {"operations": [(op, kwargs) for _, _, _, (op, kwargs, _) in run],
+                      "suffix": "".join(suffix for _, _, _, (_, _, suffix) in run)}
+            stages.append(Stage(_IMAGE_GEOMETRY_STEP, params, [i for i, _, _, _ in run]))
+        else:
+            stages.extend(Stage(step, params, [i]) for i, step, params, _ in run)
+        run.clear()
+
+    for i, (step, params, _) in enumerate(plan):
+        operation = _geometry_operation(step, params)
+        if operation is not None:
+            run.append((i, step, params, operation))
+            continue
+        flush()
+        stages.append(Stage(step, params, [i]))
+    flush()
+    return stages
+
+
+async def run_workflow(step_list: List[dict], input_path: Path, ctx: WorkflowContext) -> AsyncIterator[dict]:
+    """
+    Runs the steps back to back on input_path, yielding progress events.
+
+    Events: step_start and step_complete around each step, step_progress
+    whenever a step reports progress, then complete with the final filename.
+    Failures end the run with an error event.
+
+    Intermediate files are deleted once consumed. If the run fails or the
+    consumer stops before taking the complete event, the output goes too.
+    Once ctx.cancel_token is cancelled no further step starts; closing the
+    generator early cancels it, which also stops a long step in progress.
+    """
+    try:
+        plan = plan_workflow(step_list)
+    except ValueError as e:
+        yield {"event": "error", "detail": str(e)}
+        return
+
+    loop = asyncio.get_running_loop()
+    total = len(plan)
+    labels = [label for _, _, label in plan]
+    current: StepValue = Path(input_path)
+    delivered = False
+    try:
+        for step, params, indices in fuse_steps(plan):
+            if ctx.cancel_token.cancelled:
+                print(f"[WORKFLOW] Cancelled before step {indices[0] + 1}/{total}")
+                yield {"event": "error", "detail": "Workflow cancelled", "step": indices[0]}
+                return
+            for i in indices:
+                yield {"event": "step_start", "step": i, "total": total, "label": labels[i]}
+            if len(indices) > 1:
+                print(f"[WORKFLOW] Steps {indices[0] + 1}-{indices[-1] + 1}/{total}: fused into one image pass")
+            else:
+                print(f"[WORKFLOW] Step {indices[0] + 1}/{total}: {step.name}")
+
+            # Progress is reported from worker threads and relayed to the stream through a queue
+            progress = asyncio.Queue()
+            ctx.progress_callback = lambda current, step_total: loop.call_soon_threadsafe(
+                progress.put_nowait, (current, step_total))
+            task = asyncio.ensure_future(run_step(step, current, ctx, params))
+            try:
+                while not task.done():
+                    getter = asyncio.ensure_future(progress.get())
+                    await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter.done():
+                        current_page, step_total = getter.result()
+                        yield {"event": "step_progress", "step": indices[-1], "total": total,
+                               "label": labels[indices[-1]], "current": current_page, "step_total": step_total}
+                    else:
+                        getter.cancel()
+                previous, current = _value_file(current), task.result()
+            except Exception as e:
+                print(f"[ERROR] Workflow step {step.name} failed: {e}")
+                yield {"event": "error", "detail": str(e), "step": indices[0]}
+                return
+            finally:
+                task.cancel()
+                ctx.progress_callback = None
+
+            if _value_file(current) != previous:
+                ctx.release(previous)
+            for i in indices:
+                yield {"event": "step_complete", "step": i, "total": total, "label": labels[i]}
+
+        # Only the final result is encoded/serialized
+        if not isinstance(current, Path):
+            try:
+                current = await _POOL_RUNNERS[_pool_for(current)](_tracked, materialize, current, ctx)
+            except Exception as e:
+                print(f"[ERROR] Workflow output failed: {e}")
+                yield {"event": "error", "detail": str(e)}
+                return
+
+        yield {"event": "complete", "message": f"Workflow completed ({total} steps)", "filename": current.name}
+        delivered = True
+    finally:
+        # Also reached when the stream is closed or cancelled because the client disconnected
+        if not delivered:
+            ctx.cancel_token.cancel()  # Stops a step still running in its worker
+        ctx.close(keep=[current] if delivered else [])
+
+
+@asynccontextmanager
+async def workflow_events(step_list: List[dict], input_path: Path,
+                          ctx: WorkflowContext) -> AsyncIterator[AsyncIterator[dict]]:
+    """
+    run_workflow as a context manager that closes the event stream on exit.
+
+    Leaving the block early (e.g. the client disconnected) closes the engine
+    right away, so it deletes what it wrote instead of waiting for garbage
+    collection. Stands in for contextlib.aclosing, which needs Python 3.10.
+    """
+    events = run_workflow(step_list, input_path, ctx)
+    try:
+        yield events
+    finally:
+        await events.aclose()
+
+
+# --- Steps ---
+
+def _image_source(source: StepValue, ctx: WorkflowContext) -> ImageValue:
+    """The incoming image; geometry steps keep the JPEG settings of an in-memory image."""
+    if isinstance(source, ImageValue):
+        return source
+    return ImageValue(ctx.open_image(source), Path(source).name)
+
+
+@register_step("remove_password", {"password": (str, REQUIRED)}, pool="pdf", accepts=(PdfValue,))
+def _remove_password_step(source: StepValue, ctx: WorkflowContext, password: str) -> StepValue:
+    if isinstance(source, PdfValue):
+        return source  # Already unlocked
+    # Fail here on a wrong password; decryption itself happens in memory in the consuming step
+    check_pdf_password(str(source), password)
+    return PdfValue(Path(source), password)
+
+
+@register_step("pdf_to_word", {"use_ai": (bool, False), "password": (str, None)},
+               pool=lambda params: "ai" if params["use_ai"] else "pdf", accepts=(PdfValue,))
+def _pdf_to_word_step(source: StepValue, ctx: WorkflowContext, use_ai: bool, password: Optional[str]) -> str:
+    if isinstance(source, PdfValue):
+        source, password = source.path, source.password
+    if use_ai:
+        # Pages of a password-protected PDF are never cached
+        return pdf_to_word_paddle(str(source), str(ctx.output_dir), password,
+                                  progress_callback=ctx.progress_callback,
+                                  page_cache=None if password else ctx.page_cache,
+                                  cancel_token=ctx.cancel_token)
+    return call_in_docx_pool(pdf_to_docx, str(source), str(ctx.output_dir), password)
+
+
+@register_step("compress_pdf", {"level": (str, "medium"), "password": (str, None), "target_size_kb": (int, None)},
+               pool="pdf", accepts=(PdfValue,))
+def _compress_pdf_step(source: StepValue, ctx: WorkflowContext, level: str, password: Optional[str],
+                       target_size_kb: Optional[int]) -> str:
+    if isinstance(source, PdfValue):
+        source, password = source.path, source.password
+    result = compress_pdf(str(source), str(ctx.output_dir), level, password, target_size_kb=target_size_kb or None,
+                          cancel_token=ctx.cancel_token)
+    return result["output_path"]
+
+
+@register_step("heic_to_jpeg", {"quality": (int, 95), "fast": (bool, False)}, pool="image",
+               accepts=(ImageValue,))
+def _heic_to_jpeg_step(source: StepValue, ctx: WorkflowContext, quality: int, fast: bool) -> ImageValue:
+    # Decoding is left to the next step (or the final write), so a following resize can draft
+    image = _image_source(source, ctx)
+    return ImageValue(image.image, f"{Path(image.name).stem}.jpg", quality, not fast)
+
+
+@register_step("resize_image", {"mode": (str, "percentage"), "width": (int, None), "height": (int, None),
+                                "percentage": (int, 50), "target_size_kb": (int, None)}, pool="image",
+               accepts=(ImageValue,))
+def _resize_image_step(source: StepValue, ctx: WorkflowContext, mode: str, width: Optional[int],
+                       height: Optional[int], percentage: int, target_size_kb: Optional[int]) -> StepValue:
+    image = _image_source(source, ctx)
+    name = f"{Path(image.name).stem}_resized.jpg"
+    if mode == "target_size":
+        # The size target is a property of the encoded file, so this step writes it
+        return Path(fit_target_size(image.image, str(ctx.output_dir / name), target_size_kb))
+    return image._replace(image=resized(image.image, mode, width=width, height=height, percentage=percentage),
+                          name=name)
+
+
+@register_step("crop_image", {"x": (int, 0), "y": (int, 0), "width": (int, 100), "height": (int, 100)},
+               pool="image", accepts=(ImageValue,))
+def _crop_image_step(source: StepValue, ctx: WorkflowContext, x: int, y: int, width: int, height: int) -> ImageValue:
+    image = _image_source(source, ctx)
+    return image._replace(image=cropped(image.image, x, y, width, height),
+                          name=f"{Path(image.name).stem}_cropped.jpg")
+
+
+def _image_geometry_step(source: StepValue, ctx: WorkflowContext, operations: List[Tuple[str, dict]],
+                         suffix: str) -> ImageValue:
+    image = _image_source(source, ctx)
+    return image._replace(image=transformed(image.image, operations),
+                          name=f"{Path(image.name).stem}{suffix}.jpg")
+
+
+# Runs of crop/resize steps fused by fuse_steps; internal, so not in STEP_REGISTRY
+_IMAGE_GEOMETRY_STEP = WorkflowStep("image_geometry", _image_geometry_step, {}, pool="image",
+                                    accepts=(ImageValue,))
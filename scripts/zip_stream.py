@@ -0,0 +1,101 @@
+"""
+Streaming zip archives of output files for File Forge.
+
+Multi-file results (e.g. image batches) are not zipped on disk. Instead a
+small manifest naming the member files is written to the output directory,
+and the archive is generated chunk by chunk while it is being downloaded.
+"""
+import json
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# Bytes read from each member file per chunk of the archive stream
+ZIP_CHUNK_SIZE = 256 * 1024
+# Formats that are already compressed; deflating them again only costs CPU
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif", ".docx", ".pdf", ".zip"}
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that buffers what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries: Iterable[Tuple[str, Path]], chunk_size: int = ZIP_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Generates a zip archive of (archive name, file path) entries as a stream of chunks.
+
+    Nothing is buffered beyond one chunk of one member, so memory stays flat
+    regardless of archive size. Already-compressed formats are stored, others
+    are deflated.
+    """
+    sink = _ChunkSink()
+    # An unseekable target makes zipfile write sizes in data descriptors after each member
+    with zipfile.ZipFile(sink, "w") as archive:
+        for arcname, path in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            stored = Path(path).suffix.lower() in STORED_EXTENSIONS
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with open(path, "rb") as src, archive.open(info, "w") as dest:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    yield sink.drain()
+
+
+def write_zip_manifest(output_dir: Path, name: str, entries: List[Tuple[str, Path]]) -> str:
+    """
+    Records entries (archive name, file in output_dir) as the zip called name.
+
+    Returns the zip name to hand to the client; the archive itself is only
+    produced when it is downloaded.
+    """
+    manifest = {"entries": [[arcname, Path(path).name] for arcname, path in entries]}
+    (Path(output_dir) / f"{name}{MANIFEST_SUFFIX}").write_text(json.dumps(manifest))
+    return name
+
+
+def read_zip_manifest(output_dir: Path, name: str) -> Optional[List[Tuple[str, Path]]]:
+    """Returns the (archive name, path) entries of the zip called name, or None if there is no such zip."""
+    manifest_path = Path(output_dir) / f"{name}{MANIFEST_SUFFIX}"
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return None
+    # Members are always plain names inside output_dir
+    return [(arcname, Path(output_dir) / Path(filename).name) for arcname, filename in manifest["entries"]]
+
+
+def delete_zip_bundle(output_dir: Path, name: str) -> None:
+    """Deletes the manifest of the zip called name and every file it lists."""
+    entries = read_zip_manifest(output_dir, name) or []
+    for path in [path for _, path in entries] + [Path(output_dir) / f"{name}{MANIFEST_SUFFIX}"]:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"[ERROR] Failed to delete file {path}: {e}")
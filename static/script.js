@@ -235,11 +235,13 @@ document.getElementById('compress-pdf-btn').onclick = () => {
 document.getElementById('process-compress-btn').onclick = async () => {
     const level = document.querySelector('input[name="compress-level"]:checked')?.value || 'medium';
     const password = document.getElementById('compress-password').value || null;
+    const targetSize = parseInt(document.getElementById('compress-target-size').value) || null;
 
     const formData = new FormData();
     formData.append('file', selectedFile);
     formData.append('level', level);
     if (password) formData.append('password', password);
+    if (targetSize) formData.append('target_size_kb', targetSize);
 
     const statusDisplay = document.getElementById('status-display');
     const statusText = document.getElementById('status-text');
@@ -339,7 +341,12 @@ async function processAction(url, text, formData = null) {
 
         if (response.ok) {
             const data = await response.json();
-            showResult(data.filename, data.message);
+            if (data.job_id) {
+                const job = await pollJob(data.job_id, statusText, text);
+                showResult(job.filename, 'Converted to Word with AI Layout Recovery');
+            } else {
+                showResult(data.filename, data.message);
+            }
         } else {
             // Try to parse as JSON first, fall back to text
             const contentType = response.headers.get('content-type');
@@ -359,6 +366,40 @@ async function processAction(url, text, formData = null) {
 
 }
 
+// Job currently being polled; cancelled on the server if the page is closed meanwhile
+let activeJobId = null;
+
+window.addEventListener('pagehide', () => {
+    if (activeJobId) {
+        // keepalive lets the request outlive the page
+        fetchWithAuth(`/api/jobs/${encodeURIComponent(activeJobId)}`, { method: 'DELETE', keepalive: true })
+            .catch(() => {});
+    }
+});
+
+// Polls a background job until it finishes, reporting per-page progress.
+async function pollJob(jobId, statusText, text, intervalMs = 1000) {
+    activeJobId = jobId;
+    try {
+        while (true) {
+            const response = await fetchWithAuth(`/api/jobs/${encodeURIComponent(jobId)}`);
+            if (!response.ok) {
+                throw new Error(`Job status check failed (${response.status})`);
+            }
+            const job = await response.json();
+            if (job.status === 'completed') return job;
+            if (job.status === 'failed') throw new Error(job.error || 'Conversion failed');
+            if (job.status === 'cancelled') throw new Error('Conversion cancelled');
+
+            const { current, total } = job.progress || {};
+            statusText.textContent = total ? `${text} (page ${current} of ${total})` : text;
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    } finally {
+        activeJobId = null;
+    }
+}
+
 function formatBytes(bytes) {
     if (bytes < 1024) return bytes + ' B';
     if (bytes < 1024 * 1024) return (bytes / 1024).toFixed(1) + ' KB';
@@ -400,6 +441,9 @@ function showCompressResult(data) {
     const badge = document.createElement('div');
     badge.className = 'reduction-badge';
     badge.textContent = `↓ ${data.reduction_pct}% smaller`;
+    if (data.target_met === false) {
+        badge.textContent += ' (target size not reachable)';
+    }
 
     const stats = document.createElement('div');
     stats.className = 'compress-stats';
@@ -643,6 +687,7 @@ async function initCropper() {
             const formData = new FormData();
             formData.append('file', selectedImageFile);
             formData.append('quality', 80); // Faster preview
+            formData.append('fast', 'true');
 
             const response = await fetchWithAuth('/api/image/heic-to-jpeg', {
                 method: 'POST',
@@ -1059,6 +1104,10 @@ function openConfigModal(index) {
                     <option value="high" ${lvl === 'high' ? 'selected' : ''}>High — Smallest Size</option>
                 </select>
             </label>
+            <label>
+                <span style="display:block; margin-bottom:0.5rem; color:var(--text-muted)">Target Size in KB (optional, overrides level)</span>
+                <input type="number" id="config-compress-target-size" placeholder="e.g., 2000" value="${step.config.target_size_kb || ''}" min="1">
+            </label>
         `;
     }
 
@@ -1081,6 +1130,7 @@ function saveStepConfig() {
         step.config.percentage = parseInt(document.getElementById('config-percentage').value) || 50;
     } else if (step.type === 'compress_pdf') {
         step.config.level = document.getElementById('config-compress-level').value;
+        step.config.target_size_kb = parseInt(document.getElementById('config-compress-target-size').value) || null;
     }
 
     closeConfigModal();
@@ -1178,6 +1228,10 @@ function handleWorkflowEvent(data, statusDisplay, resultDisplay) {
             updateStatusText(`Processing: ${data.label}`, data.step + 1, data.total);
             break;
 
+        case 'step_progress':
+            updateStatusText(`Processing: ${data.label} (${data.current}/${data.step_total})`, data.step + 1, data.total);
+            break;
+
         case 'step_complete':
             setStepCompleted(data.step);
             break;
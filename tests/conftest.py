@@ -51,6 +51,34 @@ def locked_pdf(tmp_path_factory, sample_pdf):
     return {"path": file_path, "password": password}
 
 
+@pytest.fixture(scope="session")
+def image_pdf(tmp_path_factory):
+    """Creates a PDF with several large embedded photos for compression tests."""
+    import io
+    import fitz
+    import numpy as np
+    from PIL import Image
+
+    d = tmp_path_factory.mktemp("image_pdf")
+    file_path = d / "photos.pdf"
+
+    rng = np.random.default_rng(0)
+    doc = fitz.open()
+    for i in range(3):
+        page = doc.new_page()
+        for j in range(2):
+            # Smooth gradient plus noise, so JPEG behaves like on a real photo
+            gradient = np.linspace(0, 200, 2000, dtype=np.float32)
+            pixels = gradient[None, :, None] + rng.normal(0, 20, (1600, 2000, 3))
+            img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=95)
+            page.insert_image(fitz.Rect(50, 50 + j * 350, 550, 450 + j * 350), stream=buf.getvalue())
+    doc.save(str(file_path))
+    doc.close()
+
+    return file_path
+
 @pytest.fixture(scope="session")
 def sample_heic(tmp_path_factory):
     """Creates a sample HEIC file for testing."""
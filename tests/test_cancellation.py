@@ -0,0 +1,53 @@
+"""
+Tests for cooperative cancellation in scripts/cancellation.py.
+"""
+import asyncio
+import pytest
+from scripts.cancellation import CancellationToken, OperationCancelled, cancel_on_disconnect, check_cancelled
+
+
+class _FakeRequest:
+    """Stands in for a Starlette request that disconnects after a few polls."""
+
+    class url:
+        path = "/api/test"
+
+    def __init__(self, connected_polls):
+        self.connected_polls = connected_polls
+
+    async def is_disconnected(self):
+        self.connected_polls -= 1
+        return self.connected_polls < 0
+
+
+def test_token_check_raises_once_cancelled():
+    token = CancellationToken()
+    token.check()
+    check_cancelled(None)
+
+    token.cancel()
+
+    assert token.cancelled
+    with pytest.raises(OperationCancelled):
+        check_cancelled(token)
+
+
+def test_cancel_on_disconnect_cancels_the_token():
+    async def run():
+        async with cancel_on_disconnect(_FakeRequest(connected_polls=2), interval=0.01) as token:
+            for _ in range(100):
+                if token.cancelled:
+                    break
+                await asyncio.sleep(0.01)
+        return token
+
+    assert asyncio.run(run()).cancelled
+
+
+def test_cancel_on_disconnect_leaves_a_connected_request_alone():
+    async def run():
+        async with cancel_on_disconnect(_FakeRequest(connected_polls=1000), interval=0.01) as token:
+            await asyncio.sleep(0.05)
+        return token
+
+    assert not asyncio.run(run()).cancelled
@@ -0,0 +1,78 @@
+"""
+Tests for the execution layer in scripts/executors.py.
+"""
+import asyncio
+import os
+import threading
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+import scripts.executors as executors
+from scripts.pdf_utils import pdf_to_docx
+
+
+def test_run_tasks_use_their_own_pools():
+    """Image, PDF and AI tasks run on separate, named thread pools."""
+    async def names():
+        name = lambda: threading.current_thread().name
+        return (await executors.run_image_task(name),
+                await executors.run_pdf_task(name),
+                await executors.run_ai_task(name))
+
+    image, pdf, ai = asyncio.run(names())
+    assert image.startswith("fileforge-image")
+    assert pdf.startswith("fileforge-pdf")
+    assert ai.startswith("fileforge-ai")
+
+
+def test_call_in_docx_pool_runs_inline_when_disabled():
+    with patch.object(executors, "DOCX_PROCESSES", 0):
+        assert executors.get_docx_process_pool() is None
+        assert executors.call_in_docx_pool(os.getpid) == os.getpid()
+
+
+def test_call_in_docx_pool_converts_in_worker_process(sample_pdf, tmp_path):
+    """With the process backend enabled, pdf2docx runs in a separate warm worker."""
+    with patch.object(executors, "DOCX_PROCESSES", 1):
+        try:
+            executors.warm_docx_process_pool()
+            assert executors.call_in_docx_pool(os.getpid) != os.getpid()
+
+            output = executors.call_in_docx_pool(pdf_to_docx, str(sample_pdf), str(tmp_path))
+            assert Path(output).exists()
+            assert Path(output).suffix == ".docx"
+        finally:
+            executors.shutdown_docx_process_pool()
+    assert executors._docx_pool is None
+
+
+def _kill_self() -> None:
+    os._exit(1)
+
+
+def test_call_in_docx_pool_recovers_from_a_dead_worker():
+    """A worker killed out from under the pool does not break later conversions."""
+    import signal
+    with patch.object(executors, "DOCX_PROCESSES", 1):
+        try:
+            worker_pid = executors.call_in_docx_pool(os.getpid)
+            broken_pool = executors._docx_pool
+            os.kill(worker_pid, signal.SIGKILL)
+
+            new_pid = executors.call_in_docx_pool(os.getpid)
+
+            assert new_pid not in (worker_pid, os.getpid())
+            assert executors._docx_pool is not broken_pool
+        finally:
+            executors.shutdown_docx_process_pool()
+
+
+def test_call_in_docx_pool_gives_up_after_a_second_crash():
+    with patch.object(executors, "DOCX_PROCESSES", 1):
+        try:
+            with pytest.raises(RuntimeError, match="crashed its worker"):
+                executors.call_in_docx_pool(_kill_self)
+            # The pool left behind is healthy
+            assert executors.call_in_docx_pool(os.getpid) != os.getpid()
+        finally:
+            executors.shutdown_docx_process_pool()
@@ -52,6 +52,21 @@ def test_crop_out_of_bounds(sample_crop_image, tmp_path):
         assert img.size == (50, 50)
 
 
+@pytest.mark.parametrize("x, y", [(200, 0), (0, 200), (100, 0)])
+def test_crop_starting_past_the_edge_raises(sample_crop_image, tmp_path, x, y):
+    """A box that does not overlap the image is an error, not a blank crop."""
+    with pytest.raises(ValueError, match="outside the image"):
+        crop_image(str(sample_crop_image), str(tmp_path), x=x, y=y, width=10, height=10)
+    assert not list(tmp_path.glob("*_cropped.jpg"))
+
+
+@pytest.mark.parametrize("orientation", [2, 6, 8])
+def test_crop_past_the_edge_raises_for_rotated_images(tmp_path, orientation):
+    src = _oriented_png(tmp_path, orientation)
+    with pytest.raises(ValueError, match="outside the image"):
+        crop_image(str(src), str(tmp_path), x=2000, y=0, width=10, height=10)
+
+
 def test_crop_negative_x_clamped(sample_crop_image, tmp_path):
     """Negative x coordinate is clamped to 0."""
     output_dir = tmp_path / "output_crop_neg_x"
@@ -104,3 +119,48 @@ def test_crop_produces_jpeg(sample_crop_image, tmp_path):
     result = crop_image(str(sample_crop_image), str(output_dir), x=0, y=0, width=50, height=50)
 
     assert result.endswith(".jpg")
+
+
+def _oriented_png(tmp_path, orientation, mode="RGB"):
+    """Writes a 120x80 noise PNG tagged with the given EXIF orientation."""
+    import numpy as np
+    pixels = np.random.default_rng(orientation).integers(0, 255, (80, 120, 4), dtype=np.uint8)
+    img = Image.fromarray(pixels, "RGBA").convert(mode)
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    path = tmp_path / f"oriented_{orientation}_{mode}.png"
+    img.save(path, "PNG", exif=exif)
+    return path
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_crop_box_maps_through_exif_orientation(tmp_path, orientation):
+    """Cropping before the transpose yields the same pixels as transposing the whole image first."""
+    from PIL import ImageOps
+    from scripts.image_utils import _prepare_image
+
+    src = _oriented_png(tmp_path, orientation, mode="RGBA")
+    box = (7, 11, 52, 38)
+    with Image.open(src) as img:
+        expected = ImageOps.exif_transpose(img).convert("RGB").crop(box)
+    with Image.open(src) as img:
+        actual = _prepare_image(img, box=box)
+
+    assert actual.mode == "RGB"
+    assert actual.size == expected.size
+    assert actual.tobytes() == expected.tobytes()
+
+
+def test_crop_clamps_to_displayed_bounds(tmp_path):
+    """Crop bounds are checked against the rotated (displayed) size."""
+    src = _oriented_png(tmp_path, 6)  # Stored 120x80, displayed 80x120
+    result = crop_image(str(src), str(tmp_path), x=40, y=60, width=100, height=100)
+    with Image.open(result) as img:
+        assert img.size == (40, 60)
+
+
+def test_prepare_image_without_orientation_is_not_copied(sample_crop_image):
+    """RGB images without an orientation tag pass through untouched."""
+    from scripts.image_utils import _prepare_image
+    with Image.open(sample_crop_image) as img:
+        assert _prepare_image(img) is img
@@ -131,3 +131,107 @@ def test_resize_output_filename_contains_resized(sample_image, tmp_path):
     result = resize_image(str(sample_image), str(output_dir), mode='percentage', percentage=50)
 
     assert "_resized" in Path(result).name
+
+
+@pytest.fixture(scope="session")
+def detailed_image(tmp_path_factory):
+    """Creates a 3000x2000 photo-like JPEG (gradient plus noise)."""
+    import numpy as np
+    d = tmp_path_factory.mktemp("detailed")
+    file_path = d / "detailed.jpg"
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 220, 3000, dtype=np.float32)[None, :, None]
+    pixels = np.clip(gradient + rng.normal(0, 15, (2000, 3000, 3)), 0, 255).astype(np.uint8)
+    Image.fromarray(pixels, "RGB").save(file_path, "JPEG", quality=92)
+    return file_path
+
+
+@pytest.mark.parametrize("target_kb", [600, 150, 40])
+def test_resize_target_size_lands_under_target(detailed_image, tmp_path, target_kb):
+    """The result fits the target without wasting most of the budget."""
+    from scripts.image_utils import TARGET_FILL_RATIO
+    result = resize_image(str(detailed_image), str(tmp_path), mode='target_size', target_size_kb=target_kb)
+    size = os.path.getsize(result)
+    assert size <= target_kb * 1024
+    assert size >= target_kb * 1024 * TARGET_FILL_RATIO * 0.8
+
+
+def test_resize_target_size_prefers_full_resolution(detailed_image, tmp_path):
+    """A target reachable by lowering quality keeps the original dimensions."""
+    result = resize_image(str(detailed_image), str(tmp_path), mode='target_size', target_size_kb=600)
+    with Image.open(result) as img:
+        assert img.size == (3000, 2000)
+
+
+def test_resize_target_size_downscales_as_little_as_possible(tmp_path):
+    """Noise that only fits scaled down keeps at least the area of scaling at the lowest quality."""
+    import numpy as np
+    source = tmp_path / "noise.png"
+    pixels = np.random.default_rng(1).integers(0, 256, (2000, 3000, 3), dtype=np.uint8)
+    Image.fromarray(pixels, "RGB").save(source)
+    result = resize_image(str(source), str(tmp_path), mode='target_size', target_size_kb=1000)
+    assert os.path.getsize(result) <= 1000 * 1024
+    with Image.open(result) as img:
+        assert img.width * img.height >= 2430 * 1620
+
+
+def test_fit_target_size_survives_flat_probe_sizes():
+    """Probes of equal (or degenerate) size do not break the scale fit."""
+    from unittest.mock import patch
+    from scripts import image_utils
+    img = Image.new('RGB', (3000, 2000), color='gray')
+
+    with patch.object(image_utils, "_encode_jpeg", lambda im, quality: b"x" * 50_000):
+        data = image_utils._fit_target_size(img, 10_000)
+
+    assert len(data) == 50_000  # Nothing fits; best effort returns the last attempt
+
+
+def test_resize_target_size_writes_output_once(detailed_image, tmp_path):
+    """All trial encodes stay in memory; only the final JPEG touches disk."""
+    from unittest.mock import patch
+    saved_to = []
+    original_save = Image.Image.save
+
+    def recording_save(self, fp, *args, **kwargs):
+        saved_to.append(fp)
+        return original_save(self, fp, *args, **kwargs)
+
+    with patch.object(Image.Image, "save", recording_save):
+        result = resize_image(str(detailed_image), str(tmp_path), mode='target_size', target_size_kb=40)
+
+    assert not any(isinstance(fp, (str, Path)) for fp in saved_to)
+    assert os.path.getsize(result) <= 40 * 1024
+
+
+def test_resize_percentage_decodes_jpeg_at_reduced_scale(detailed_image, tmp_path):
+    """Large downscales of JPEGs ask libjpeg for a reduced-size decode."""
+    from unittest.mock import patch
+    from PIL.JpegImagePlugin import JpegImageFile
+
+    original_draft = JpegImageFile.draft
+    decoded = []
+
+    def recording_draft(self, mode, size):
+        result = original_draft(self, mode, size)
+        decoded.append(self.size)
+        return result
+
+    with patch.object(JpegImageFile, "draft", recording_draft):
+        result = resize_image(str(detailed_image), str(tmp_path), mode='percentage', percentage=10)
+
+    assert decoded == [(375, 250)]  # 1/8 scale still covers the 300x200 output
+    with Image.open(result) as img:
+        assert img.size == (300, 200)
+
+
+def test_resize_respects_exif_orientation_with_draft(tmp_path):
+    """Target dimensions apply to the displayed (EXIF-rotated) image."""
+    src = tmp_path / "rotated.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotate 90 degrees clockwise on display
+    Image.new("RGB", (1600, 800), "red").save(src, "JPEG", exif=exif)
+
+    result = resize_image(str(src), str(tmp_path), mode='dimensions', width=100)
+    with Image.open(result) as img:
+        assert img.size == (100, 200)
@@ -71,3 +71,37 @@ def test_heic_to_jpeg_output_filename(sample_heic, tmp_path):
     # Should have same stem as input but with .jpg extension
     assert Path(result).stem == sample_heic.stem
     assert Path(result).suffix == '.jpg'
+
+
+def test_heif_opener_reads_primary_image_only():
+    """The HEIF plugin is registered with tuned decoder threads and without thumbnails/depth/aux images."""
+    import pillow_heif
+    from scripts.image_utils import HEIC_DECODE_THREADS
+
+    assert HEIC_DECODE_THREADS >= 1
+    assert pillow_heif.options.DECODE_THREADS == HEIC_DECODE_THREADS
+    assert pillow_heif.options.THUMBNAILS is False
+    assert pillow_heif.options.DEPTH_IMAGES is False
+    assert pillow_heif.options.AUX_IMAGES is False
+
+
+def test_heic_to_jpeg_fast_skips_optimize(sample_heic, tmp_path):
+    """fast=True encodes without optimize=True; the default still optimizes."""
+    from unittest.mock import patch
+    from PIL import Image
+
+    original_save = Image.Image.save
+    calls = []
+
+    def recording_save(self, fp, format=None, **params):
+        calls.append(params)
+        return original_save(self, fp, format, **params)
+
+    with patch.object(Image.Image, "save", recording_save):
+        heic_to_jpeg(str(sample_heic), str(tmp_path), quality=90)
+        fast_path = heic_to_jpeg(str(sample_heic), str(tmp_path), quality=90, fast=True)
+
+    assert [c["optimize"] for c in calls] == [True, False]
+    with Image.open(fast_path) as img:
+        assert img.format == "JPEG"
+        assert img.size == (100, 100)
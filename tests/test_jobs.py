@@ -0,0 +1,122 @@
+"""
+Tests for the background job subsystem in scripts/jobs.py.
+"""
+import time
+import pytest
+from scripts.jobs import JobManager
+
+
+def _wait_for(manager, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"Job {job_id} did not finish in time")
+
+
+@pytest.fixture
+def manager():
+    m = JobManager(max_workers=2)
+    yield m
+    m.shutdown()
+
+
+def test_job_completes_with_filename_and_progress(manager):
+    """A successful job reports completion, final progress and the output basename."""
+    def work(path, progress_callback=None):
+        for i in range(3):
+            progress_callback(i + 1, 3)
+        return f"/some/dir/{path}.docx"
+
+    job_id = manager.submit(work, "report")
+    job = _wait_for(manager, job_id)
+
+    assert job["status"] == "completed"
+    assert job["filename"] == "report.docx"
+    assert job["progress"] == {"current": 3, "total": 3}
+    assert job["error"] is None
+
+
+def test_job_failure_records_error(manager):
+    """An exception in the job marks it failed and exposes the message."""
+    def work(progress_callback=None):
+        raise ValueError("boom")
+
+    job = _wait_for(manager, manager.submit(work))
+    assert job["status"] == "failed"
+    assert job["error"] == "boom"
+
+
+def test_job_cleanup_runs_on_success_and_failure(manager):
+    """The cleanup hook runs once whether the job succeeds or fails."""
+    calls = []
+
+    def ok(progress_callback=None):
+        return "out.docx"
+
+    def bad(progress_callback=None):
+        raise RuntimeError("nope")
+
+    _wait_for(manager, manager.submit(ok, cleanup=lambda: calls.append("ok")))
+    _wait_for(manager, manager.submit(bad, cleanup=lambda: calls.append("bad")))
+    assert sorted(calls) == ["bad", "ok"]
+
+
+def test_unknown_job_returns_none(manager):
+    assert manager.get("missing") is None
+
+
+def test_finished_jobs_are_pruned_after_retention():
+    """Finished jobs older than the retention window are forgotten on the next submit."""
+    m = JobManager(max_workers=1, retention_seconds=0)
+    try:
+        first = m.submit(lambda progress_callback=None: "a.docx")
+        _wait_for(m, first)
+        time.sleep(0.01)
+        second = m.submit(lambda progress_callback=None: "b.docx")
+        assert m.get(first) is None
+        _wait_for(m, second)
+    finally:
+        m.shutdown()
+
+
+def test_cancel_stops_a_running_job(manager):
+    """A cancellable job gets a token; cancel() makes its next check end the job as cancelled."""
+    import threading
+    started = threading.Event()
+
+    def work(progress_callback=None, cancel_token=None):
+        started.set()
+        while True:
+            cancel_token.check()
+            time.sleep(0.01)
+
+    job_id = manager.submit(work, cancellable=True)
+    assert started.wait(5)
+    assert manager.cancel(job_id) is True
+    job = _wait_for(manager, job_id)
+
+    assert job["status"] == "cancelled"
+    assert manager.cancel(job_id) is False
+
+
+def test_cancelled_queued_job_never_runs():
+    import threading
+    m = JobManager(max_workers=1)
+    release = threading.Event()
+    ran, cleaned = [], []
+    try:
+        m.submit(lambda progress_callback=None: release.wait(5) and "a.docx")
+        queued = m.submit(lambda progress_callback=None: ran.append(1) or "b.docx",
+                          cleanup=lambda: cleaned.append(1))
+        assert m.cancel(queued) is True
+        assert m.get(queued)["status"] == "cancelled"
+        release.set()
+    finally:
+        m.shutdown()
+
+    assert ran == []
+    assert cleaned == [1]
+    assert m.cancel("unknown") is False
@@ -1,4 +1,5 @@
 from fastapi.testclient import TestClient
+import main
 from main import app
 from unittest.mock import patch
 import pytest
@@ -16,8 +17,11 @@ def mock_dirs(tmp_path):
     output_dir.mkdir()
 
     # Patch the variables in main.py
-    with patch("main.UPLOAD_DIR", upload_dir), patch("main.OUTPUT_DIR", output_dir):
-        yield {"upload": upload_dir, "output": output_dir}
+    from scripts.result_cache import ResultCache
+    cache = ResultCache(tmp_path / "cache", max_bytes=50 * 1024 * 1024, ttl_seconds=3600)
+    with patch("main.UPLOAD_DIR", upload_dir), patch("main.OUTPUT_DIR", output_dir), \
+         patch("main.result_cache", cache):
+        yield {"upload": upload_dir, "output": output_dir, "cache": cache}
 
 def test_read_index(auth_client):
     response = auth_client.get("/")
@@ -149,6 +153,15 @@ def test_api_crop_image(sample_image_file, mock_dirs, auth_client):
     assert "cropped" in resp_data["filename"]
     assert (mock_dirs["output"] / resp_data["filename"]).exists()
 
+def test_api_crop_image_outside_image_is_400(sample_image_file, mock_dirs, auth_client):
+    with open(sample_image_file, "rb") as f:
+        files = {"file": (sample_image_file.name, f, "image/jpeg")}
+        data = {"x": 2000, "y": 0, "width": 10, "height": 10}
+        response = auth_client.post("/api/image/crop", files=files, data=data)
+
+    assert response.status_code == 400
+    assert "outside the image" in response.json()["detail"]
+
 def test_download_file_deletes_after_download(sample_pdf, mock_dirs, auth_client) -> None:
     """
     Verifies that a file is successfully served and then automatically deleted
@@ -191,6 +204,7 @@ def test_api_compress_pdf(sample_pdf, mock_dirs, auth_client):
     assert "original_size" in resp_data
     assert "compressed_size" in resp_data
     assert "reduction_pct" in resp_data
+    assert resp_data["images"] == []
     assert (mock_dirs["output"] / resp_data["filename"]).exists()
 
 
@@ -205,6 +219,20 @@ def test_api_compress_pdf_medium_level(sample_pdf, mock_dirs, auth_client):
     assert response.json()["status"] == "success"
 
 
+def test_api_compress_pdf_target_size(image_pdf, mock_dirs, auth_client):
+    """target_size_kb overrides the level and reports whether the target was met."""
+    target_kb = image_pdf.stat().st_size // 1024 // 4
+    with open(image_pdf, "rb") as f:
+        files = {"file": (image_pdf.name, f, "application/pdf")}
+        data = {"level": "low", "target_size_kb": str(target_kb)}
+        response = auth_client.post("/api/pdf/compress", files=files, data=data)
+
+    assert response.status_code == 200
+    resp_data = response.json()
+    assert resp_data["target_met"] is True
+    assert resp_data["compressed_size"] <= target_kb * 1024
+
+
 def test_api_compress_pdf_requires_auth(sample_pdf, mock_dirs):
     """Compress endpoint requires authentication."""
     from fastapi.testclient import TestClient
@@ -335,6 +363,162 @@ def test_api_workflow_crop_image_step(sample_image_file, mock_dirs, auth_client)
     assert "complete" in response.text
 
 
+# ---------------------------------------------------------------------------
+# /api/image/batch endpoint tests
+# ---------------------------------------------------------------------------
+
+def _sse_events(body):
+    import json
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+def test_api_image_batch_resize(sample_image_file, mock_dirs, auth_client):
+    """Batch resize streams one event per file and zips every output under the client's names."""
+    import io
+    import json
+    import zipfile
+
+    data = sample_image_file.read_bytes()
+    files = [("files", (name, data, "image/jpeg")) for name in ("a.jpg", "b.jpg", "a.jpg")]
+    config = json.dumps({"mode": "percentage", "percentage": 50})
+    response = auth_client.post("/api/image/batch", files=files, data={"operation": "resize", "config": config})
+
+    assert response.status_code == 200
+    events = _sse_events(response.text)
+    assert events[0] == {"event": "batch_start", "total": 3, "operation": "resize"}
+    assert sorted(e["index"] for e in events if e["event"] == "file_complete") == [0, 1, 2]
+    assert events[-1]["event"] == "complete"
+    assert events[-1]["failed"] == 0
+
+    assert list(mock_dirs["upload"].iterdir()) == []
+
+    response = auth_client.get(f"/api/download/{events[-1]['filename']}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert sorted(archive.namelist()) == ["a_resized.jpg", "a_resized_1.jpg", "b_resized.jpg"]
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+    # The outputs and the manifest are deleted once the zip has been streamed
+    assert list(mock_dirs["output"].iterdir()) == []
+
+
+def test_api_download_refuses_zip_manifest(sample_image_file, mock_dirs, auth_client):
+    """A streamed zip's manifest is not downloadable, so requesting it cannot orphan the members."""
+    import json
+
+    files = [("files", ("a.jpg", sample_image_file.read_bytes(), "image/jpeg"))]
+    config = json.dumps({"mode": "percentage", "percentage": 50})
+    response = auth_client.post("/api/image/batch", files=files, data={"operation": "resize", "config": config})
+    zip_name = _sse_events(response.text)[-1]["filename"]
+
+    assert auth_client.get(f"/api/download/{zip_name}.manifest.json").status_code == 404
+    assert (mock_dirs["output"] / f"{zip_name}.manifest.json").exists()
+    response = auth_client.get(f"/api/download/{zip_name}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+
+def test_api_image_batch_zip_upload(sample_image_file, mock_dirs, auth_client):
+    """Zip uploads are expanded; non-images are skipped and broken images reported without failing the batch."""
+    import io
+    import zipfile
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("photos/one.jpg", sample_image_file.read_bytes())
+        archive.writestr("photos/broken.jpg", b"not an image")
+        archive.writestr("photos/notes.txt", b"hello")
+        archive.writestr("__MACOSX/photos/._one.jpg", b"resource fork")
+    files = [("files", ("export.zip", buffer.getvalue(), "application/zip"))]
+    data = {"operation": "crop", "config": '{"x": 0, "y": 0, "width": 20, "height": 20}'}
+    response = auth_client.post("/api/image/batch", files=files, data=data)
+
+    assert response.status_code == 200
+    events = _sse_events(response.text)
+    assert events[0]["total"] == 2
+    assert [e["name"] for e in events if e["event"] == "file_error"] == ["broken.jpg"]
+    assert events[-1]["event"] == "complete"
+    assert events[-1]["failed"] == 1
+    response = auth_client.get(f"/api/download/{events[-1]['filename']}")
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["one_cropped.jpg"]
+    assert list(mock_dirs["upload"].iterdir()) == []
+
+
+def test_api_image_batch_invalid_operation(sample_image_file, mock_dirs, auth_client):
+    """Unknown operations and invalid configs are rejected before anything is saved."""
+    files = [("files", ("a.jpg", sample_image_file.read_bytes(), "image/jpeg"))]
+    response = auth_client.post("/api/image/batch", files=files, data={"operation": "rotate"})
+    assert response.status_code == 400
+
+    response = auth_client.post("/api/image/batch", files=files,
+                                data={"operation": "crop", "config": '{"x": "left"}'})
+    assert response.status_code == 400
+    assert list(mock_dirs["upload"].iterdir()) == []
+
+
+def test_api_image_batch_crop_requires_width_and_height(sample_image_file, mock_dirs, auth_client):
+    """Like /api/image/crop, a batch crop without a size is rejected instead of defaulting to 100x100."""
+    files = [("files", ("a.jpg", sample_image_file.read_bytes(), "image/jpeg"))]
+    response = auth_client.post("/api/image/batch", files=files,
+                                data={"operation": "crop", "config": '{"x": 0, "y": 0, "width": 10}'})
+
+    assert response.status_code == 400
+    assert "'height'" in response.json()["detail"]
+    assert list(mock_dirs["upload"].iterdir()) == []
+
+
+def test_api_image_batch_abandoned_stream_removes_late_outputs(sample_image_file, mock_dirs):
+    """An item still running on the pool when the client goes away has its output deleted when it lands."""
+    import asyncio
+    import io
+    import threading
+    import time
+    from fastapi import UploadFile
+
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+    original = main.execute_step
+
+    def slow_execute_step(*args):
+        started.set()
+        release.wait(5)
+        try:
+            return original(*args)
+        finally:
+            finished.set()
+
+    async def abandon():
+        upload = UploadFile(file=io.BytesIO(sample_image_file.read_bytes()), filename="a.jpg")
+        response = await main.api_image_batch(files=[upload], operation="resize",
+                                              config='{"percentage": 50}')
+        stream = response.body_iterator
+        assert "batch_start" in await stream.__anext__()
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        await stream.aclose()
+
+    with patch.object(main, "execute_step", slow_execute_step):
+        asyncio.run(abandon())
+        release.set()
+        assert finished.wait(5)
+        # The output is written, then deleted by the worker as soon as it is tracked
+        deadline = time.time() + 5
+        while list(mock_dirs["output"].iterdir()) and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert list(mock_dirs["output"].iterdir()) == []
+
+
+def test_api_image_batch_too_many_files(sample_image_file, mock_dirs, auth_client):
+    """Batches over FILE_FORGE_BATCH_MAX_FILES are rejected and their uploads removed."""
+    files = [("files", (f"{i}.jpg", sample_image_file.read_bytes(), "image/jpeg")) for i in range(3)]
+    with patch.object(main, "BATCH_MAX_FILES", 2):
+        response = auth_client.post("/api/image/batch", files=files, data={"operation": "heic_to_jpeg"})
+
+    assert response.status_code == 400
+    assert list(mock_dirs["upload"].iterdir()) == []
+
+
 # ---------------------------------------------------------------------------
 # delete_file_after_download unit tests
 # ---------------------------------------------------------------------------
@@ -377,3 +561,117 @@ def test_api_remove_password_path_traversal_sanitized(locked_pdf, mock_dirs, aut
     filename = response.json()["filename"]
     assert "/" not in filename
     assert "\\" not in filename
+
+
+# ---------------------------------------------------------------------------
+# AI conversion jobs
+# ---------------------------------------------------------------------------
+
+def test_api_convert_to_word_ai_returns_job_and_completes(sample_pdf, mock_dirs, auth_client):
+    """AI conversion is queued as a job whose status can be polled to completion."""
+    import time
+
+    def fake_paddle(input_path, output_dir, password=None, progress_callback=None, page_cache=None,
+                    cancel_token=None):
+        progress_callback(1, 1)
+        output = mock_dirs["output"] / "sample_recovered.docx"
+        output.write_bytes(b"docx")
+        return str(output)
+
+    with patch("main.pdf_to_word_paddle", fake_paddle):
+        with open(sample_pdf, "rb") as f:
+            files = {"file": (sample_pdf.name, f, "application/pdf")}
+            response = auth_client.post("/api/pdf/convert-to-word", files=files, data={"use_ai": "true"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "queued"
+        job_id = data["job_id"]
+
+        for _ in range(200):
+            job = auth_client.get(f"/api/jobs/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.01)
+
+    assert job["status"] == "completed"
+    assert job["filename"] == "sample_recovered.docx"
+    assert job["progress"] == {"current": 1, "total": 1}
+    # The upload is removed once the job has finished with it
+    assert list(mock_dirs["upload"].iterdir()) == []
+
+
+def test_api_job_status_not_found(auth_client):
+    response = auth_client.get("/api/jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+def test_api_cancel_job(auth_client):
+    """DELETE cancels a job that has not finished; unknown or finished jobs are 404."""
+    import threading
+    release = threading.Event()
+    job_id = main.ai_jobs.submit(lambda progress_callback=None, cancel_token=None: release.wait(5) and "x.docx",
+                                 cancellable=True)
+    try:
+        response = auth_client.delete(f"/api/jobs/{job_id}")
+        assert response.status_code == 200
+        assert response.json() == {"job_id": job_id, "status": "cancelling"}
+    finally:
+        release.set()
+
+    assert auth_client.delete("/api/jobs/does-not-exist").status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# Result cache
+# ---------------------------------------------------------------------------
+
+def test_api_compress_pdf_cache_hit_skips_recompression(sample_pdf, mock_dirs, auth_client):
+    """Re-uploading the same file with the same level is served from the cache."""
+    import main
+
+    def post(level):
+        with open(sample_pdf, "rb") as f:
+            files = {"file": (sample_pdf.name, f, "application/pdf")}
+            return auth_client.post("/api/pdf/compress", files=files, data={"level": level})
+
+    first = post("low").json()
+    with patch("main.compress_pdf", side_effect=AssertionError("should not recompress")):
+        second = post("low").json()
+
+    assert second["status"] == "success"
+    assert second["compressed_size"] == first["compressed_size"]
+    assert second["filename"] != first["filename"]
+    assert (mock_dirs["output"] / second["filename"]).exists()
+
+    # Different parameters are a different cache entry
+    with patch("main.compress_pdf", wraps=main.compress_pdf) as compress:
+        assert post("medium").status_code == 200
+    compress.assert_called_once()
+
+
+def test_api_remove_password_cache_keyed_on_password(locked_pdf, mock_dirs, auth_client):
+    """A cached unlock result is never returned for a wrong password."""
+    file_path = locked_pdf["path"]
+
+    def post(password):
+        with open(file_path, "rb") as f:
+            files = {"file": (file_path.name, f, "application/pdf")}
+            return auth_client.post("/api/pdf/remove-password", files=files, data={"password": password})
+
+    assert post(locked_pdf["password"]).status_code == 200
+    assert post("wrong").status_code == 400
+
+
+def test_password_protected_results_are_not_cached(locked_pdf, mock_dirs, auth_client):
+    """Decrypted outputs are never copied into the result cache."""
+    file_path = locked_pdf["path"]
+    for endpoint, data in (("/api/pdf/remove-password", {}), ("/api/pdf/compress", {"level": "low"}),
+                           ("/api/pdf/extract-pages", {"pages": "1"})):
+        with open(file_path, "rb") as f:
+            files = {"file": (file_path.name, f, "application/pdf")}
+            response = auth_client.post(endpoint, files=files, data={**data, "password": locked_pdf["password"]})
+        assert response.status_code == 200, endpoint
+
+    cache_dir = mock_dirs["cache"].cache_dir
+    assert not cache_dir.exists() or list(cache_dir.iterdir()) == []
@@ -0,0 +1,202 @@
+"""
+Tests for page-parallel AI conversion in pdf_to_word_paddle.
+
+PaddleOCR itself is replaced by lightweight fakes so the page fan-out and
+reassembly logic can be exercised without the models.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+from docx import Document
+import scripts.pdf_utils as pdf_utils
+
+
+def _fake_recovery_helpers():
+    def save_structure_res(result, save_dir, page_name):
+        pass
+
+    def sorted_layout_boxes(result, width):
+        return result
+
+    def convert_info_docx(img, res, save_dir, page_name):
+        doc = Document()
+        doc.add_paragraph(page_name)
+        doc.save(str(Path(save_dir) / f"{page_name}_ocr.docx"))
+
+    return save_structure_res, sorted_layout_boxes, convert_info_docx
+
+
+@pytest.fixture
+def fake_paddle():
+    with patch.object(pdf_utils, "_load_recovery_helpers", _fake_recovery_helpers), \
+         patch.object(pdf_utils, "get_paddle_engine", return_value=lambda img: []):
+        yield
+
+
+def _paragraphs(path):
+    return [p.text for p in Document(path).paragraphs if p.text]
+
+
+def test_parallel_pages_are_merged_in_page_order(multi_page_pdf, tmp_path, fake_paddle):
+    """Pages recovered by the worker pool are reassembled in document order."""
+    progress = []
+    with ThreadPoolExecutor(max_workers=4) as pool, \
+         patch.object(pdf_utils, "get_paddle_process_pool", return_value=pool):
+        output = pdf_utils.pdf_to_word_paddle(
+            str(multi_page_pdf), str(tmp_path), processes=4,
+            progress_callback=lambda done, total: progress.append((done, total)),
+        )
+
+    assert _paragraphs(output) == ["page_0", "page_1", "page_2", "page_3"]
+    assert progress[0] == (0, 4)
+    assert progress[-1] == (4, 4)
+
+
+def test_single_process_uses_serial_path(multi_page_pdf, tmp_path, fake_paddle):
+    """processes=1 never starts a worker pool."""
+    with patch.object(pdf_utils, "get_paddle_process_pool") as get_pool:
+        output = pdf_utils.pdf_to_word_paddle(str(multi_page_pdf), str(tmp_path), processes=1)
+
+    get_pool.assert_not_called()
+    assert _paragraphs(output) == ["page_0", "page_1", "page_2", "page_3"]
+
+
+def test_pipelined_serial_path_reports_progress(multi_page_pdf, tmp_path, fake_paddle):
+    """The in-process pipeline reports progress for every written page."""
+    progress = []
+    pdf_utils.pdf_to_word_paddle(
+        str(multi_page_pdf), str(tmp_path), processes=1,
+        progress_callback=lambda done, total: progress.append((done, total)),
+    )
+    assert progress == [(0, 4), (1, 4), (2, 4), (3, 4), (4, 4)]
+
+
+def test_pipelined_inference_error_is_raised(multi_page_pdf, tmp_path, fake_paddle):
+    """An inference failure stops the pipeline and propagates instead of hanging."""
+    calls = []
+
+    def failing_engine(img):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("inference failed")
+        return []
+
+    with patch.object(pdf_utils, "get_paddle_engine", return_value=failing_engine):
+        with pytest.raises(RuntimeError, match="inference failed"):
+            pdf_utils.pdf_to_word_paddle(str(multi_page_pdf), str(tmp_path), processes=1)
+
+
+def test_pipelined_writer_error_is_raised(multi_page_pdf, tmp_path):
+    """A DOCX writing failure stops the pipeline and propagates."""
+    save_structure_res, sorted_layout_boxes, _ = _fake_recovery_helpers()
+
+    def convert_info_docx(img, res, save_dir, page_name):
+        raise IOError("disk full")
+
+    with patch.object(pdf_utils, "_load_recovery_helpers",
+                      return_value=(save_structure_res, sorted_layout_boxes, convert_info_docx)), \
+         patch.object(pdf_utils, "get_paddle_engine", return_value=lambda img: []):
+        with pytest.raises(IOError, match="disk full"):
+            pdf_utils.pdf_to_word_paddle(str(multi_page_pdf), str(tmp_path), processes=1)
+
+
+# ---------------------------------------------------------------------------
+# Per-page cache
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def repeated_page_pdf(tmp_path):
+    """Three pages where the first and last are identical."""
+    from reportlab.pdfgen import canvas
+    path = tmp_path / "repeated.pdf"
+    c = canvas.Canvas(str(path))
+    for text in ("Cover sheet", "Body", "Cover sheet"):
+        c.drawString(100, 750, text)
+        c.showPage()
+    c.save()
+    return path
+
+
+def _counting_engine(calls):
+    def engine(img):
+        calls.append(1)
+        return []
+    return engine
+
+
+def test_page_cache_skips_inference_for_repeated_pages(repeated_page_pdf, tmp_path):
+    """Identical pages across documents are recovered from the page cache."""
+    from scripts.result_cache import ResultCache
+    page_cache = ResultCache(tmp_path / "pages", max_bytes=10 * 1024 * 1024, ttl_seconds=60)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    calls = []
+
+    with patch.object(pdf_utils, "_load_recovery_helpers", _fake_recovery_helpers), \
+         patch.object(pdf_utils, "get_paddle_engine", return_value=_counting_engine(calls)):
+        pdf_utils.pdf_to_word_paddle(str(repeated_page_pdf), str(out_dir), processes=1, page_cache=page_cache)
+        first_run = len(calls)
+        output = pdf_utils.pdf_to_word_paddle(str(repeated_page_pdf), str(out_dir), processes=1,
+                                              page_cache=page_cache)
+
+    assert first_run in (2, 3)  # The repeat may still be in flight when page 3 is looked up
+    assert len(calls) == first_run
+    assert _paragraphs(output) == ["page_0", "page_1", "page_0"]
+
+
+def test_page_cache_is_used_by_worker_pages(multi_page_pdf, tmp_path, fake_paddle):
+    """The process-pool page entry point reads and fills the page cache."""
+    from scripts.result_cache import ResultCache
+    import pickle
+    page_cache = pickle.loads(pickle.dumps(
+        ResultCache(tmp_path / "pages", max_bytes=10 * 1024 * 1024, ttl_seconds=60)
+    ))
+    temp_dir = tmp_path / "work"
+    temp_dir.mkdir()
+    calls = []
+
+    with patch.object(pdf_utils, "get_paddle_engine", return_value=_counting_engine(calls)):
+        first = pdf_utils._recover_page_in_worker(str(multi_page_pdf), 0, str(temp_dir), page_cache)
+        second = pdf_utils._recover_page_in_worker(str(multi_page_pdf), 0, str(temp_dir), page_cache)
+
+    assert len(calls) == 1
+    assert first == second
+    assert _paragraphs(second) == ["page_0"]
+
+
+def test_pipelined_conversion_stops_between_pages_when_cancelled(multi_page_pdf, tmp_path, fake_paddle):
+    """A cancelled token stops inference before the next page; nothing is merged."""
+    from scripts.cancellation import CancellationToken, OperationCancelled
+
+    token = CancellationToken()
+    calls = []
+
+    def cancelling_engine(img):
+        calls.append(1)
+        token.cancel()
+        return []
+
+    with patch.object(pdf_utils, "get_paddle_engine", return_value=cancelling_engine):
+        with pytest.raises(OperationCancelled):
+            pdf_utils.pdf_to_word_paddle(str(multi_page_pdf), str(tmp_path), processes=1, cancel_token=token)
+
+    assert len(calls) == 1
+    assert not list(tmp_path.glob("*_recovered.docx"))
+
+
+def test_broken_worker_pool_is_replaced(multi_page_pdf, tmp_path, fake_paddle):
+    """A pool broken by a dead worker is dropped so the next conversion gets a fresh one."""
+    from concurrent.futures.process import BrokenProcessPool
+    from unittest.mock import MagicMock
+
+    broken = MagicMock()
+    broken.submit.side_effect = BrokenProcessPool("worker died")
+    with patch.dict(pdf_utils._PADDLE_POOLS, {4: broken}, clear=True), \
+         patch.object(pdf_utils, "ProcessPoolExecutor") as new_pool:
+        with pytest.raises(RuntimeError, match="worker process died"):
+            pdf_utils.pdf_to_word_paddle(str(multi_page_pdf), str(tmp_path), processes=4)
+
+        assert 4 not in pdf_utils._PADDLE_POOLS
+        broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        assert pdf_utils.get_paddle_process_pool(4) is new_pool.return_value
@@ -184,3 +184,326 @@ def test_compress_pdf_encrypted_no_password_raises(locked_pdf, tmp_path):
     """compress_pdf without password for encrypted PDF raises ValueError."""
     with pytest.raises(ValueError, match="password"):
         compress_pdf(str(locked_pdf["path"]), str(tmp_path))
+
+
+def test_compress_pdf_with_password_writes_unencrypted_output(locked_pdf, tmp_path):
+    """Encrypted input is decrypted in memory; the output opens without a password."""
+    result = compress_pdf(str(locked_pdf["path"]), str(tmp_path), level='medium', password=locked_pdf["password"])
+    with pikepdf.open(result["output_path"]) as pdf:
+        assert len(pdf.pages) > 0
+
+
+def test_encrypted_input_leaves_no_decrypted_copy(locked_pdf, tmp_path):
+    """No decrypted temp copy is written next to the input or in the output dir."""
+    password = locked_pdf["password"]
+    compress_pdf(str(locked_pdf["path"]), str(tmp_path), password=password)
+    extract_pdf_pages(str(locked_pdf["path"]), str(tmp_path), "1", password=password)
+    pdf_to_docx(str(locked_pdf["path"]), str(tmp_path), password=password)
+
+    for folder in (tmp_path, locked_pdf["path"].parent):
+        assert not any("decrypted" in p.name for p in folder.iterdir())
+
+
+def test_extract_pdf_pages_encrypted_no_password_raises(locked_pdf, tmp_path):
+    """extract_pdf_pages without password for encrypted PDF raises ValueError."""
+    with pytest.raises(ValueError, match="password"):
+        extract_pdf_pages(str(locked_pdf["path"]), str(tmp_path), "1")
+
+
+@pytest.mark.parametrize("func", [compress_pdf, pdf_to_docx])
+def test_wrong_password_raises_value_error(func, locked_pdf, tmp_path):
+    """A wrong password is reported as ValueError rather than a library error."""
+    with pytest.raises(ValueError, match="Incorrect password"):
+        func(str(locked_pdf["path"]), str(tmp_path), password="wrong_password")
+
+
+def test_extract_pdf_pages_wrong_password_raises(locked_pdf, tmp_path):
+    with pytest.raises(ValueError, match="Incorrect password"):
+        extract_pdf_pages(str(locked_pdf["path"]), str(tmp_path), "1", password="wrong_password")
+
+
+def _image_sizes(pdf_path):
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        return [(info[2], info[3]) for page in doc for info in page.get_images(full=True)]
+
+
+def test_compress_pdf_resamples_large_images(image_pdf, tmp_path):
+    """Every oversized image is downscaled to the level's max dimension."""
+    result = compress_pdf(str(image_pdf), str(tmp_path), level='medium')
+    sizes = _image_sizes(result["output_path"])
+    assert len(sizes) == 6
+    assert all(max(w, h) <= 1200 for w, h in sizes)
+    assert result["compressed_size"] < result["original_size"]
+
+
+def test_compress_pdf_recompresses_on_image_pool(image_pdf, tmp_path):
+    """Resize/encode work runs on the image pool while at most the in-flight limit is held."""
+    import threading
+    from unittest.mock import patch
+    import scripts.pdf_utils as pdf_utils
+
+    threads = []
+    original = pdf_utils._recompress_image
+
+    def recording(*args):
+        threads.append(threading.current_thread().name)
+        return original(*args)
+
+    with patch.object(pdf_utils, "_recompress_image", recording), \
+         patch.object(pdf_utils, "COMPRESS_MAX_IN_FLIGHT", 1):
+        result = compress_pdf(str(image_pdf), str(tmp_path), level='high')
+
+    assert len(threads) == 6
+    assert all(name.startswith("fileforge-image") for name in threads)
+    assert all(max(w, h) <= 800 for w, h in _image_sizes(result["output_path"]))
+
+
+def test_compress_pdf_decodes_jpegs_at_reduced_scale(image_pdf, tmp_path):
+    """Embedded JPEGs are draft-decoded below full size and never rendered to a Pixmap."""
+    from unittest.mock import patch
+    import scripts.pdf_utils as pdf_utils
+
+    decoded_sizes = []
+    original = pdf_utils._recompress_image
+
+    def recording(pil_img, *args):
+        pil_img.load()
+        decoded_sizes.append(pil_img.size)
+        return original(pil_img, *args)
+
+    with patch.object(pdf_utils, "_recompress_image", recording), \
+         patch.object(pdf_utils.fitz, "Pixmap", side_effect=AssertionError("full decode")):
+        result = compress_pdf(str(image_pdf), str(tmp_path), level='high')
+
+    # 2000x1600 sources targeting 800px decode at 1/2 scale
+    assert decoded_sizes == [(1000, 800)] * 6
+    assert all(max(w, h) <= 800 for w, h in _image_sizes(result["output_path"]))
+
+
+def test_compress_pdf_skips_small_images_without_decoding(sample_pdf, tmp_path):
+    """Images already within max_dim are never decoded."""
+    import io
+    import fitz
+    from unittest.mock import patch
+    from PIL import Image
+    import scripts.pdf_utils as pdf_utils
+
+    small_pdf = tmp_path / "small.pdf"
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 200), "red").save(buf, format="PNG")
+    with fitz.open() as doc:
+        doc.new_page().insert_image(fitz.Rect(0, 0, 300, 200), stream=buf.getvalue())
+        doc.save(str(small_pdf))
+
+    with patch.object(pdf_utils, "_decode_pdf_image", wraps=pdf_utils._decode_pdf_image) as decode, \
+         patch.object(pdf_utils.fitz, "Pixmap", side_effect=AssertionError("decoded")):
+        compress_pdf(str(small_pdf), str(tmp_path), level='medium')
+    assert decode.call_count == 1
+
+
+def _pdf_with_image(path, pil_img, **save_kwargs):
+    import io
+    import fitz
+    buf = io.BytesIO()
+    pil_img.save(buf, **save_kwargs)
+    with fitz.open() as doc:
+        doc.new_page().insert_image(fitz.Rect(0, 0, 500, 500), stream=buf.getvalue())
+        doc.save(str(path))
+    return path
+
+
+def test_compress_pdf_reports_per_image_savings(image_pdf, tmp_path):
+    """The result lists every re-encoded image with its before/after size."""
+    result = compress_pdf(str(image_pdf), str(tmp_path), level='medium')
+    images = result["images"]
+    assert len(images) == 6
+    assert [img["page"] for img in images] == [1, 1, 2, 2, 3, 3]
+    assert all(img["replaced"] and img["format"] == "jpeg" for img in images)
+    assert all(img["new_size"] < img["original_size"] for img in images)
+
+
+def test_compress_pdf_keeps_original_when_reencode_is_larger(tmp_path):
+    """A heavily compressed source is left untouched rather than grown."""
+    import numpy as np
+    from PIL import Image
+
+    noise = np.random.default_rng(1).integers(0, 255, (1400, 1400, 3), dtype=np.uint8)
+    src = _pdf_with_image(tmp_path / "tiny.pdf", Image.fromarray(noise), format="JPEG", quality=5)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    result = compress_pdf(str(src), str(out_dir), level='medium')
+    assert [img["replaced"] for img in result["images"]] == [False]
+    assert _image_sizes(result["output_path"]) == [(1400, 1400)]
+
+
+def test_compress_pdf_reencodes_flat_graphics_losslessly(tmp_path):
+    """Images with few colours are re-encoded as PNG instead of JPEG."""
+    from PIL import Image, ImageDraw
+
+    chart = Image.new("RGB", (2400, 1600), "white")
+    draw = ImageDraw.Draw(chart)
+    for i, color in enumerate(["red", "green", "blue"]):
+        draw.rectangle([200 + i * 700, 400, 700 + i * 700, 1500], fill=color)
+    src = _pdf_with_image(tmp_path / "chart.pdf", chart, format="PNG")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    result = compress_pdf(str(src), str(out_dir), level='medium')
+    assert [img["format"] for img in result["images"]] == ["png"]
+
+
+def test_compress_pdf_leaves_bilevel_scans_alone(tmp_path):
+    """1-bit images are never decoded or re-encoded."""
+    from PIL import Image
+
+    scan = Image.new("1", (2500, 3500), 1)
+    src = _pdf_with_image(tmp_path / "scan.pdf", scan, format="PNG")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    result = compress_pdf(str(src), str(out_dir), level='high')
+    assert result["images"] == []
+
+
+def test_compress_pdf_target_size_lands_under_budget(image_pdf, tmp_path):
+    """Target-size mode picks image settings that keep the file under the target."""
+    target_kb = image_pdf.stat().st_size // 1024 // 4
+    result = compress_pdf(str(image_pdf), str(tmp_path), target_size_kb=target_kb)
+    assert result["target_met"] is True
+    assert result["compressed_size"] <= target_kb * 1024
+    assert all(img["replaced"] for img in result["images"])
+
+
+def test_compress_pdf_target_size_saves_once_when_estimate_holds(image_pdf, tmp_path):
+    """The search runs in memory; the document is written a single time."""
+    from unittest.mock import patch
+    import fitz
+
+    saves = []
+    original_save = fitz.Document.save
+
+    def counting_save(self, *args, **kwargs):
+        saves.append(args[0])
+        return original_save(self, *args, **kwargs)
+
+    with patch.object(fitz.Document, "save", counting_save):
+        compress_pdf(str(image_pdf), str(tmp_path), target_size_kb=image_pdf.stat().st_size // 1024 // 4)
+    assert len(saves) == 1
+
+
+def test_compress_pdf_target_size_already_met_keeps_images(image_pdf, tmp_path):
+    """A file already under the target has no images re-encoded."""
+    result = compress_pdf(str(image_pdf), str(tmp_path), target_size_kb=image_pdf.stat().st_size // 1024 + 100)
+    assert result["target_met"] is True
+    assert result["images"] == []
+
+
+def test_compress_pdf_unreachable_target_is_best_effort(image_pdf, tmp_path):
+    """An impossible target still returns the smallest output and flags it."""
+    result = compress_pdf(str(image_pdf), str(tmp_path), target_size_kb=1)
+    assert result["target_met"] is False
+    assert Path(result["output_path"]).exists()
+    assert all(max(w, h) <= 320 for w, h in _image_sizes(result["output_path"]))
+
+
+def test_compress_pdf_invalid_target_size_raises(sample_pdf, tmp_path):
+    with pytest.raises(ValueError, match="Target size"):
+        compress_pdf(str(sample_pdf), str(tmp_path), target_size_kb=0)
+
+
+# ---------------------------------------------------------------------------
+# Parallel pdf_to_docx tests
+# ---------------------------------------------------------------------------
+
+def test_page_chunks_cover_all_pages_in_order():
+    """Chunks are contiguous, ordered and cover every page exactly once."""
+    from scripts.pdf_utils import _page_chunks
+    chunks = _page_chunks(305, 4)
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == 305
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert len(chunks) == 8
+
+
+def test_pdf_to_docx_small_document_uses_single_pass(multi_page_pdf, tmp_path):
+    """Documents below the page threshold never start worker processes."""
+    from unittest.mock import patch
+    import scripts.pdf_utils as pdf_utils
+    with patch.object(pdf_utils, "_pdf_to_docx_parallel") as parallel:
+        output = pdf_to_docx(str(multi_page_pdf), str(tmp_path), processes=4)
+    parallel.assert_not_called()
+    assert Path(output).exists()
+
+
+def test_pdf_to_docx_parallel_chunks_keep_page_order(multi_page_pdf, tmp_path):
+    """Chunked parallel conversion produces the same text, in order, as a single pass."""
+    from unittest.mock import patch
+    from docx import Document
+    import scripts.pdf_utils as pdf_utils
+
+    single_dir = tmp_path / "single"
+    single_dir.mkdir()
+    single = pdf_to_docx(str(multi_page_pdf), str(single_dir), processes=1)
+
+    import scripts.executors as executors
+    second_dir = tmp_path / "second"
+    second_dir.mkdir()
+    with patch.object(pdf_utils, "DOCX_PARALLEL_MIN_PAGES", 2), \
+         patch.object(pdf_utils, "DOCX_MIN_CHUNK_PAGES", 1), \
+         patch.object(executors, "DOCX_PARALLEL_PROCESSES", 2):
+        try:
+            parallel = pdf_to_docx(str(multi_page_pdf), str(tmp_path), processes=2)
+            pool = executors._docx_chunk_pool
+            again = pdf_to_docx(str(multi_page_pdf), str(second_dir), processes=2)
+            # Conversions share one pool instead of spawning their own
+            assert pool is not None and executors._docx_chunk_pool is pool
+        finally:
+            executors.shutdown_docx_process_pool()
+
+    def texts(path):
+        return [p.text for p in Document(path).paragraphs if p.text]
+
+    assert texts(parallel) == texts(again) == texts(single) == ["Page 1", "Page 2", "Page 3", "Page 4"]
+    assert not any(p.name.endswith("_chunks") for p in tmp_path.iterdir())
+
+
+def test_pdf_to_docx_inside_docx_worker_uses_single_pass(multi_page_pdf, tmp_path):
+    """A conversion already running in a pdf2docx worker process never starts nested workers."""
+    from unittest.mock import patch
+    import scripts.executors as executors
+    import scripts.pdf_utils as pdf_utils
+
+    with patch.object(pdf_utils, "DOCX_PARALLEL_MIN_PAGES", 2), \
+         patch.object(executors, "DOCX_PARALLEL_PROCESSES", 2), \
+         patch.object(executors, "_in_docx_worker", True), \
+         patch.object(pdf_utils, "_pdf_to_docx_parallel") as parallel:
+        output = pdf_to_docx(str(multi_page_pdf), str(tmp_path), processes=2)
+
+    parallel.assert_not_called()
+    assert executors._docx_chunk_pool is None
+    assert Path(output).exists()
+
+
+def test_compress_pdf_stops_between_images_when_cancelled(image_pdf, tmp_path):
+    """Cancelling mid-run stops before the next image and writes no output."""
+    from unittest.mock import patch
+    import scripts.pdf_utils as pdf_utils
+    from scripts.cancellation import CancellationToken, OperationCancelled
+
+    token = CancellationToken()
+    decoded = []
+    original = pdf_utils._decode_pdf_image
+
+    def cancelling_decode(*args, **kwargs):
+        decoded.append(1)
+        token.cancel()
+        return original(*args, **kwargs)
+
+    with patch.object(pdf_utils, "_decode_pdf_image", cancelling_decode):
+        with pytest.raises(OperationCancelled):
+            compress_pdf(str(image_pdf), str(tmp_path), level='medium', cancel_token=token)
+
+    assert len(decoded) == 1
+    assert not list(tmp_path.glob("*_compressed.pdf"))
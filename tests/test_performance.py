@@ -129,6 +129,49 @@ def test_import_time_reduction():
     assert elapsed < 5.0, f"Import took {elapsed:.2f}s (expected < 5.0s)"
 
 
+def test_light_request_not_blocked_by_heavy_work(tmp_path, sample_image_file, mock_auth):
+    """GET / stays fast while a slow, blocking image conversion is in flight."""
+    import asyncio
+    import httpx
+    from unittest.mock import patch
+    import main
+    from scripts.result_cache import ResultCache
+
+    def slow_heic_to_jpeg(input_path, output_dir, quality=95, fast=False):
+        time.sleep(1.0)  # Stands in for a CPU-bound conversion holding its thread
+        output = Path(output_dir) / f"{Path(input_path).stem}.jpg"
+        output.write_bytes(b"jpeg")
+        return str(output)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"X-API-Key": mock_auth}) as client:
+            with open(sample_image_file, "rb") as f:
+                heavy = asyncio.create_task(client.post(
+                    "/api/image/heic-to-jpeg", files={"file": ("photo.heic", f.read(), "image/heic")}
+                ))
+            await asyncio.sleep(0.2)
+
+            start = time.perf_counter()
+            light = await client.get("/")
+            light_elapsed = time.perf_counter() - start
+            return light, light_elapsed, await heavy
+
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "outputs").mkdir()
+    with patch.object(main, "heic_to_jpeg", slow_heic_to_jpeg), \
+         patch.object(main, "UPLOAD_DIR", tmp_path / "uploads"), \
+         patch.object(main, "OUTPUT_DIR", tmp_path / "outputs"), \
+         patch.object(main, "result_cache", ResultCache(tmp_path / "cache", max_bytes=0, ttl_seconds=0)):
+        light, light_elapsed, heavy = asyncio.run(scenario())
+
+    assert light.status_code == 200
+    assert heavy.status_code == 200
+    print(f"PASS Light request took {light_elapsed:.3f}s during heavy conversion")
+    assert light_elapsed < 0.5, f"Light request took {light_elapsed:.2f}s (expected < 0.5s)"
+
+
 @pytest.fixture
 def benchmark_image(tmp_path):
     """Create a test image for benchmarking."""
@@ -0,0 +1,169 @@
+"""
+Tests for the content-addressed result cache in scripts/result_cache.py.
+"""
+import os
+import time
+from pathlib import Path
+import pytest
+from scripts.result_cache import ResultCache
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    output_dir = tmp_path / "outputs"
+    output_dir.mkdir()
+    return tmp_path / "cache", output_dir
+
+
+def _compute_into(output_dir, name, data=b"result"):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        path = output_dir / name
+        path.write_bytes(data)
+        return str(path)
+
+    return compute, calls
+
+
+def test_make_key_ignores_param_order_and_none():
+    a = ResultCache.make_key("abc", "resize_image", {"mode": "percentage", "percentage": 50, "width": None})
+    b = ResultCache.make_key("abc", "resize_image", {"percentage": 50, "mode": "percentage"})
+    assert a == b
+    assert a != ResultCache.make_key("abc", "resize_image", {"mode": "percentage", "percentage": 60})
+    assert a != ResultCache.make_key("abc", "crop_image", {"mode": "percentage", "percentage": 50})
+    assert a != ResultCache.make_key("def", "resize_image", {"mode": "percentage", "percentage": 50})
+
+
+def test_hit_is_renamed_for_new_input_stem(dirs):
+    """A hit is materialized under the name the operation would give the new input."""
+    cache_dir, output_dir = dirs
+    cache = ResultCache(cache_dir, max_bytes=1024 * 1024, ttl_seconds=60)
+    key = cache.make_key("abc", "compress_pdf")
+
+    compute, calls = _compute_into(output_dir, "first_report_compressed.pdf")
+    cache.get_or_compute(key, output_dir, "first_report", compute)
+    output_path, extra = cache.get_or_compute(key, output_dir, "second_report", compute)
+
+    assert len(calls) == 1
+    assert Path(output_path).name == "second_report_compressed.pdf"
+    assert Path(output_path).read_bytes() == b"result"
+    assert extra == {}
+
+
+def test_dict_results_keep_extra_fields(dirs):
+    cache_dir, output_dir = dirs
+    cache = ResultCache(cache_dir, max_bytes=1024 * 1024, ttl_seconds=60)
+    key = cache.make_key("abc", "compress_pdf")
+    (output_dir / "a_compressed.pdf").write_bytes(b"pdf")
+
+    cache.get_or_compute(key, output_dir, "a",
+                         lambda: {"output_path": str(output_dir / "a_compressed.pdf"), "reduction_pct": 12.5})
+    _, extra = cache.lookup(key, output_dir, "b")
+    assert extra == {"reduction_pct": 12.5}
+
+
+def test_expired_entries_are_missed(dirs):
+    cache_dir, output_dir = dirs
+    cache = ResultCache(cache_dir, max_bytes=1024 * 1024, ttl_seconds=0)
+    key = cache.make_key("abc", "heic_to_jpeg")
+    compute, calls = _compute_into(output_dir, "photo.jpg")
+
+    cache.get_or_compute(key, output_dir, "photo", compute)
+    time.sleep(0.01)
+    assert cache.lookup(key, output_dir, "photo") is None
+    assert not (cache_dir / key).exists()
+
+
+def test_lru_eviction_keeps_recently_used_entries(dirs):
+    cache_dir, output_dir = dirs
+    cache = ResultCache(cache_dir, max_bytes=2500, ttl_seconds=60)
+    keys = [cache.make_key(str(i), "resize_image") for i in range(3)]
+
+    for i, key in enumerate(keys[:2]):
+        compute, _ = _compute_into(output_dir, f"img{i}_resized.jpg", b"x" * 1000)
+        cache.get_or_compute(key, output_dir, f"img{i}", compute)
+
+    # Make entry 0 the oldest, then touch it so entry 1 becomes least recently used
+    for key in keys[:2]:
+        os.utime(cache_dir / key / ResultCache.META_NAME, (time.time() - 100, time.time() - 100))
+    assert cache.lookup(keys[0], output_dir, "img0") is not None
+
+    compute, _ = _compute_into(output_dir, "img2_resized.jpg", b"x" * 1000)
+    cache.get_or_compute(keys[2], output_dir, "img2", compute)
+
+    assert (cache_dir / keys[0]).exists()
+    assert not (cache_dir / keys[1]).exists()
+    assert (cache_dir / keys[2]).exists()
+
+
+def test_disabled_cache_always_computes(dirs):
+    cache_dir, output_dir = dirs
+    cache = ResultCache(cache_dir, max_bytes=0, ttl_seconds=60)
+    key = cache.make_key("abc", "crop_image")
+    compute, calls = _compute_into(output_dir, "a_cropped.jpg")
+
+    cache.get_or_compute(key, output_dir, "a", compute)
+    cache.get_or_compute(key, output_dir, "a", compute)
+    assert len(calls) == 2
+    assert not cache_dir.exists()
+
+
+def test_failed_compute_is_not_cached(dirs):
+    cache_dir, output_dir = dirs
+    cache = ResultCache(cache_dir, max_bytes=1024 * 1024, ttl_seconds=60)
+    key = cache.make_key("abc", "remove_password", {"password": "x"})
+
+    def compute():
+        raise ValueError("bad password")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute(key, output_dir, "a", compute)
+    assert cache.lookup(key, output_dir, "a") is None
+
+
+def test_none_key_computes_without_storing(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024, ttl_seconds=60)
+    output = tmp_path / "out.pdf"
+    output.write_bytes(b"decrypted")
+
+    assert cache.get_or_compute(None, tmp_path, "in", lambda: str(output)) == (str(output), {})
+    assert cache.lookup(None, tmp_path, "in") is None
+    assert not (tmp_path / "cache").exists() or list((tmp_path / "cache").iterdir()) == []
+
+
+def test_repeated_store_keeps_the_first_entry(dirs):
+    """A second store under a live key is skipped instead of replacing the entry mid-read."""
+    cache_dir, output_dir = dirs
+    cache = ResultCache(cache_dir, max_bytes=1024 * 1024, ttl_seconds=60)
+    key = cache.make_key("abc", "paddle_page")
+    (output_dir / "page_0.docx").write_bytes(b"first")
+    (output_dir / "page_2.docx").write_bytes(b"second")
+
+    cache.store(key, str(output_dir / "page_0.docx"), "page_0")
+    cache.store(key, str(output_dir / "page_2.docx"), "page_2")
+
+    output_path, _ = cache.lookup(key, output_dir, "page_5")
+    assert Path(output_path).read_bytes() == b"first"
+
+
+def test_concurrent_stores_of_one_key_leave_one_entry(dirs):
+    """Racing writers of the same key all return cleanly and leave one complete entry."""
+    from concurrent.futures import ThreadPoolExecutor
+    cache_dir, output_dir = dirs
+    key = ResultCache.make_key("abc", "paddle_page")
+    for i in range(8):
+        (output_dir / f"page_{i}.docx").write_bytes(b"page")
+
+    def store(i):
+        # Separate instances, as in separate worker processes
+        ResultCache(cache_dir, max_bytes=1024 * 1024, ttl_seconds=60).store(
+            key, str(output_dir / f"page_{i}.docx"), f"page_{i}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(store, range(8)))
+
+    assert sorted(p.name for p in cache_dir.iterdir()) == [key]
+    cache = ResultCache(cache_dir, max_bytes=1024 * 1024, ttl_seconds=60)
+    assert Path(cache.lookup(key, output_dir, "page_9")[0]).read_bytes() == b"page"
@@ -12,7 +12,10 @@ def mock_dirs(tmp_path):
     output_dir = tmp_path / "outputs"
     upload_dir.mkdir()
     output_dir.mkdir()
-    with patch("main.UPLOAD_DIR", upload_dir), patch("main.OUTPUT_DIR", output_dir):
+    from scripts.result_cache import ResultCache
+    cache = ResultCache(tmp_path / "cache", max_bytes=0, ttl_seconds=0)
+    with patch.object(main, "UPLOAD_DIR", upload_dir), patch.object(main, "OUTPUT_DIR", output_dir), \
+         patch.object(main, "result_cache", cache):
         yield upload_dir, output_dir
 
 import main
@@ -20,8 +23,8 @@ import main
 def test_upload_filename_is_unique(mock_dirs, auth_client):
     upload_dir, _ = mock_dirs
 
-    # We mock shutil.copyfileobj to intercept the file write
-    with patch("main.shutil.copyfileobj") as mock_copy:
+    # We mock save_upload_file to intercept the file write
+    with patch.object(main, "save_upload_file", return_value="0" * 64) as mock_save:
         # Mock the processing function to avoid actual PDF processing
         with patch.object(main, "remove_pdf_password") as mock_remove:
             mock_remove.return_value = "output.pdf"
@@ -33,11 +36,10 @@ def test_upload_filename_is_unique(mock_dirs, auth_client):
 
             assert response.status_code == 200
 
-            # Check copyfileobj calls
-            assert mock_copy.called
-            args, _ = mock_copy.call_args
-            dest_buffer = args[1]
-            dest_path = dest_buffer.name
+            # Check save_upload_file calls
+            assert mock_save.called
+            args, _ = mock_save.call_args
+            dest_path = args[1]
 
             print(f"Destination path: {dest_path}")
 
@@ -0,0 +1,72 @@
+"""
+Tests for the async upload spooling helpers in scripts/utils.py.
+"""
+import asyncio
+import hashlib
+import io
+from unittest.mock import patch
+import pytest
+from fastapi import HTTPException, UploadFile
+import main
+from scripts.utils import save_upload_file, upload_temp_path
+
+
+def _upload(data: bytes, size=None) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="photo.jpg", size=size)
+
+
+def test_save_upload_file_streams_and_hashes(tmp_path):
+    """Content is written in chunks and the SHA-256 matches the data."""
+    data = b"abc" * 10000
+    dest = tmp_path / "upload.bin"
+
+    digest = asyncio.run(save_upload_file(_upload(data), dest, chunk_size=4096))
+
+    assert dest.read_bytes() == data
+    assert digest == hashlib.sha256(data).hexdigest()
+
+
+def test_save_upload_file_rejects_declared_oversize_early(tmp_path):
+    """A declared size over the limit is rejected before anything is written."""
+    dest = tmp_path / "upload.bin"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(save_upload_file(_upload(b"x" * 10, size=10_000), dest, max_bytes=1000))
+    assert exc.value.status_code == 413
+    assert not dest.exists()
+
+
+def test_save_upload_file_rejects_streamed_oversize_and_removes_partial(tmp_path):
+    """An undeclared oversize upload is cut off mid-stream and the partial file removed."""
+    dest = tmp_path / "upload.bin"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(save_upload_file(_upload(b"x" * 5000), dest, chunk_size=1024, max_bytes=2048))
+    assert exc.value.status_code == 413
+    assert not dest.exists()
+
+
+def test_save_upload_file_zero_limit_disables_check(tmp_path):
+    dest = tmp_path / "upload.bin"
+    asyncio.run(save_upload_file(_upload(b"x" * 5000, size=5000), dest, max_bytes=0))
+    assert dest.stat().st_size == 5000
+
+
+def test_upload_temp_path_is_sanitized_and_unique(tmp_path):
+    a = upload_temp_path(tmp_path, "../../evil\nname.pdf")
+    b = upload_temp_path(tmp_path, "../../evil\nname.pdf")
+    assert a.parent == tmp_path
+    assert a.name.endswith("_evilname.pdf")
+    assert a != b
+
+
+def test_endpoint_returns_413_for_oversize_upload(sample_image_file, tmp_path, auth_client):
+    """Endpoints surface the upload limit as 413 rather than a generic 400."""
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    with patch.object(main, "UPLOAD_DIR", upload_dir), patch("scripts.utils.MAX_UPLOAD_BYTES", 10):
+        with open(sample_image_file, "rb") as f:
+            files = {"file": (sample_image_file.name, f, "image/jpeg")}
+            response = auth_client.post("/api/image/crop", files=files,
+                                        data={"x": 0, "y": 0, "width": 10, "height": 10})
+
+    assert response.status_code == 413
+    assert list(upload_dir.iterdir()) == []
@@ -0,0 +1,409 @@
+"""
+Tests for the workflow step registry and engine.
+"""
+import asyncio
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from scripts.workflow import (
+    STEP_REGISTRY, WorkflowContext, WorkflowStep, fuse_steps, get_step, plan_workflow, run_workflow,
+    validate_params, workflow_events,
+)
+
+
+def _collect(step_list, input_path, ctx):
+    async def collect():
+        return [event async for event in run_workflow(step_list, input_path, ctx)]
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def jpeg(tmp_path):
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (400, 300), "green").save(path)
+    return path
+
+
+def test_registry_has_every_workflow_step():
+    assert set(STEP_REGISTRY) == {
+        "remove_password", "pdf_to_word", "compress_pdf", "heic_to_jpeg", "resize_image", "crop_image",
+    }
+
+
+def test_validate_params_fills_defaults_and_coerces():
+    step = get_step("resize_image")
+    params = validate_params(step, {"mode": "dimensions", "width": "120", "height": 80.0})
+    assert params == {"mode": "dimensions", "width": 120, "height": 80, "percentage": 50, "target_size_kb": None}
+
+    assert validate_params(get_step("pdf_to_word"), {"use_ai": "true"})["use_ai"] is True
+
+
+def test_validate_params_rejects_missing_and_bad_values():
+    with pytest.raises(ValueError, match="requires 'password'"):
+        validate_params(get_step("remove_password"), {"password": ""})
+    with pytest.raises(ValueError, match="'x' must be int"):
+        validate_params(get_step("crop_image"), {"x": "left"})
+    with pytest.raises(ValueError, match="Unknown step type"):
+        get_step("rotate")
+
+
+def test_run_workflow_runs_steps_back_to_back(jpeg, tmp_path):
+    """Steps run without padding and emit start/complete events in order."""
+    steps = [
+        {"type": "resize_image", "label": "Shrink", "config": {"mode": "percentage", "percentage": 50}},
+        {"type": "crop_image", "config": {"x": 0, "y": 0, "width": 100, "height": 100}},
+    ]
+    start = time.perf_counter()
+    events = _collect(steps, jpeg, WorkflowContext(tmp_path))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.0
+    # The two geometry steps are fused, so both start before either completes
+    assert [(e["event"], e.get("step")) for e in events] == [
+        ("step_start", 0), ("step_start", 1), ("step_complete", 0), ("step_complete", 1), ("complete", None),
+    ]
+    assert events[0]["label"] == "Shrink"
+    assert events[1]["label"] == "crop_image"
+    with Image.open(tmp_path / events[-1]["filename"]) as img:
+        assert img.size == (100, 100)
+
+
+def test_run_workflow_validates_every_step_before_running(jpeg, tmp_path):
+    """An invalid later step fails the workflow before the first step does any work."""
+    steps = [
+        {"type": "resize_image", "config": {"percentage": 50}},
+        {"type": "remove_password", "config": {}},
+    ]
+    events = _collect(steps, jpeg, WorkflowContext(tmp_path))
+
+    assert [e["event"] for e in events] == ["error"]
+    assert "password" in events[0]["detail"]
+    assert not list(tmp_path.glob("*_resized.jpg"))
+
+
+def test_run_workflow_relays_step_progress(jpeg, tmp_path):
+    """Progress reported from the worker thread is streamed as step_progress events."""
+    def reporting_step(input_path, ctx, pages):
+        for page in range(1, pages + 1):
+            ctx.progress_callback(page, pages)
+            time.sleep(0.02)
+        return input_path
+
+    fake = WorkflowStep("reporting", reporting_step, {"pages": (int, 3)}, pool="image")
+    with patch.dict(STEP_REGISTRY, {"reporting": fake}):
+        events = _collect([{"type": "reporting"}], jpeg, WorkflowContext(tmp_path))
+
+    progress = [(e["current"], e["step_total"]) for e in events if e["event"] == "step_progress"]
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert events[-1] == {"event": "complete", "message": "Workflow completed (1 steps)", "filename": jpeg.name}
+
+
+def test_run_workflow_reports_failing_step(jpeg, tmp_path):
+    def failing_step(input_path, ctx):
+        raise RuntimeError("boom")
+
+    fake = WorkflowStep("failing", failing_step, {}, pool="image")
+    with patch.dict(STEP_REGISTRY, {"failing": fake}):
+        events = _collect([{"type": "failing"}], jpeg, WorkflowContext(tmp_path))
+
+    assert events[-1] == {"event": "error", "detail": "boom", "step": 0}
+
+
+def test_image_steps_hand_off_in_memory(jpeg, tmp_path):
+    """resize -> crop decodes once and encodes once; no intermediate JPEG is written."""
+    original_save = Image.Image.save
+    saves = []
+
+    def recording_save(self, fp, format=None, **params):
+        saves.append((fp, params))
+        return original_save(self, fp, format, **params)
+
+    steps = [
+        {"type": "resize_image", "config": {"mode": "percentage", "percentage": 50}},
+        {"type": "crop_image", "config": {"x": 10, "y": 10, "width": 100, "height": 80}},
+    ]
+    with patch.object(Image.Image, "save", recording_save):
+        events = _collect(steps, jpeg, WorkflowContext(tmp_path))
+
+    assert events[-1]["filename"] == "photo_resized_cropped.jpg"
+    assert len(saves) == 1
+    assert [p.name for p in tmp_path.iterdir() if p != jpeg] == ["photo_resized_cropped.jpg"]
+    with Image.open(tmp_path / events[-1]["filename"]) as img:
+        assert img.size == (100, 80)
+
+
+def test_heic_step_quality_carries_through_geometry_steps(jpeg, tmp_path):
+    """The JPEG settings chosen by heic_to_jpeg apply to the final encode after a resize."""
+    original_save = Image.Image.save
+    saves = []
+
+    def recording_save(self, fp, format=None, **params):
+        saves.append(params)
+        return original_save(self, fp, format, **params)
+
+    steps = [
+        {"type": "heic_to_jpeg", "config": {"quality": 70, "fast": True}},
+        {"type": "resize_image", "config": {"mode": "dimensions", "width": 200}},
+    ]
+    with patch.object(Image.Image, "save", recording_save):
+        events = _collect(steps, jpeg, WorkflowContext(tmp_path))
+
+    assert events[-1]["filename"] == "photo_resized.jpg"
+    assert saves == [{"quality": 70, "optimize": False}]
+
+
+def test_exif_rotated_image_is_rotated_once_across_steps(tmp_path):
+    """An in-memory image is upright after the first step and not rotated again by the next."""
+    path = tmp_path / "rotated.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotate 90 CW for display: displayed size is 300x400
+    Image.new("RGB", (400, 300), "blue").save(path, exif=exif.tobytes())
+
+    steps = [
+        {"type": "resize_image", "config": {"mode": "percentage", "percentage": 50}},
+        {"type": "crop_image", "config": {"x": 0, "y": 0, "width": 150, "height": 150}},
+        {"type": "resize_image", "config": {"mode": "dimensions", "width": 75}},
+    ]
+    events = _collect(steps, path, WorkflowContext(tmp_path))
+
+    with Image.open(tmp_path / events[-1]["filename"]) as img:
+        assert img.size == (75, 75)
+    steps[1]["config"]["height"] = 200
+    events = _collect(steps, path, WorkflowContext(tmp_path))
+    with Image.open(tmp_path / events[-1]["filename"]) as img:
+        assert img.size == (75, 100)
+
+
+def test_unlock_hands_off_to_compress_without_writing(locked_pdf, tmp_path):
+    """remove_password -> compress_pdf decrypts in memory; no unlocked copy is written."""
+    import pikepdf
+
+    steps = [
+        {"type": "remove_password", "config": {"password": locked_pdf["password"]}},
+        {"type": "compress_pdf", "config": {"level": "low"}},
+    ]
+    events = _collect(steps, locked_pdf["path"], WorkflowContext(tmp_path))
+
+    assert events[-1]["event"] == "complete"
+    assert not list(tmp_path.glob("*_unlocked.pdf"))
+    with pikepdf.open(tmp_path / events[-1]["filename"]) as pdf:
+        assert not pdf.is_encrypted
+
+
+def test_unlock_as_last_step_writes_unlocked_pdf(locked_pdf, tmp_path):
+    import pikepdf
+
+    events = _collect([{"type": "remove_password", "config": {"password": locked_pdf["password"]}}],
+                      locked_pdf["path"], WorkflowContext(tmp_path))
+
+    assert events[-1]["filename"].endswith("_unlocked.pdf")
+    with pikepdf.open(tmp_path / events[-1]["filename"]) as pdf:
+        assert not pdf.is_encrypted
+
+
+def test_unlock_with_wrong_password_fails_at_its_step(locked_pdf, tmp_path):
+    steps = [
+        {"type": "remove_password", "config": {"password": "wrong"}},
+        {"type": "compress_pdf", "config": {"level": "low"}},
+    ]
+    events = _collect(steps, locked_pdf["path"], WorkflowContext(tmp_path))
+
+    assert events[-1] == {"event": "error", "detail": "Incorrect password for the PDF.", "step": 0}
+
+
+def test_fuse_steps_groups_adjacent_geometry_steps():
+    """Runs of crop/resize fuse; other steps and target_size resizes break the run."""
+    plan = plan_workflow([
+        {"type": "resize_image", "config": {"percentage": 50}},
+        {"type": "crop_image", "config": {"width": 10, "height": 10}},
+        {"type": "heic_to_jpeg"},
+        {"type": "crop_image"},
+        {"type": "resize_image", "config": {"mode": "target_size", "target_size_kb": 50}},
+        {"type": "crop_image"},
+    ])
+    stages = fuse_steps(plan)
+
+    assert [(stage.step.name, stage.indices) for stage in stages] == [
+        ("image_geometry", [0, 1]), ("heic_to_jpeg", [2]), ("crop_image", [3]),
+        ("resize_image", [4]), ("crop_image", [5]),
+    ]
+    assert stages[0].params == {
+        "operations": [
+            ("resize", {"mode": "percentage", "width": None, "height": None, "percentage": 50}),
+            ("crop", {"x": 0, "y": 0, "width": 10, "height": 10}),
+        ],
+        "suffix": "_resized_cropped",
+    }
+
+
+def test_fused_resize_then_crop_resamples_only_the_kept_region(tmp_path):
+    """resize -> crop crops first, so the resample reads the crop region, not the whole image."""
+    import numpy as np
+
+    path = tmp_path / "large.jpg"
+    rng = np.random.default_rng(0)
+    pixels = (np.linspace(0, 255, 2000)[None, :, None] + rng.normal(0, 10, (1500, 2000, 3))).clip(0, 255)
+    Image.fromarray(pixels.astype("uint8")).save(path, quality=90)
+    steps = [
+        {"type": "resize_image", "config": {"mode": "percentage", "percentage": 80}},
+        {"type": "crop_image", "config": {"x": 100, "y": 100, "width": 400, "height": 300}},
+    ]
+
+    original_resize = Image.Image.resize
+    resampled = []
+
+    def recording_resize(self, size, *args, **kwargs):
+        resampled.append(self.size)
+        return original_resize(self, size, *args, **kwargs)
+
+    with patch.object(Image.Image, "resize", recording_resize):
+        events = _collect(steps, path, WorkflowContext(tmp_path))
+
+    assert len(resampled) == 1
+    width, height = resampled[0]
+    assert width * height < 2000 * 1500 / 4
+
+    # Same name and size as the unfused chain, and visually the same pixels
+    from scripts.image_utils import cropped, resized
+    with Image.open(path) as img:
+        expected = cropped(resized(img, "percentage", percentage=80), 100, 100, 400, 300)
+    with Image.open(tmp_path / events[-1]["filename"]) as img:
+        assert events[-1]["filename"] == "large_resized_cropped.jpg"
+        assert img.size == expected.size == (400, 300)
+        diff = np.abs(np.asarray(img, dtype=float) - np.asarray(expected, dtype=float)).mean()
+    assert diff < 3
+
+
+def test_intermediate_files_are_deleted_once_consumed(jpeg, tmp_path):
+    """A target_size resize writes a file; the crop after it consumes it and only the result is kept."""
+    steps = [
+        {"type": "resize_image", "config": {"mode": "target_size", "target_size_kb": 50}},
+        {"type": "crop_image", "config": {"width": 50, "height": 50}},
+    ]
+    ctx = WorkflowContext(tmp_path)
+    events = _collect(steps, jpeg, ctx)
+
+    assert events[-1]["filename"] == "photo_resized_cropped.jpg"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["photo.jpg", "photo_resized_cropped.jpg"]
+    assert ctx.bytes_freed > 0
+    assert ctx.bytes_written == ctx.bytes_freed + (tmp_path / "photo_resized_cropped.jpg").stat().st_size
+
+
+def test_failed_workflow_leaves_no_artifacts(jpeg, tmp_path):
+    def failing_step(input_path, ctx):
+        raise RuntimeError("boom")
+
+    steps = [
+        {"type": "resize_image", "config": {"mode": "target_size", "target_size_kb": 50}},
+        {"type": "failing"},
+    ]
+    fake = WorkflowStep("failing", failing_step, {}, pool="image")
+    with patch.dict(STEP_REGISTRY, {"failing": fake}):
+        events = _collect(steps, jpeg, WorkflowContext(tmp_path))
+
+    assert events[-1]["event"] == "error"
+    assert [p.name for p in tmp_path.iterdir()] == ["photo.jpg"]
+
+
+def test_abandoned_workflow_removes_its_files(jpeg, tmp_path):
+    """Closing the stream early (client disconnect) deletes everything the run wrote."""
+    steps = [
+        {"type": "resize_image", "config": {"mode": "target_size", "target_size_kb": 50}},
+        {"type": "heic_to_jpeg"},
+    ]
+
+    async def abandon():
+        events = run_workflow(steps, jpeg, WorkflowContext(tmp_path))
+        async for event in events:
+            if event["event"] == "step_complete":
+                assert (tmp_path / "photo_resized.jpg").exists()
+                break
+        await events.aclose()
+
+    asyncio.run(abandon())
+    assert [p.name for p in tmp_path.iterdir()] == ["photo.jpg"]
+
+
+def test_output_finished_after_close_is_deleted(tmp_path):
+    """A step still running when the run was abandoned has its output removed when it lands."""
+    ctx = WorkflowContext(tmp_path)
+    ctx.close()
+    late = tmp_path / "late.jpg"
+    late.write_bytes(b"data")
+
+    ctx.track(late)
+
+    assert not late.exists()
+
+
+def test_cancelled_workflow_starts_no_further_step(jpeg, tmp_path):
+    """The token is checked between steps: a step that sees it cancelled is the last to run."""
+    ran = []
+
+    def cancelling_step(input_path, ctx):
+        ran.append(1)
+        ctx.cancel_token.cancel()
+        return input_path
+
+    fake = WorkflowStep("cancelling", cancelling_step, {}, pool="image")
+    with patch.dict(STEP_REGISTRY, {"cancelling": fake}):
+        events = _collect([{"type": "cancelling"}, {"type": "cancelling"}], jpeg, WorkflowContext(tmp_path))
+
+    assert ran == [1]
+    assert events[-1] == {"event": "error", "detail": "Workflow cancelled", "step": 1}
+
+
+def test_abandoning_the_stream_cancels_the_running_step(jpeg, tmp_path):
+    """Closing the generator mid-step signals the step's token so its worker can stop."""
+    import threading
+    started, stopped = threading.Event(), threading.Event()
+
+    def long_step(input_path, ctx):
+        started.set()
+        for _ in range(500):
+            if ctx.cancel_token.cancelled:
+                stopped.set()
+                break
+            time.sleep(0.01)
+        return input_path
+
+    async def abandon():
+        events = run_workflow([{"type": "long"}], jpeg, ctx)
+        assert (await events.__anext__())["event"] == "step_start"
+        pending = asyncio.ensure_future(events.__anext__())
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+
+    ctx = WorkflowContext(tmp_path)
+    fake = WorkflowStep("long", long_step, {}, pool="image")
+    with patch.dict(STEP_REGISTRY, {"long": fake}):
+        asyncio.run(abandon())
+
+    assert ctx.cancel_token.cancelled
+    assert stopped.wait(5)
+
+
+def test_workflow_events_closes_the_engine_on_early_exit(jpeg, tmp_path):
+    """Leaving the block after the first step cleans up without waiting for garbage collection."""
+    steps = [
+        {"type": "resize_image", "config": {"mode": "target_size", "target_size_kb": 50}},
+        {"type": "heic_to_jpeg"},
+    ]
+    ctx = WorkflowContext(tmp_path)
+
+    async def leave_early():
+        async with workflow_events(steps, jpeg, ctx) as events:
+            async for event in events:
+                if event["event"] == "step_complete":
+                    break
+
+    asyncio.run(leave_early())
+    assert ctx.cancel_token.cancelled
+    assert [p.name for p in tmp_path.iterdir()] == ["photo.jpg"]
@@ -0,0 +1,61 @@
+import io
+import zipfile
+
+from scripts.zip_stream import (
+    MANIFEST_SUFFIX, delete_zip_bundle, iter_zip, read_zip_manifest, write_zip_manifest,
+)
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return path
+
+
+def test_iter_zip_builds_valid_archive(tmp_path):
+    """The streamed chunks form a readable zip; compressed formats are stored, others deflated."""
+    photo = _write(tmp_path / "photo.jpg", b"\xff\xd8" + bytes(range(256)) * 40)
+    notes = _write(tmp_path / "notes.txt", b"hello world\n" * 1000)
+
+    data = b"".join(iter_zip([("a/photo.jpg", photo), ("notes.txt", notes)]))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.read("a/photo.jpg") == photo.read_bytes()
+        assert archive.read("notes.txt") == notes.read_bytes()
+        assert archive.getinfo("a/photo.jpg").compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_iter_zip_streams_in_bounded_chunks(tmp_path):
+    """Member data is emitted as it is read rather than after the whole archive is built."""
+    big = _write(tmp_path / "big.jpg", bytes(1024 * 1024))
+
+    chunks = list(iter_zip([("big.jpg", big)], chunk_size=64 * 1024))
+
+    assert len(chunks) > 10
+    assert max(len(chunk) for chunk in chunks) < 128 * 1024
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.read("big.jpg") == big.read_bytes()
+
+
+def test_zip_manifest_round_trip_and_delete(tmp_path):
+    """A manifest resolves to its members in output_dir, and deleting the bundle removes them all."""
+    first = _write(tmp_path / "uuid1_a.jpg", b"a")
+    second = _write(tmp_path / "uuid2_b.jpg", b"b")
+
+    name = write_zip_manifest(tmp_path, "batch.zip", [("a.jpg", first), ("b.jpg", second)])
+
+    assert name == "batch.zip"
+    assert read_zip_manifest(tmp_path, "batch.zip") == [("a.jpg", first), ("b.jpg", second)]
+    assert read_zip_manifest(tmp_path, "missing.zip") is None
+
+    delete_zip_bundle(tmp_path, "batch.zip")
+    assert not first.exists() and not second.exists()
+    assert not (tmp_path / f"batch.zip{MANIFEST_SUFFIX}").exists()
+
+
+def test_read_zip_manifest_stays_in_output_dir(tmp_path):
+    """Member names in a manifest cannot point outside the output directory."""
+    (tmp_path / f"evil.zip{MANIFEST_SUFFIX}").write_text('{"entries": [["x", "../../etc/passwd"]]}')
+
+    assert read_zip_manifest(tmp_path, "evil.zip") == [("x", tmp_path / "passwd")]